@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+借阅日汇总回填脚本（迁移 007 之后执行一次，可重复执行）
+用法: python backfill_rollup.py [--start 2023-01-01] [--end 2024-12-31]
+默认从最早一条借阅记录回填到昨天
+"""
+
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, func
+
+from database import engine, async_session_maker
+from models import BorrowRecord
+from services.rollup_service import rollup_service, ROLLUP_CHUNK_DAYS
+
+
+async def main(start: date = None, end: date = None):
+    end = end or datetime.utcnow().date() - timedelta(days=1)
+
+    async with async_session_maker() as db:
+        if start is None:
+            first = await db.scalar(select(func.min(BorrowRecord.borrowed_at)))
+            if first is None:
+                print("暂无借阅记录，无需回填")
+                await engine.dispose()
+                return
+            start = first.date()
+
+        print(f"回填借阅日汇总: {start} ~ {end}")
+        # 每段单独提交，中断后可从任意日期继续
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(end, chunk_start + timedelta(days=ROLLUP_CHUNK_DAYS - 1))
+            await rollup_service.rollup_days(db, chunk_start, chunk_end)
+            await db.commit()
+            print(f"✓ {chunk_start} ~ {chunk_end}")
+            chunk_start = chunk_end + timedelta(days=1)
+
+        # 最后一天的逾期数与直接统计对照
+        checked = await rollup_service.verify_overdue(db, end)
+        if checked is not None:
+            rolled, actual = checked
+            mark = "✓" if rolled == actual else "✗ 不一致"
+            print(f"{mark} {end} 逾期数: 汇总 {rolled} / 直接统计 {actual}")
+
+    await engine.dispose()
+    print("回填完成！")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回填借阅日汇总")
+    parser.add_argument("--start", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.start, args.end))
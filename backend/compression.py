@@ -0,0 +1,47 @@
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+
+# 只压缩文本类响应；图片、已压缩的导出文件等原样返回
+COMPRESSIBLE_TYPES = {"application/json", "text/csv"}
+
+
+def is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return media_type in COMPRESSIBLE_TYPES
+
+
+class SelectiveGZipResponder(GZipResponder):
+    """按响应头决定是否压缩：不可压缩的响应直接透传，不经过 gzip 缓冲"""
+
+    def __init__(self, app, minimum_size: int, compresslevel: int = 9):
+        super().__init__(app, minimum_size, compresslevel=compresslevel)
+        self.passthrough = False
+
+    async def send_with_gzip(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.passthrough = not is_compressible(Headers(raw=message["headers"]))
+        if self.passthrough:
+            await self.send(message)
+        else:
+            await super().send_with_gzip(message)
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """
+    只压缩 JSON/CSV 的 GZipMiddleware
+    跳过 image/* 与已带 Content-Encoding 的响应（避免对 webp/jpeg 和 .csv.gz 白白再压一遍）
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if "gzip" in headers.get("Accept-Encoding", ""):
+                responder = SelectiveGZipResponder(
+                    self.app, self.minimum_size, compresslevel=self.compresslevel
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -24,6 +24,61 @@ class Settings:
     # 定时任务执行时间（Cron表达式）
     REMINDER_CRON_HOUR: int = int(os.getenv("REMINDER_CRON_HOUR", "9"))  # 每天上午9点
     REMINDER_CRON_MINUTE: int = int(os.getenv("REMINDER_CRON_MINUTE", "0"))
+    # 是否启动定时任务（压测等场景可关闭）
+    SCHEDULER_ENABLED: bool = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+    # 定时任务选主：advisory lock 键、检查间隔（秒，即leader失效后的最长接替时间）
+    SCHEDULER_LOCK_KEY: int = int(os.getenv("SCHEDULER_LOCK_KEY", "7310001"))
+    SCHEDULER_LEADER_CHECK_SECONDS: int = int(os.getenv("SCHEDULER_LEADER_CHECK_SECONDS", "15"))
+    # 订阅消息发送：并发数、每秒发送上限、瞬时错误重试次数
+    WX_SEND_CONCURRENCY: int = int(os.getenv("WX_SEND_CONCURRENCY", "10"))
+    WX_SEND_RATE: int = int(os.getenv("WX_SEND_RATE", "20"))
+    WX_SEND_MAX_RETRIES: int = int(os.getenv("WX_SEND_MAX_RETRIES", "3"))
+
+    # ===== 缓存配置 =====
+    # 图书详情/列表缓存有效期（秒）
+    BOOK_CACHE_TTL: int = int(os.getenv("BOOK_CACHE_TTL", "300"))
+    # Redis不可用时进程内缓存的有效期上限与容量
+    CACHE_LOCAL_TTL: int = int(os.getenv("CACHE_LOCAL_TTL", "30"))
+    CACHE_LOCAL_MAX_ITEMS: int = int(os.getenv("CACHE_LOCAL_MAX_ITEMS", "2000"))
+
+    # 登录用户身份缓存有效期（秒）：Redis / 进程内
+    AUTH_CACHE_TTL: int = int(os.getenv("AUTH_CACHE_TTL", "300"))
+    AUTH_CACHE_LOCAL_TTL: int = int(os.getenv("AUTH_CACHE_LOCAL_TTL", "10"))
+    # ISBN元数据缓存有效期（天）；上游未查到的ISBN缓存时长（小时）
+    ISBN_CACHE_TTL_DAYS: int = int(os.getenv("ISBN_CACHE_TTL_DAYS", "30"))
+    ISBN_NEGATIVE_TTL_HOURS: int = int(os.getenv("ISBN_NEGATIVE_TTL_HOURS", "6"))
+    ISBN_LOCAL_MAX_ITEMS: int = int(os.getenv("ISBN_LOCAL_MAX_ITEMS", "1000"))
+    # 批量查询ISBN时同时进行的上游查询数
+    ISBN_LOOKUP_CONCURRENCY: int = int(os.getenv("ISBN_LOOKUP_CONCURRENCY", "8"))
+
+    # ===== 统计计数器配置 =====
+    # 计数器分片数（分散热点行的写锁）
+    STATS_COUNTER_SHARDS: int = int(os.getenv("STATS_COUNTER_SHARDS", "8"))
+    # 计数器全量校准间隔（分钟），逾期数与当日借书人数随之刷新
+    STATS_RECONCILE_MINUTES: int = int(os.getenv("STATS_RECONCILE_MINUTES", "10"))
+
+    # ===== 借阅归档配置 =====
+    # 归还超过N天的借阅记录移入归档表 borrow_records_archive
+    BORROW_ARCHIVE_DAYS: int = int(os.getenv("BORROW_ARCHIVE_DAYS", "365"))
+
+    # ===== 审计日志配置 =====
+    # 内存队列容量（满时丢弃，不阻塞请求）、每批写入条数、最长攒批时间（秒）
+    AUDIT_QUEUE_SIZE: int = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    AUDIT_FLUSH_SECONDS: int = int(os.getenv("AUDIT_FLUSH_SECONDS", "2"))
+    # system_logs 按月分区，保留最近N个月
+    AUDIT_RETENTION_MONTHS: int = int(os.getenv("AUDIT_RETENTION_MONTHS", "12"))
+    # 可信反向代理（逗号分隔的IP或网段）：仅当直连地址属于这些代理时才采用 X-Forwarded-For
+    TRUSTED_PROXIES: str = os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1")
+
+    # ===== 文件上传配置 =====
+    # 上传目录（通过 /static 对外提供）、单个文件大小上限（MB）
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
+    UPLOAD_MAX_MB: int = int(os.getenv("UPLOAD_MAX_MB", "20"))
+    # 生成缩略图的进程数
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "2"))
+    # 允许代理拉取第三方封面的域名（逗号分隔，含子域名），其他地址一律不拉取
+    COVER_HOSTS: str = os.getenv("COVER_HOSTS", "doubanio.com,covers.openlibrary.org,archive.org")
 
 
 @lru_cache()
@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.pool import NullPool
 from config import get_settings
+from metrics import TimedQueuePool, instrument_engine
 
 settings = get_settings()
 
@@ -25,12 +26,16 @@ else:
         settings.DATABASE_URL,
         echo=False,
         future=True,
+        poolclass=TimedQueuePool,  # 记录连接池等待时间
         pool_size=10,
         max_overflow=20,
         pool_pre_ping=True,
         pool_recycle=3600,
     )
 
+# SQL条数/耗时、连接池占用指标（/metrics）
+instrument_engine(engine)
+
 async_session_maker = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -44,10 +49,15 @@ Base = declarative_base()
 
 async def get_db() -> AsyncSession:
     """FastAPI依赖：获取数据库会话"""
+    from services.cache_service import cache_service
+    from services.audit_service import audit_service
+
     async with async_session_maker() as session:
         try:
             yield session
             await session.commit()
+            await cache_service.flush_dirty(session)
+            audit_service.flush_pending(session)
         except Exception:
             await session.rollback()
             raise
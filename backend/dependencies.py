@@ -1,3 +1,6 @@
+from dataclasses import dataclass, asdict
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
@@ -8,16 +11,62 @@ from database import get_db
 from models import User
 from config import get_settings
 from schemas import UserResponse
+from services.cache_service import cache_service
+from services.audit_service import audit_service
 
 security = HTTPBearer()
 settings = get_settings()
 
 
+@dataclass(frozen=True)
+class Principal:
+    """当前登录用户的只读快照（缓存于进程内与Redis，不绑定数据库会话）"""
+    id: int
+    openid: str
+    nickname: Optional[str]
+    avatar_url: Optional[str]
+    is_admin: int
+    status: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            openid=user.openid,
+            nickname=user.nickname,
+            avatar_url=user.avatar_url,
+            is_admin=user.is_admin or 0,
+            status=user.status,
+        )
+
+
+async def load_principal(db: AsyncSession, openid: str) -> Optional[Principal]:
+    """按 openid 获取用户快照：进程内缓存 -> Redis -> 数据库"""
+    principal = cache_service.principal_local_get(openid)
+    if principal is not None:
+        return principal
+
+    key = cache_service.user_principal_key(openid)
+    cached = await cache_service.get_json(key)
+    if cached is not None:
+        principal = Principal(**cached)
+    else:
+        result = await db.execute(select(User).where(User.openid == openid))
+        user = result.scalar_one_or_none()
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+        await cache_service.set_json(key, asdict(principal), settings.AUTH_CACHE_TTL)
+
+    cache_service.principal_local_set(openid, principal)
+    return principal
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
-) -> User:
-    """JWT验证，获取当前登录用户"""
+) -> Principal:
+    """JWT验证，获取当前登录用户（只读快照，修改用户需另行查询）"""
     token = credentials.credentials
     
     try:
@@ -32,19 +81,20 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # 查询用户
-    result = await db.execute(select(User).where(User.openid == openid))
-    user = result.scalar_one_or_none()
+    # 查询用户（带缓存）
+    user = await load_principal(db, openid)
     
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # 审计记录的操作人
+    audit_service.bind_user(user.id)
     return user
 
 
 async def get_current_admin(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     """验证管理员权限"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin required")
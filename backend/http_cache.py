@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+
+# 公共目录数据：可缓存但每次需校验
+PUBLIC = "no-cache"
+# 与用户相关的数据：仅客户端缓存
+PRIVATE = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """由行版本（主键 + updated_at 等）计算强 ETag"""
+    raw = "|".join(
+        p.isoformat() if isinstance(p, datetime) else str(p) for p in parts
+    )
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:24] + '"'
+
+
+def latest(values: Iterable[Optional[datetime]]) -> Optional[datetime]:
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+def _http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def is_fresh(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """客户端缓存是否仍有效：优先比较 If-None-Match，没有时再看 If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # If-None-Match 使用弱比较
+        return etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _headers(etag: str, last_modified: Optional[datetime], cache_control: str) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None,
+                 cache_control: str = PUBLIC) -> Response:
+    return Response(status_code=304, headers=_headers(etag, last_modified, cache_control))
+
+
+def respond(
+    request: Request,
+    data: Any,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    cache_control: str = PUBLIC
+) -> Response:
+    """命中客户端缓存返回304，否则返回已序列化好的数据（不再经过 response_model）"""
+    if is_fresh(request, etag, last_modified):
+        return not_modified(etag, last_modified, cache_control)
+    return ORJSONResponse(data, headers=_headers(etag, last_modified, cache_control))
+
+
+# ========== 带校验信息的缓存条目 ==========
+
+def entry(data: Any, etag: str, last_modified: Optional[datetime]) -> Dict[str, Any]:
+    """写入读缓存的条目：数据与其 ETag / Last-Modified 一起保存，命中时无需重新计算"""
+    return {
+        "etag": etag,
+        "last_modified": last_modified.isoformat() if last_modified else None,
+        "data": data,
+    }
+
+
+def load_entry(cached: Any) -> Optional[Dict[str, Any]]:
+    """解析缓存条目（旧格式的缓存视为未命中）"""
+    if not isinstance(cached, dict) or "etag" not in cached or "data" not in cached:
+        return None
+    if cached.get("last_modified"):
+        cached["last_modified"] = datetime.fromisoformat(cached["last_modified"])
+    return cached
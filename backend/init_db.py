@@ -1,15 +1,22 @@
 #!/usr/bin/env python3
 """
 数据库初始化脚本
-用法: python init_db.py
+用法:
+    python init_db.py                                   # 只建表，不写入任何数据
+    python init_db.py --sample                          # 建表，库为空时生成少量示例数据
+    python init_db.py --users 20000 --books 50000 --borrows 1000000 --reset   # 清空并生成大规模数据
 """
 
+import argparse
 import asyncio
 from database import init_db, engine, async_session_maker
-from models import User, Book
+from models import Book, User
+from config import get_settings
 
+import seed
 
-async def main():
+
+async def main(args):
     print("正在初始化数据库...")
 
     await init_db()
@@ -19,48 +26,30 @@ async def main():
     print("✓ 触发器创建完成")
 
     async with async_session_maker() as db:
-        from sqlalchemy import select, func
+        from sqlalchemy import select
 
-        user_count = await db.scalar(select(func.count(User.id)))
+        has_data = await db.scalar(select(
+            select(User.id).exists() | select(Book.isbn).exists()
+        ))
 
-        if user_count == 0:
-            print("\n插入测试数据...")
-            test_books = [
-                Book(
-                    isbn="9787115428028",
-                    title="Python编程：从入门到实践",
-                    author="Eric Matthes",
-                    publisher="人民邮电出版社",
-                    publish_date="2016-7",
-                    cover_url="https://img1.doubanio.com/view/subject/l/public/s29195878.jpg",
-                    summary="本书是一本针对所有层次的Python读者而作的Python入门书。",
-                    tags=["技术", "Python", "编程"],
-                    stock=3,
-                    total=3,
-                    location="A区-1架-1层"
-                ),
-                Book(
-                    isbn="9787121360527",
-                    title="深入理解计算机系统",
-                    author="Randal E. Bryant",
-                    publisher="机械工业出版社",
-                    publish_date="2019-4",
-                    cover_url="https://img1.doubanio.com/view/subject/l/public/s32292480.jpg",
-                    summary="程序员必读经典，理解计算机系统本质。",
-                    tags=["技术", "计算机", "CSAPP"],
-                    stock=2,
-                    total=2,
-                    location="A区-2架-1层"
-                )
-            ]
-            db.add_all(test_books)
-            await db.commit()
-            print(f"✓ 插入 {len(test_books)} 本测试图书")
+    # 生成数据会先 TRUNCATE，必须显式指定；--sample 只在用户表和图书表都为空时生效
+    if args.reset or (args.sample and not has_data):
+        print("\n生成示例数据...")
+        counts = await seed.seed(get_settings().DATABASE_URL, seed.generator_from_args(args))
+        await seed.refresh_derived(args.days)
+        print(f"✓ 导入 {counts}")
+    elif args.sample:
+        print("\n已有数据，跳过示例数据（使用 --reset 清空后重新生成）")
 
-        print("\n数据库初始化完成！")
+    print("\n数据库初始化完成！")
 
     await engine.dispose()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="初始化数据库")
+    seed.add_arguments(parser)
+    parser.set_defaults(users=50, books=200, borrows=1000, hot_books=3)
+    parser.add_argument("--sample", action="store_true", help="库为空时生成示例数据")
+    parser.add_argument("--reset", action="store_true", help="清空现有数据并重新生成")
+    asyncio.run(main(parser.parse_args()))
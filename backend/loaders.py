@@ -0,0 +1,117 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from fastapi import Depends
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
+from models import Book, BorrowHistory, User
+
+BatchFn = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class BatchLoader:
+    """
+    请求级批量加载器（类似 DataLoader）
+    同一轮事件循环内的 load() 调用会被合并成一次 IN (...) / GROUP BY 查询
+    """
+
+    def __init__(self, batch_fn: BatchFn, lock: asyncio.Lock, default: Any = None):
+        self._batch_fn = batch_fn
+        self._lock = lock
+        self._default = default
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, key: Hashable) -> Awaitable[Any]:
+        """加载单个key（同一请求内结果会被复用）"""
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[key] = future
+        self._queue.append(key)
+        if len(self._queue) == 1:
+            loop.call_soon(self._schedule_dispatch)
+        return future
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        """批量加载，返回值顺序与keys一致"""
+        keys = list(keys)
+        if not keys:
+            return []
+        return list(await asyncio.gather(*(self.load(k) for k in keys)))
+
+    def _schedule_dispatch(self):
+        task = asyncio.ensure_future(self._dispatch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self):
+        keys, self._queue = self._queue, []
+        try:
+            # 同一个 AsyncSession 不允许并发查询，多个loader共用一把锁
+            async with self._lock:
+                values = await self._batch_fn(keys)
+        except Exception as e:
+            for key in keys:
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key in keys:
+            future = self._futures[key]
+            if not future.done():
+                future.set_result(values.get(key, self._default))
+
+
+class Loaders:
+    """单个请求内可用的全部loader"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        lock = asyncio.Lock()
+        self.book_titles = BatchLoader(self._load_book_titles, lock)
+        self.user_nicknames = BatchLoader(self._load_user_nicknames, lock)
+        self.user_borrow_counts = BatchLoader(
+            self._load_user_borrow_counts, lock, default={"total": 0, "active": 0}
+        )
+
+    async def _load_book_titles(self, isbns: List[str]) -> Dict[str, Optional[str]]:
+        result = await self.db.execute(
+            select(Book.isbn, Book.title).where(Book.isbn.in_(isbns))
+        )
+        return dict(result.all())
+
+    async def _load_user_nicknames(self, user_ids: List[int]) -> Dict[int, Optional[str]]:
+        result = await self.db.execute(
+            select(User.id, User.nickname).where(User.id.in_(user_ids))
+        )
+        return dict(result.all())
+
+    async def _load_user_borrow_counts(self, user_ids: List[int]) -> Dict[int, Dict[str, int]]:
+        # 总数包含已归档的记录
+        h = BorrowHistory.c
+        result = await self.db.execute(
+            select(
+                h.user_id,
+                func.count(h.id),
+                func.count(h.id).filter(h.status == "active"),
+            )
+            .where(h.user_id.in_(user_ids))
+            .group_by(h.user_id)
+        )
+        return {
+            user_id: {"total": total, "active": active}
+            for user_id, total, active in result.all()
+        }
+
+
+async def get_loaders(db: AsyncSession = Depends(get_db)) -> Loaders:
+    """FastAPI依赖：请求级loader（与处理函数共用同一个数据库会话）"""
+    return Loaders(db)
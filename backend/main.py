@@ -1,12 +1,19 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
+from pathlib import Path
 
 from database import init_db, engine
 from config import get_settings
 from routers import auth, books, borrows, admin
 from tasks import scheduler  # 新增导入
+from services import cache_service, http_clients, upload_service, cover_service, audit_service
+from services.upload_service import ImmutableStaticFiles, UploadLimitMiddleware
+from services.audit_service import AuditContextMiddleware
+import metrics
+from compression import SelectiveGZipMiddleware
 
 
 @asynccontextmanager
@@ -16,8 +23,12 @@ async def lifespan(app: FastAPI):
     # 1. 初始化数据库
     await init_db()
 
-    # 2. 启动定时任务调度器
-    scheduler.start()
+    # 启动审计日志批量写入
+    await audit_service.start()
+
+    # 2. 启动定时任务调度器（多进程部署时通过选主保证任务只执行一次）
+    if settings.SCHEDULER_ENABLED:
+        await scheduler.start()
 
     print(f"\n{'='*50}")
     print(f"  {settings.APP_NAME} 启动完成")
@@ -28,9 +39,23 @@ async def lifespan(app: FastAPI):
 
     # ===== 关闭时 =====
     # 1. 关闭定时任务
-    scheduler.shutdown()
+    if settings.SCHEDULER_ENABLED:
+        await scheduler.shutdown()
+
+    # 2. 关闭缓存连接
+    await cache_service.close()
+
+    # 3. 关闭外部接口连接池
+    await http_clients.close()
 
-    # 2. 关闭数据库连接
+    # 4. 停止封面预取，关闭图片处理进程池
+    await cover_service.close()
+    upload_service.close()
+
+    # 5. 写完剩余的审计日志
+    await audit_service.close()
+
+    # 6. 关闭数据库连接
     await engine.dispose()
 
     print(f"\n{settings.APP_NAME} 已关闭\n")
@@ -42,7 +67,8 @@ app = FastAPI(
     title=settings.APP_NAME,
     description="公司内部图书管理系统 API（含定时提醒）",
     version="1.1.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # orjson 序列化，大列表明显更快
 )
 
 # CORS配置
@@ -54,12 +80,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 上传接口在解析表单前限制请求体大小
+app.add_middleware(UploadLimitMiddleware, paths={"/api/v1/admin/upload"})
+
+# 压缩较大的 JSON/CSV 响应（列表、导出）；较低的压缩级别在体积和CPU之间取折中
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# 请求耗时、SQL条数指标
+app.add_middleware(metrics.MetricsMiddleware)
+
+# 审计上下文（IP、User-Agent、操作人）
+app.add_middleware(AuditContextMiddleware)
+
 # 注册路由
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(books.router, prefix="/api/v1")
 app.include_router(borrows.router, prefix="/api/v1")
 app.include_router(admin.router, prefix="/api/v1")
 
+# 上传的图片（长期缓存）
+Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+app.mount("/static", ImmutableStaticFiles(directory=settings.UPLOAD_DIR), name="static")
+
 
 @app.get("/health")
 async def health_check():
@@ -69,10 +111,20 @@ async def health_check():
         "status": "ok",
         "service": settings.APP_NAME,
         "scheduled_jobs": len(jobs),
-        "jobs": [{"id": j.id, "name": j.name, "next_run": j.next_run_time} for j in jobs]
+        "scheduler_leader": scheduler.leader.is_leader,
+        "jobs": [{"id": j.id, "name": j.name, "next_run": j.next_run_time} for j in jobs],
+        "http_pools": http_clients.stats()
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus 指标（按路由的请求耗时、SQL条数，连接池占用）"""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.post("/admin/trigger-reminder")
 async def manual_trigger_reminder():
     """手动触发提醒任务（管理员调试用）"""
@@ -0,0 +1,260 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# 与 Prometheus 默认值接近的桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 单请求SQL条数
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """取值在渲染时由回调计算"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, collect):
+        super().__init__(name, help)
+        self._collect = collect
+
+    def render(self) -> List[str]:
+        value = self._collect()
+        if value is None:
+            return []
+        return self.header() + [f"{self.name} {_num(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> [各桶计数..., sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, row in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                le = f'le="{_num(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(row[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    进程内指标（Prometheus 文本格式）
+    多worker部署时每个进程各自暴露，由 Prometheus 按实例抓取后聚合
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP请求数", ("method", "route", "status")
+))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP请求耗时", ("method", "route")
+))
+http_sql_count = registry.register(Histogram(
+    "http_request_sql_statements", "单个请求执行的SQL条数", ("method", "route"),
+    buckets=COUNT_BUCKETS
+))
+http_db_time = registry.register(Histogram(
+    "http_request_db_seconds", "单个请求的数据库耗时", ("method", "route")
+))
+db_statements = registry.register(Counter(
+    "db_statements_total", "执行的SQL条数（含定时任务）"
+))
+db_statement_time = registry.register(Histogram(
+    "db_statement_duration_seconds", "单条SQL耗时"
+))
+pool_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "从连接池获取连接的等待时间"
+))
+audit_events = registry.register(Counter(
+    "audit_events_total", "审计日志条数（written / dropped / failed）", ("outcome",)
+))
+
+# 当前请求的 [SQL条数, 数据库耗时]
+_request_db: ContextVar[Optional[List[float]]] = ContextVar("request_db", default=None)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """记录获取连接的等待时间（连接池耗尽时即排队时间）"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine):
+    """注册SQL执行事件与连接池占用指标"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        db_statements.inc()
+        db_statement_time.observe(elapsed)
+        current = _request_db.get()
+        if current is not None:
+            current[0] += 1
+            current[1] += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+    pool = sync_engine.pool
+    for name, help, attr in (
+        ("db_pool_size", "连接池容量", "size"),
+        ("db_pool_checked_out", "已借出的连接数", "checkedout"),
+        ("db_pool_overflow", "超出容量的连接数", "overflow"),
+    ):
+        if hasattr(pool, attr):
+            registry.register(Gauge(name, help, getattr(pool, attr)))
+
+
+class MetricsMiddleware:
+    """纯ASGI中间件：按路由模板统计请求数、耗时、SQL条数与数据库耗时"""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Optional[Dict[object, str]] = None
+
+    def _route_of(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            app = scope.get("app")
+            self._route_paths = {
+                getattr(r, "endpoint", None): r.path
+                for r in getattr(app, "routes", []) if hasattr(r, "path")
+            }
+        return self._route_paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        db_stats = [0, 0.0]
+        token = _request_db.set(db_stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_db.reset(token)
+            method = scope["method"]
+            route = self._route_of(scope)
+            http_requests.inc(method, route, str(status["code"]))
+            http_latency.observe(time.perf_counter() - started, method, route)
+            http_sql_count.observe(db_stats[0], method, route)
+            http_db_time.observe(db_stats[1], method, route)
+
+
+def render() -> str:
+    return registry.render()
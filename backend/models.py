@@ -1,8 +1,8 @@
 from sqlalchemy import (
-    Column, Integer, String, DateTime, ForeignKey,
-    Text, Smallint, ARRAY, CheckConstraint, Index
+    Column, Integer, BigInteger, String, Date, DateTime, ForeignKey, Boolean,
+    Text, SmallInteger, ARRAY, CheckConstraint, Index, DDL, event, MetaData, Table
 )
-from sqlalchemy.dialects.postgresql import JSONB, INET
+from sqlalchemy.dialects.postgresql import JSONB, INET, TSVECTOR
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -15,7 +15,7 @@ class User(Base):
     openid = Column(String(100), unique=True, index=True, nullable=False)
     nickname = Column(String(50), nullable=True)
     avatar_url = Column(String(500), nullable=True)
-    is_admin = Column(Smallint, default=0)
+    is_admin = Column(SmallInteger, default=0)
     status = Column(String(20), default="active")
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -24,7 +24,8 @@ class User(Base):
     logs = relationship("SystemLog", back_populates="user")
 
     __table_args__ = (
-        Index('idx_users_created', 'created_at'),
+        # 游标分页 (created_at, id)
+        Index('idx_users_created_key', 'created_at', 'id'),
         Index('idx_users_admin', 'is_admin', postgresql_where=is_admin == 1),
     )
 
@@ -43,6 +44,8 @@ class Book(Base):
     stock = Column(Integer, default=1, nullable=False)
     total = Column(Integer, default=1, nullable=False)
     location = Column(String(50), nullable=True)
+    # 全文检索向量，由触发器 books_search_vector_update 维护，应用层不直接写
+    search_vector = Column(TSVECTOR, nullable=True)
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -52,13 +55,71 @@ class Book(Base):
         CheckConstraint('stock <= total', name='check_stock_valid'),
         Index('idx_books_author', 'author'),
         Index('idx_books_tags_gin', 'tags', postgresql_using='gin'),
-        Index('idx_books_created', 'created_at'),
+        # 游标分页 (created_at, isbn)
+        Index('idx_books_created_key', 'created_at', 'isbn'),
         Index('idx_books_stock_low', 'stock', postgresql_where=stock < 3),
+        Index('idx_books_search', 'search_vector', postgresql_using='gin'),
+        Index('idx_books_title_trgm', 'title', postgresql_using='gin',
+              postgresql_ops={'title': 'gin_trgm_ops'}),
+        Index('idx_books_author_trgm', 'author', postgresql_using='gin',
+              postgresql_ops={'author': 'gin_trgm_ops'}),
+        Index('idx_books_isbn_pattern', 'isbn', postgresql_ops={'isbn': 'varchar_pattern_ops'}),
     )
 
     borrows = relationship("BorrowRecord", back_populates="book")
 
 
+# ===== 图书全文检索 =====
+# 中文按相邻二字切分（bigram），其余文本交给 simple 分词器
+# 与 services/search_service.py 的查询端分词、infra/database/schema.sql 保持一致
+BOOKS_SEARCH_DDL = [
+    r"""
+CREATE OR REPLACE FUNCTION search_tokens(src TEXT) RETURNS TEXT AS $$
+DECLARE
+    run TEXT;
+    parts TEXT[] := ARRAY[regexp_replace(coalesce(src, ''), '[\u3400-\u9fff]+', ' ', 'g')];
+    i INT;
+BEGIN
+    FOR run IN SELECT m[1] FROM regexp_matches(coalesce(src, ''), '([\u3400-\u9fff]+)', 'g') AS m LOOP
+        IF char_length(run) = 1 THEN
+            parts := parts || run;
+        ELSE
+            FOR i IN 1 .. char_length(run) - 1 LOOP
+                parts := parts || substr(run, i, 2);
+            END LOOP;
+        END IF;
+    END LOOP;
+    RETURN array_to_string(parts, ' ');
+END;
+$$ LANGUAGE plpgsql IMMUTABLE
+""",
+    """
+CREATE OR REPLACE FUNCTION books_search_document(title TEXT, author TEXT, tags TEXT[])
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple', search_tokens(title)), 'A')
+        || setweight(to_tsvector('simple', search_tokens(author)), 'B')
+        || setweight(to_tsvector('simple', search_tokens(array_to_string(tags, ' '))), 'C')
+$$ LANGUAGE sql IMMUTABLE
+""",
+    """
+CREATE OR REPLACE FUNCTION books_search_vector_update() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector := books_search_document(NEW.title, NEW.author, NEW.tags);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE TRIGGER books_search_vector_trigger BEFORE INSERT OR UPDATE OF title, author, tags ON books
+    FOR EACH ROW EXECUTE FUNCTION books_search_vector_update()
+""",
+]
+
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+for _statement in BOOKS_SEARCH_DDL:
+    event.listen(Book.__table__, "after_create", DDL(_statement))
+
+
 class BorrowRecord(Base):
     __tablename__ = "borrow_records"
 
@@ -84,13 +145,96 @@ class BorrowRecord(Base):
         Index('idx_borrows_book_status', 'book_isbn', 'status'),
         Index('idx_borrows_active', 'status', postgresql_where=status == 'active'),
         Index('idx_borrows_due', 'due_date', postgresql_where=status == 'active'),
+        # 日汇总按归还时间 / 到期时间取区间
+        Index('idx_borrows_returned_at', 'returned_at', postgresql_where=returned_at.isnot(None)),
+        Index('idx_borrows_due_all', 'due_date'),
+        # 游标分页 (borrowed_at, id)：全量、按状态、按用户、按图书
+        Index('idx_borrows_borrowed_key', 'borrowed_at', 'id'),
+        Index('idx_borrows_status_borrowed_key', 'status', 'borrowed_at', 'id'),
+        Index('idx_borrows_user_borrowed_key', 'user_id', 'borrowed_at', 'id'),
+        Index('idx_borrows_book_borrowed_key', 'book_isbn', 'borrowed_at', 'id'),
+        # 同一用户同一本书只能有一条在借记录（借书路径依赖该索引拒绝重复借阅）
+        Index('uq_borrows_user_book_active', 'user_id', 'book_isbn',
+              unique=True, postgresql_where=status == 'active'),
     )
 
 
+class BorrowRecordArchive(Base):
+    """
+    已归还的历史借阅，按 borrowed_at 年份分区（分区由 archive_service 按需创建）
+    借阅表只保留在借与近期归还的记录；历史查询通过视图 borrow_records_all 同时读取两张表
+    """
+    __tablename__ = "borrow_records_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False)
+    book_isbn = Column(String(20), nullable=False)
+    borrowed_at = Column(DateTime(timezone=True), primary_key=True)
+    due_date = Column(DateTime(timezone=True), nullable=False)
+    returned_at = Column(DateTime(timezone=True), nullable=True)
+    status = Column(String(20))
+    return_method = Column(String(20), nullable=True)
+    notes = Column(String(500), nullable=True)
+    remind_count = Column(Integer, default=0)
+    last_remind_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_borrows_archive_borrowed_key', 'borrowed_at', 'id'),
+        Index('idx_borrows_archive_user_key', 'user_id', 'borrowed_at', 'id'),
+        Index('idx_borrows_archive_book_key', 'book_isbn', 'borrowed_at', 'id'),
+        {'postgresql_partition_by': 'RANGE (borrowed_at)'},
+    )
+
+
+# 两张表共有的列（归档时按此顺序搬移）
+BORROW_HISTORY_COLUMNS = [
+    "id", "user_id", "book_isbn", "borrowed_at", "due_date", "returned_at", "status",
+    "return_method", "notes", "remind_count", "last_remind_at", "created_at", "updated_at",
+]
+
+event.listen(BorrowRecordArchive.__table__, "after_create", DDL(
+    "CREATE TABLE IF NOT EXISTS borrow_records_archive_default "
+    "PARTITION OF borrow_records_archive DEFAULT"
+))
+event.listen(Base.metadata, "after_create", DDL(
+    "CREATE OR REPLACE VIEW borrow_records_all AS "
+    f"SELECT {', '.join(BORROW_HISTORY_COLUMNS)}, false AS archived FROM borrow_records "
+    "UNION ALL "
+    f"SELECT {', '.join(BORROW_HISTORY_COLUMNS)}, true AS archived FROM borrow_records_archive"
+))
+
+# 视图 borrow_records_all（单独的 MetaData，不参与 create_all）
+BorrowHistory = Table(
+    "borrow_records_all", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer),
+    Column("book_isbn", String(20)),
+    Column("borrowed_at", DateTime(timezone=True)),
+    Column("due_date", DateTime(timezone=True)),
+    Column("returned_at", DateTime(timezone=True)),
+    Column("status", String(20)),
+    Column("return_method", String(20)),
+    Column("notes", String(500)),
+    Column("remind_count", Integer),
+    Column("last_remind_at", DateTime(timezone=True)),
+    Column("created_at", DateTime(timezone=True)),
+    Column("updated_at", DateTime(timezone=True)),
+    Column("archived", Boolean),
+)
+
+
 class SystemLog(Base):
+    """
+    操作审计日志，按 created_at 月分区（system_logs_pYYYYMM）
+    由 audit_service 批量写入并按月建分区；保留期外的月分区脱离后整体删除
+    不设默认分区：有默认分区时无法 DETACH PARTITION CONCURRENTLY
+    """
     __tablename__ = "system_logs"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     action = Column(String(50), nullable=False)
     target_type = Column(String(50), nullable=True)
@@ -98,13 +242,15 @@ class SystemLog(Base):
     detail = Column(JSONB, nullable=True)
     ip_address = Column(INET, nullable=True)
     user_agent = Column(String(500), nullable=True)
-    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    # 分区键须包含在主键中
+    created_at = Column(DateTime(timezone=True), primary_key=True, default=datetime.utcnow)
 
     user = relationship("User", back_populates="logs")
 
     __table_args__ = (
         Index('idx_logs_user_time', 'user_id', 'created_at'),
         Index('idx_logs_action', 'action', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
     )
 
 
@@ -129,5 +275,53 @@ class SchedulerLog(Base):
     status = Column(String(20))
     started_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     finished_at = Column(DateTime(timezone=True), nullable=True)
-    result = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)  # JSON：耗时与扫描/发送计数
     error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index('idx_scheduler_logs_job_started', 'job_id', 'started_at'),
+    )
+
+
+class StatCounter(Base):
+    """
+    统计计数器（管理端看板）
+    写路径在同一事务内增减；同一计数拆成多个分片，避免热点行锁排队，读取时求和
+    日维度计数的 name 形如 borrows_new:2024-01-01
+    """
+    __tablename__ = "stat_counters"
+
+    name = Column(String(100), primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, default=0)
+    value = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IsbnMetadata(Base):
+    """
+    ISBN元数据缓存（外部接口查询结果）
+    data 为空表示上游均未查到（负缓存，有效期较短）
+    """
+    __tablename__ = "isbn_metadata"
+
+    isbn = Column(String(20), primary_key=True)
+    data = Column(JSONB, nullable=True)
+    source = Column(String(20), nullable=True)  # douban / openlibrary
+    fetched_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class DailyBorrowStat(Base):
+    """
+    借阅日汇总（UTC日期）
+    每晚由 RollupJob 按聚合SQL生成前几天的数据，可通过 backfill_rollup.py 回填历史
+    """
+    __tablename__ = "daily_borrow_stats"
+
+    day = Column(Date, primary_key=True)
+    borrows = Column(Integer, nullable=False, default=0)        # 当日借出
+    borrowers = Column(Integer, nullable=False, default=0)      # 当日借书人数
+    returns = Column(Integer, nullable=False, default=0)        # 当日归还
+    late_returns = Column(Integer, nullable=False, default=0)   # 当日归还中逾期的
+    overdue = Column(Integer, nullable=False, default=0)        # 当日结束时逾期未还
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,60 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import desc, tuple_
+
+
+def encode_cursor(sort_value: Any, key: Any) -> str:
+    """游标 = base64(json([排序列值, 主键]))，对客户端不透明"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type: type = int) -> Tuple[datetime, Any]:
+    """解析游标并校验类型（主键类型须与主键列一致，否则比较时数据库报错成500）"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(sort_value, str) or isinstance(key, bool) or not isinstance(key, key_type):
+            raise TypeError("cursor value type mismatch")
+        if isinstance(key, int) and not -2 ** 63 <= key < 2 ** 63:
+            raise ValueError("cursor key out of range")
+        return datetime.fromisoformat(sort_value), key
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+class KeysetPage:
+    """
+    基于 (时间列, 主键) 的游标分页，按时间倒序
+    翻页条件为 (time, id) < (游标time, 游标id)，可直接走复合索引，深翻页不退化
+    """
+
+    def __init__(self, time_col, key_col, limit: int, cursor: Optional[str] = None):
+        self.time_col = time_col
+        self.key_col = key_col
+        self.limit = limit
+        self.after = decode_cursor(cursor, key_col.type.python_type) if cursor else None
+
+    def apply(self, query):
+        """附加翻页条件与排序，多取一行用于判断是否还有下一页"""
+        if self.after is not None:
+            query = query.where(tuple_(self.time_col, self.key_col) < tuple_(*self.after))
+        return query.order_by(desc(self.time_col), desc(self.key_col)).limit(self.limit + 1)
+
+    def split(
+        self,
+        rows: Sequence[Any],
+        key_fn: Callable[[Any], Tuple[Any, Any]]
+    ) -> Tuple[List[Any], Optional[str]]:
+        """截取本页数据并生成下一页游标（key_fn 返回 (时间, 主键)）"""
+        rows = list(rows)
+        if len(rows) <= self.limit:
+            return rows, None
+        rows = rows[:self.limit]
+        return rows, encode_cursor(*key_fn(rows[-1]))
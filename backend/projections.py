@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from models import BorrowRecord, BorrowHistory
+
+
+def borrow_columns(table) -> tuple:
+    """借阅列表直接查询的列（与 schemas.BorrowResponse 字段一致），不加载 ORM 实体"""
+    c = table.c
+    return (
+        c.id, c.user_id, c.book_isbn, c.borrowed_at, c.due_date, c.returned_at,
+        c.status, c.return_method, c.remind_count,
+    )
+
+
+# 借阅表（在借、近期）与含归档的历史视图
+BORROW_COLUMNS = borrow_columns(BorrowRecord.__table__)
+HISTORY_COLUMNS = borrow_columns(BorrowHistory)
+
+# BorrowResponse 中查询结果可能不含的字段
+BORROW_DEFAULTS = {"book_title": None, "user_nickname": None, "is_overdue": False}
+
+
+def borrow_dicts(rows: Iterable[Any]) -> List[Dict[str, Any]]:
+    """查询行 -> BorrowResponse 结构的字典（跳过逐行 Pydantic 校验，交给 orjson 序列化）"""
+    return [{**BORROW_DEFAULTS, **row._asdict()} for row in rows]
+
+
+def day(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime("%Y-%m-%d") if value else None
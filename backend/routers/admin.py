@@ -1,14 +1,23 @@
+import json
 from fastapi import APIRouter, Depends, Query, HTTPException, UploadFile, File
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy import select, func, desc, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Literal, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from database import get_db
-from models import Book, BorrowRecord, User
-from schemas import BookResponse, BorrowResponse
+from models import Book, BorrowRecord, BorrowHistory, User, SchedulerLog
+from schemas import BookResponse, BookImportRequest
 from dependencies import get_current_admin
-from services import wx_service
+from loaders import Loaders, get_loaders
+from pagination import KeysetPage
+from projections import borrow_columns, borrow_dicts, day
+from services import (
+    wx_service, cache_service, search_service, circulation_service, stats_service,
+    export_service, import_service, rollup_service, upload_service, cover_service,
+    audit_service
+)
 
 router = APIRouter(prefix="/admin", tags=["管理员"])
 
@@ -18,53 +27,71 @@ async def get_dashboard_stats(
     db: AsyncSession = Depends(get_db),
     admin = Depends(get_current_admin)
 ):
-    """管理首页统计数据"""
-    today = datetime.utcnow().date()
+    """管理首页统计数据（读取计数器，一次查询）"""
+    stats = await stats_service.read(db, [
+        stats_service.BOOKS_TOTAL,
+        stats_service.day_key(stats_service.BOOKS_NEW),
+        stats_service.BORROWS_ACTIVE,
+        stats_service.day_key(stats_service.BORROWS_NEW),
+        stats_service.BORROWS_OVERDUE,
+        stats_service.USERS_TOTAL,
+        stats_service.day_key(stats_service.USERS_NEW),
+    ])
 
-    total_books = await db.scalar(select(func.count(Book.isbn)))
-    new_books_today = await db.scalar(
-        select(func.count(Book.isbn))
-        .where(func.date(Book.created_at) == today)
-    )
+    return {
+        "totalBooks": stats[stats_service.BOOKS_TOTAL],
+        "newBooksToday": stats[stats_service.day_key(stats_service.BOOKS_NEW)],
+        "activeBorrows": stats[stats_service.BORROWS_ACTIVE],
+        "todayBorrows": stats[stats_service.day_key(stats_service.BORROWS_NEW)],
+        "overdueCount": stats[stats_service.BORROWS_OVERDUE],
+        "totalUsers": stats[stats_service.USERS_TOTAL],
+        "newUsersToday": stats[stats_service.day_key(stats_service.USERS_NEW)]
+    }
 
-    active_borrows = await db.scalar(
-        select(func.count(BorrowRecord.id))
-        .where(BorrowRecord.status == "active")
-    )
-    today_borrows = await db.scalar(
-        select(func.count(BorrowRecord.id))
-        .where(func.date(BorrowRecord.borrowed_at) == today)
-    )
 
-    overdue_count = await db.scalar(
-        select(func.count(BorrowRecord.id))
-        .where(
-            BorrowRecord.status == "active",
-            BorrowRecord.due_date < datetime.utcnow()
+@router.get("/trends")
+async def get_borrow_trends(
+    granularity: Literal["day", "week", "month"] = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    yoy: bool = False,
+    db: AsyncSession = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    """
+    借阅趋势（读日汇总表，默认最近30天）
+    yoy=true 时同时返回去年同期数据，用于同比图表
+    """
+    end = end or datetime.utcnow().date() - timedelta(days=1)
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(400, "开始日期不能晚于结束日期")
+
+    data = {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "items": await rollup_service.trends(db, start, end, granularity)
+    }
+    if yoy:
+        data["previous_year"] = await rollup_service.trends(
+            db, _years_ago(start), _years_ago(end), granularity
         )
-    )
+    return data
 
-    total_users = await db.scalar(select(func.count(User.id)))
-    new_users_today = await db.scalar(
-        select(func.count(User.id))
-        .where(func.date(User.created_at) == today)
-    )
 
-    return {
-        "totalBooks": total_books,
-        "newBooksToday": new_books_today,
-        "activeBorrows": active_borrows,
-        "todayBorrows": today_borrows,
-        "overdueCount": overdue_count,
-        "totalUsers": total_users,
-        "newUsersToday": new_users_today
-    }
+def _years_ago(day: date, years: int = 1) -> date:
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:  # 2月29日
+        return day.replace(year=day.year - years, day=28)
 
 
 @router.get("/activities")
 async def list_recent_activities(
     limit: int = Query(10, ge=1, le=50),
     db: AsyncSession = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders),
     admin = Depends(get_current_admin)
 ):
     """最近动态（简版）"""
@@ -72,10 +99,10 @@ async def list_recent_activities(
         select(BorrowRecord).order_by(desc(BorrowRecord.borrowed_at)).limit(limit)
     )
     records = result.scalars().all()
+    titles = await loaders.book_titles.load_many(r.book_isbn for r in records)
 
     activities = []
-    for record in records:
-        book_title = await db.scalar(select(Book.title).where(Book.isbn == record.book_isbn))
+    for record, book_title in zip(records, titles):
         action = "归还" if record.status == "returned" else "借阅"
         activities.append({
             "id": record.id,
@@ -89,51 +116,95 @@ async def list_recent_activities(
 @router.get("/export")
 async def export_data(
     type: Literal["books", "borrows", "overdue"] = "books",
+    gzip: bool = False,
+    start: Optional[datetime] = Query(None, description="借阅时间起（含）"),
+    end: Optional[datetime] = Query(None, description="借阅时间止（不含）"),
     admin = Depends(get_current_admin)
 ):
-    """导出数据（返回下载链接占位）"""
-    return {
-        "type": type,
-        "download_url": f"https://example.com/export/{type}.csv"
-    }
+    """导出数据（CSV流式下载，可选gzip压缩）"""
+    filename = f"{type}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.csv"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}.gz"'
+
+    return StreamingResponse(
+        export_service.iter_csv(type, gzip=gzip, start=start, end=end),
+        media_type="application/gzip" if gzip else "text/csv; charset=utf-8",
+        headers=headers
+    )
 
 
 @router.get("/books")
 async def list_books_admin(
-    page: int = 1,
-    limit: int = 20,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
     keyword: str = None,
     filter: Literal["all", "low", "zero"] = "all",
+    with_total: bool = False,
     db: AsyncSession = Depends(get_db),
     admin = Depends(get_current_admin)
 ):
-    """图书列表（管理端）"""
+    """图书列表（管理端，游标分页；总数按需计算）"""
     query = select(Book)
 
-    if keyword:
-        query = query.where(
-            (Book.title.ilike(f"%{keyword}%")) |
-            (Book.isbn.ilike(f"%{keyword}%"))
-        )
+    if keyword and keyword.strip():
+        query = query.where(search_service.match_condition(keyword))
 
     if filter == "low":
         query = query.where(and_(Book.stock > 0, Book.stock < 3))
     elif filter == "zero":
         query = query.where(Book.stock == 0)
 
-    total = await db.scalar(select(func.count()).select_from(query.subquery()))
-    query = query.order_by(desc(Book.created_at)).offset((page - 1) * limit).limit(limit)
+    total = None
+    if with_total:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
 
-    result = await db.execute(query)
-    books = result.scalars().all()
+    page = KeysetPage(Book.created_at, Book.isbn, limit, cursor)
+    result = await db.execute(page.apply(query))
+    books, next_cursor = page.split(result.scalars().all(), lambda b: (b.created_at, b.isbn))
 
     return {
         "items": [BookResponse.model_validate(b) for b in books],
-        "total": total,
-        "page": page
+        "next_cursor": next_cursor,
+        "total": total
     }
 
 
+@router.post("/books/import")
+async def import_books(
+    file: UploadFile = File(...),
+    mode: Literal["add", "skip"] = "add",
+    db: AsyncSession = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    """
+    批量导入图书（CSV 或 JSON 文件）
+    CSV表头支持英文字段名或导出文件的中文表头；缺书名的行按ISBN自动补齐信息
+    """
+    content = await file.read()
+    if (file.filename or "").lower().endswith(".json"):
+        rows = import_service.parse_json(content)
+    else:
+        try:
+            rows = import_service.parse_csv(content)
+        except UnicodeDecodeError:
+            raise HTTPException(400, "文件需为UTF-8编码")
+
+    return await import_service.import_rows(db, rows, mode=mode)
+
+
+@router.post("/books/import/isbns")
+async def import_books_by_isbn(
+    req: BookImportRequest,
+    mode: Literal["add", "skip"] = "add",
+    db: AsyncSession = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    """按扫码得到的ISBN列表批量入库（图书信息自动查询）"""
+    rows = [{"isbn": isbn} for isbn in req.isbns]
+    return await import_service.import_rows(db, rows, mode=mode, default_stock=req.stock)
+
+
 @router.delete("/books/{isbn}")
 async def delete_book(
     isbn: str,
@@ -154,6 +225,9 @@ async def delete_book(
         raise HTTPException(404, "图书不存在")
 
     await db.delete(book)
+    await stats_service.incr(db, {stats_service.BOOKS_TOTAL: -1})
+    cache_service.mark_books_dirty(db, isbn)
+    audit_service.add(db, "book_delete", "book", isbn, {"title": book.title, "total": book.total})
     return {"message": "已删除"}
 
 
@@ -170,9 +244,14 @@ async def modify_stock(
     if not book:
         raise HTTPException(404, "图书不存在")
 
+    before = {"stock": book.stock, "total": book.total}
     book.stock = stock
     if stock > book.total:
         book.total = stock
+    cache_service.mark_books_dirty(db, isbn)
+    audit_service.add(db, "book_stock", "book", isbn, {
+        "before": before, "after": {"stock": book.stock, "total": book.total}
+    })
 
     return {"stock": book.stock, "total": book.total}
 
@@ -180,34 +259,32 @@ async def modify_stock(
 @router.get("/borrows")
 async def list_borrows_admin(
     status: Literal["active", "returned", "overdue"] = "active",
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
     db: AsyncSession = Depends(get_db),
     admin = Depends(get_current_admin)
 ):
-    """借阅列表（管理端）"""
-    query = select(BorrowRecord, Book.title.label("book_title"))
-    query = query.join(Book, BorrowRecord.book_isbn == Book.isbn)
+    """借阅列表（管理端，游标分页；已归还的记录包含归档）"""
+    table = BorrowHistory if status == "returned" else BorrowRecord.__table__
+    t = table.c
+    query = select(*borrow_columns(table), Book.title.label("book_title"))
+    query = query.join(Book, t.book_isbn == Book.isbn)
 
     if status == "active":
-        query = query.where(BorrowRecord.status == "active")
+        query = query.where(t.status == "active")
     elif status == "returned":
-        query = query.where(BorrowRecord.status == "returned")
+        query = query.where(t.status == "returned")
     elif status == "overdue":
         query = query.where(
-            BorrowRecord.status == "active",
-            BorrowRecord.due_date < datetime.utcnow()
+            t.status == "active",
+            t.due_date < datetime.utcnow()
         )
 
-    query = query.order_by(desc(BorrowRecord.borrowed_at))
-    result = await db.execute(query)
-    rows = result.all()
+    page = KeysetPage(t.borrowed_at, t.id, limit, cursor)
+    result = await db.execute(page.apply(query))
+    rows, next_cursor = page.split(result.all(), lambda r: (r.borrowed_at, r.id))
 
-    return [
-        {
-            **BorrowResponse.model_validate(row[0]).model_dump(),
-            "book_title": row[1]
-        }
-        for row in rows
-    ]
+    return ORJSONResponse({"items": borrow_dicts(rows), "next_cursor": next_cursor})
 
 
 @router.get("/borrows/counts")
@@ -216,15 +293,16 @@ async def borrows_counts(
     admin = Depends(get_current_admin)
 ):
     """借阅状态统计"""
-    active = await db.scalar(select(func.count(BorrowRecord.id)).where(BorrowRecord.status == "active"))
-    returned = await db.scalar(select(func.count(BorrowRecord.id)).where(BorrowRecord.status == "returned"))
-    overdue = await db.scalar(
-        select(func.count(BorrowRecord.id)).where(
-            BorrowRecord.status == "active",
-            BorrowRecord.due_date < datetime.utcnow()
-        )
-    )
-    return {"active": active, "returned": returned, "overdue": overdue}
+    stats = await stats_service.read(db, [
+        stats_service.BORROWS_ACTIVE,
+        stats_service.BORROWS_RETURNED,
+        stats_service.BORROWS_OVERDUE,
+    ])
+    return {
+        "active": stats[stats_service.BORROWS_ACTIVE],
+        "returned": stats[stats_service.BORROWS_RETURNED],
+        "overdue": stats[stats_service.BORROWS_OVERDUE]
+    }
 
 
 @router.post("/borrows/{borrow_id}/remind")
@@ -263,21 +341,15 @@ async def force_return(
     admin = Depends(get_current_admin)
 ):
     """管理员强制归还"""
-    result = await db.execute(
-        select(BorrowRecord).where(BorrowRecord.id == borrow_id)
-    )
-    borrow = result.scalar_one_or_none()
-    if not borrow or borrow.status != "active":
-        raise HTTPException(400, "无效的记录")
-
-    borrow.status = "returned"
-    borrow.returned_at = datetime.utcnow()
-
-    book_result = await db.execute(
-        select(Book).where(Book.isbn == borrow.book_isbn)
-    )
-    book = book_result.scalar_one()
-    book.stock += 1
+    try:
+        record = await circulation_service.checkin(db, borrow_id, return_method="admin")
+    except HTTPException as e:
+        if e.status_code in (400, 404):
+            raise HTTPException(400, "无效的记录")
+        raise
+    audit_service.add(db, "borrow_force_return", "borrow", borrow_id, {
+        "user_id": record.user_id, "isbn": record.book_isbn
+    })
 
     return {"message": "已强制归还"}
 
@@ -296,30 +368,47 @@ async def batch_remind_overdue(
 @router.get("/books/{isbn}/history")
 async def get_book_borrow_history(
     isbn: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
     db: AsyncSession = Depends(get_db),
     admin = Depends(get_current_admin)
 ):
-    """获取图书借阅历史"""
-    result = await db.execute(
-        select(BorrowRecord, User.nickname)
-        .join(User, BorrowRecord.user_id == User.id)
-        .where(BorrowRecord.book_isbn == isbn)
-        .order_by(desc(BorrowRecord.borrowed_at))
-    )
-    rows = result.all()
-
-    return [
-        {
-            "id": row[0].id,
-            "user_id": row[0].user_id,
-            "user_nickname": row[1],
-            "borrowed_at": row[0].borrowed_at.strftime("%Y-%m-%d"),
-            "due_date": row[0].due_date.strftime("%Y-%m-%d"),
-            "returned_at": row[0].returned_at.strftime("%Y-%m-%d") if row[0].returned_at else None,
-            "status": row[0].status
-        }
-        for row in rows
-    ]
+    """获取图书借阅历史（游标分页，附带汇总；包含归档记录）"""
+    h = BorrowHistory.c
+    page = KeysetPage(h.borrowed_at, h.id, limit, cursor)
+    result = await db.execute(page.apply(
+        select(
+            h.id, h.user_id, User.nickname, h.borrowed_at,
+            h.due_date, h.returned_at, h.status
+        )
+        .join(User, h.user_id == User.id)
+        .where(h.book_isbn == isbn)
+    ))
+    rows, next_cursor = page.split(result.all(), lambda r: (r.borrowed_at, r.id))
+
+    total, active = (await db.execute(
+        select(
+            func.count(h.id),
+            func.count(h.id).filter(h.status == "active")
+        ).where(h.book_isbn == isbn)
+    )).one()
+
+    return ORJSONResponse({
+        "items": [
+            {
+                "id": row.id,
+                "user_id": row.user_id,
+                "user_nickname": row.nickname,
+                "borrowed_at": day(row.borrowed_at),
+                "due_date": day(row.due_date),
+                "returned_at": day(row.returned_at),
+                "status": row.status
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor,
+        "stats": {"total": total, "active": active}
+    })
 
 
 @router.put("/books/{isbn}")
@@ -336,11 +425,14 @@ async def update_book(
         raise HTTPException(404, "图书不存在")
 
     allowed_fields = ['title', 'author', 'publisher', 'publish_date', 'stock', 'cover_url', 'summary', 'tags']
-    for field in allowed_fields:
-        if field in book_data:
-            setattr(book, field, book_data[field])
+    changed = {f: book_data[f] for f in allowed_fields if f in book_data}
+    for field, value in changed.items():
+        setattr(book, field, value)
 
     await db.flush()
+    cache_service.mark_books_dirty(db, isbn)
+    cover_service.schedule_prefetch([book.cover_url])
+    audit_service.add(db, "book_update", "book", isbn, {"fields": sorted(changed)})
     return {"message": "更新成功"}
 
 
@@ -349,20 +441,8 @@ async def upload_file(
     file: UploadFile = File(...),
     admin = Depends(get_current_admin)
 ):
-    """上传图片（保存到本地或OSS）"""
-    import uuid
-    from pathlib import Path
-
-    file_ext = Path(file.filename).suffix
-    filename = f"{uuid.uuid4()}{file_ext}"
-    filepath = f"uploads/{filename}"
-
-    Path("uploads").mkdir(exist_ok=True)
-    with open(filepath, "wb") as f:
-        content = await file.read()
-        f.write(content)
-
-    return {"url": f"/static/{filename}"}
+    """上传图片（返回原图与列表/详情缩略图地址）"""
+    return await upload_service.save_image(file)
 
 
 @router.get("/users/stats")
@@ -371,32 +451,31 @@ async def get_user_stats(
     admin = Depends(get_current_admin)
 ):
     """用户统计"""
-    total = await db.scalar(select(func.count(User.id)))
-    admins = await db.scalar(select(func.count(User.id)).where(User.is_admin == 1))
-
-    today = datetime.utcnow().date()
-    active_today = await db.scalar(
-        select(func.count(func.distinct(BorrowRecord.user_id)))
-        .where(func.date(BorrowRecord.borrowed_at) == today)
-    )
+    stats = await stats_service.read(db, [
+        stats_service.USERS_TOTAL,
+        stats_service.USERS_ADMIN,
+        stats_service.day_key(stats_service.BORROWERS),
+    ])
 
     return {
-        "total": total,
-        "admins": admins,
-        "active_today": active_today
+        "total": stats[stats_service.USERS_TOTAL],
+        "admins": stats[stats_service.USERS_ADMIN],
+        "active_today": stats[stats_service.day_key(stats_service.BORROWERS)]
     }
 
 
 @router.get("/users")
 async def list_users(
-    page: int = 1,
-    limit: int = 20,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
     keyword: Optional[str] = None,
     filter: Literal["all", "admin", "recent"] = "all",
+    with_total: bool = False,
     db: AsyncSession = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders),
     admin = Depends(get_current_admin)
 ):
-    """用户列表"""
+    """用户列表（游标分页；总数按需计算）"""
     query = select(User)
 
     if keyword:
@@ -413,22 +492,21 @@ async def list_users(
         week_ago = datetime.utcnow() - timedelta(days=7)
         query = query.where(User.created_at >= week_ago)
 
-    query = query.order_by(desc(User.created_at))
-    query = query.offset((page - 1) * limit).limit(limit)
+    total = None
+    if with_total:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
 
-    result = await db.execute(query)
-    users = result.scalars().all()
+    page = KeysetPage(User.created_at, User.id, limit, cursor)
+    result = await db.execute(page.apply(query))
+    users, next_cursor = page.split(result.scalars().all(), lambda u: (u.created_at, u.id))
+
+    # 借阅数按用户一次 GROUP BY 汇总
+    counts = await loaders.user_borrow_counts.load_many(u.id for u in users)
 
     user_list = []
-    for user in users:
-        total_borrows = await db.scalar(
-            select(func.count(BorrowRecord.id))
-            .where(BorrowRecord.user_id == user.id)
-        )
-        current_borrows = await db.scalar(
-            select(func.count(BorrowRecord.id))
-            .where(BorrowRecord.user_id == user.id, BorrowRecord.status == "active")
-        )
+    for user, count in zip(users, counts):
+        total_borrows = count["total"]
+        current_borrows = count["active"]
 
         user_list.append({
             "id": user.id,
@@ -444,46 +522,62 @@ async def list_users(
 
     return {
         "items": user_list,
-        "total": await db.scalar(select(func.count()).select_from(select(User).subquery()))
+        "next_cursor": next_cursor,
+        "total": total
     }
 
 
 @router.get("/users/{user_id}/borrows")
 async def user_borrows(
     user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
     db: AsyncSession = Depends(get_db),
     admin = Depends(get_current_admin)
 ):
-    """用户借阅记录"""
-    result = await db.execute(
-        select(BorrowRecord, Book.title.label("book_title"))
-        .join(Book, BorrowRecord.book_isbn == Book.isbn)
-        .where(BorrowRecord.user_id == user_id)
-        .order_by(desc(BorrowRecord.borrowed_at))
-    )
-    rows = result.all()
-
-    records = []
-    for row in rows:
-        borrow = row[0]
-        records.append({
-            "id": borrow.id,
-            "book_isbn": borrow.book_isbn,
-            "book_title": row[1],
-            "borrowed_at": borrow.borrowed_at.strftime("%Y-%m-%d") if borrow.borrowed_at else None,
-            "due_date": borrow.due_date.strftime("%Y-%m-%d") if borrow.due_date else None,
-            "returned_at": borrow.returned_at.strftime("%Y-%m-%d") if borrow.returned_at else None,
-            "status": borrow.status
-        })
+    """用户借阅记录（游标分页，附带汇总；包含归档记录）"""
+    h = BorrowHistory.c
+    page = KeysetPage(h.borrowed_at, h.id, limit, cursor)
+    result = await db.execute(page.apply(
+        select(
+            h.id, h.book_isbn, Book.title, h.borrowed_at,
+            h.due_date, h.returned_at, h.status
+        )
+        .join(Book, h.book_isbn == Book.isbn)
+        .where(h.user_id == user_id)
+    ))
+    rows, next_cursor = page.split(result.all(), lambda r: (r.borrowed_at, r.id))
 
-    return {
+    records = [
+        {
+            "id": row.id,
+            "book_isbn": row.book_isbn,
+            "book_title": row.title,
+            "borrowed_at": day(row.borrowed_at),
+            "due_date": day(row.due_date),
+            "returned_at": day(row.returned_at),
+            "status": row.status
+        }
+        for row in rows
+    ]
+
+    total, active, returned = (await db.execute(
+        select(
+            func.count(h.id),
+            func.count(h.id).filter(h.status == "active"),
+            func.count(h.id).filter(h.status == "returned")
+        ).where(h.user_id == user_id)
+    )).one()
+
+    return ORJSONResponse({
         "records": records,
+        "next_cursor": next_cursor,
         "stats": {
-            "total": len(records),
-            "active": len([r for r in records if r["status"] == "active"]),
-            "returned": len([r for r in records if r["status"] == "returned"])
+            "total": total,
+            "active": active,
+            "returned": returned
         }
-    }
+    })
 
 
 @router.put("/users/{user_id}/admin")
@@ -503,8 +597,12 @@ async def set_user_admin(
     if user.id == admin.id and not is_admin:
         raise HTTPException(400, "不能取消自己的管理员权限")
 
+    delta = int(is_admin) - int(user.is_admin == 1)
     user.is_admin = 1 if is_admin else 0
     await db.flush()
+    await stats_service.incr(db, {stats_service.USERS_ADMIN: delta})
+    cache_service.mark_users_dirty(db, user.openid)
+    audit_service.add(db, "user_set_admin", "user", user_id, {"is_admin": is_admin})
 
     return {"is_admin": is_admin}
 
@@ -516,4 +614,78 @@ async def ban_user(
     admin = Depends(get_current_admin)
 ):
     """禁用用户（添加 banned 字段到模型，或软删除）"""
+    # 实现时修改 User.status 后需调用 cache_service.mark_users_dirty(db, user.openid)
     raise HTTPException(501, "功能开发中，需扩展用户模型")
+
+
+@router.get("/jobs/runs")
+async def list_job_runs(
+    job_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    """定时任务最近执行记录"""
+    query = select(SchedulerLog).order_by(desc(SchedulerLog.started_at)).limit(limit)
+    if job_id:
+        query = query.where(SchedulerLog.job_id == job_id)
+    result = await db.execute(query)
+
+    items = []
+    for log in result.scalars().all():
+        try:
+            detail = json.loads(log.result) if log.result else {}
+        except ValueError:
+            detail = {"raw": log.result}
+        items.append({
+            "id": log.id,
+            "job_id": log.job_id,
+            "job_name": log.job_name,
+            "status": log.status,
+            "started_at": log.started_at,
+            "finished_at": log.finished_at,
+            "duration_ms": detail.pop("duration_ms", None),
+            "counts": detail,
+            "error": log.error
+        })
+    return items
+
+
+@router.get("/jobs/stats")
+async def job_duration_stats(
+    days: int = Query(7, ge=1, le=90),
+    db: AsyncSession = Depends(get_db),
+    admin = Depends(get_current_admin)
+):
+    """各任务执行次数、失败次数与耗时 p50/p95（秒）"""
+    since = datetime.utcnow() - timedelta(days=days)
+    # 运行中的记录 finished_at 为空，耗时为 NULL，不参与分位数计算
+    duration = func.extract("epoch", SchedulerLog.finished_at - SchedulerLog.started_at)
+
+    result = await db.execute(
+        select(
+            SchedulerLog.job_id,
+            func.max(SchedulerLog.job_name),
+            func.count(SchedulerLog.id),
+            func.count(SchedulerLog.id).filter(SchedulerLog.status == "failed"),
+            func.percentile_cont(0.5).within_group(duration),
+            func.percentile_cont(0.95).within_group(duration),
+            func.max(SchedulerLog.started_at),
+        )
+        .where(SchedulerLog.started_at >= since)
+        .group_by(SchedulerLog.job_id)
+        .order_by(SchedulerLog.job_id)
+    )
+
+    return [
+        {
+            "job_id": job_id,
+            "job_name": job_name,
+            "runs": runs,
+            "failed": failed,
+            "p50_seconds": round(p50, 3) if p50 is not None else None,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "last_started_at": last_started
+        }
+        for job_id, job_name, runs, failed, p50, p95, last_started in result.all()
+    ]
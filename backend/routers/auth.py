@@ -7,6 +7,8 @@ from database import get_db
 from models import User
 from schemas import WxLoginRequest, TokenResponse, UserResponse
 from dependencies import create_access_token
+from services.stats_service import stats_service
+from services.http_client import http_clients
 from config import get_settings
 
 router = APIRouter(prefix="/auth", tags=["认证"])
@@ -25,7 +27,6 @@ async def wx_login(
     3. 返回JWT token
     """
     # 调用微信接口
-    url = "https://api.weixin.qq.com/sns/jscode2session"
     params = {
         "appid": settings.WX_APPID,
         "secret": settings.WX_SECRET,
@@ -33,9 +34,11 @@ async def wx_login(
         "grant_type": "authorization_code"
     }
     
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, params=params)
+    try:
+        resp = await http_clients.get("wx", "/sns/jscode2session", params=params)
         wx_data = resp.json()
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="微信登录服务暂时不可用")
     
     if "openid" not in wx_data:
         raise HTTPException(
@@ -56,6 +59,10 @@ async def wx_login(
         db.add(user)
         await db.flush()  # 获取id
         await db.refresh(user)
+        await stats_service.incr(db, {
+            stats_service.USERS_TOTAL: 1,
+            stats_service.day_key(stats_service.USERS_NEW): 1,
+        })
     
     # 生成JWT
     token = create_access_token(openid)
@@ -1,72 +1,112 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc, func
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from database import get_db
+import http_cache
+from database import get_db, async_session_maker
 from models import Book, BorrowRecord
 from schemas import BookCreate, BookResponse, BookSearchResult
 from dependencies import get_current_user, get_current_admin
 from services.isbn_service import isbn_service
+from services.cache_service import cache_service
+from services.search_service import search_service
+from services.stats_service import stats_service
+from services.cover_service import cover_service
 
 router = APIRouter(prefix="/books", tags=["图书"])
 
 
-@router.get("/recent", response_model=List[BookSearchResult])
-async def get_recent_books(
-    limit: int = Query(5, ge=1, le=20),
-    db: AsyncSession = Depends(get_db)
-):
-    """获取最近上架的图书"""
-    result = await db.execute(
-        select(Book)
-        .order_by(desc(Book.created_at))
-        .limit(limit)
-    )
-    books = result.scalars().all()
-    
-    return [
+def _list_entry(books) -> dict:
+    """列表缓存条目：ETag 由结果中每本书的 (isbn, updated_at) 计算，库存变化也会更新"""
+    items = [
         BookSearchResult(
             isbn=b.isbn,
             title=b.title,
             author=b.author,
             cover_url=b.cover_url,
+            cover_thumb=cover_service.proxy_path(b.isbn, b.cover_url),
             stock=b.stock
-        ) for b in books
+        ).model_dump(mode="json") for b in books
     ]
+    return http_cache.entry(
+        items,
+        http_cache.make_etag(*((b.isbn, b.updated_at) for b in books)),
+        http_cache.latest(b.updated_at for b in books)
+    )
+
+
+@router.get("/recent", response_model=List[BookSearchResult])
+async def get_recent_books(
+    request: Request,
+    limit: int = Query(5, ge=1, le=20),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取最近上架的图书（支持 If-None-Match 条件请求）"""
+    cache_key = await cache_service.book_list_key("recent", limit)
+    entry = http_cache.load_entry(await cache_service.get_json(cache_key))
+    if entry is None:
+        result = await db.execute(
+            select(Book)
+            .order_by(desc(Book.created_at))
+            .limit(limit)
+        )
+        entry = _list_entry(result.scalars().all())
+        await cache_service.set_json(cache_key, entry)
+        entry = http_cache.load_entry(entry)
+
+    return http_cache.respond(request, entry["data"], entry["etag"], entry["last_modified"])
 
 
 @router.get("/{isbn}", response_model=BookResponse)
 async def get_book_detail(
     isbn: str,
+    request: Request,
     db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
-    获取图书详情
+    获取图书详情（支持 If-None-Match 条件请求）
     同时检查当前用户是否已借该书
     """
-    result = await db.execute(select(Book).where(Book.isbn == isbn))
-    book = result.scalar_one_or_none()
-    
-    if not book:
-        raise HTTPException(status_code=404, detail="图书不存在")
+    cache_key = cache_service.book_detail_key(isbn)
+    entry = http_cache.load_entry(await cache_service.get_json(cache_key))
+
+    if entry is None:
+        result = await db.execute(select(Book).where(Book.isbn == isbn))
+        book = result.scalar_one_or_none()
+
+        if not book:
+            raise HTTPException(status_code=404, detail="图书不存在")
+
+        book_data = BookResponse.model_validate(book).model_dump(mode="json")
+        book_data["cover_thumb"] = cover_service.proxy_path(isbn, book.cover_url, "detail")
+        entry = http_cache.entry(
+            book_data, http_cache.make_etag(book.isbn, book.updated_at), book.updated_at
+        )
+        await cache_service.set_json(cache_key, entry)
+        entry = http_cache.load_entry(entry)
     
     # 检查当前用户是否借了这本书
-    borrow_result = await db.execute(
-        select(BorrowRecord).where(
+    active_borrow_id = await db.scalar(
+        select(BorrowRecord.id).where(
             BorrowRecord.book_isbn == isbn,
             BorrowRecord.user_id == current_user.id,
             BorrowRecord.status == "active"
         )
     )
-    active_borrow = borrow_result.scalar_one_or_none()
     
-    # 构造响应
-    response_data = BookResponse.model_validate(book)
-    response_data.user_borrow_id = active_borrow.id if active_borrow else None
-    
-    return response_data
+    # 缓存中的图书信息与用户无关，借阅状态单独查询并计入 ETag
+    etag = http_cache.make_etag(entry["etag"], active_borrow_id)
+    if http_cache.is_fresh(request, etag, entry["last_modified"]):
+        return http_cache.not_modified(etag, entry["last_modified"], http_cache.PRIVATE)
+
+    book_data = entry["data"]
+    book_data["user_borrow_id"] = active_borrow_id
+    return http_cache.respond(
+        request, book_data, etag, entry["last_modified"], http_cache.PRIVATE
+    )
 
 
 @router.post("", response_model=BookResponse)
@@ -83,47 +123,87 @@ async def create_book(
     
     # 如果信息不全，自动查询ISBN
     if not book_data.title or book_data.title == book_data.isbn:
-        isbn_info = await isbn_service.query_douban(book_data.isbn)
-        if not isbn_info:
-            isbn_info = await isbn_service.query_openlibrary(book_data.isbn)
+        isbn_info = await isbn_service.lookup(db, book_data.isbn)
         
         if isbn_info:
-            book_data = BookCreate(**isbn_info, stock=book_data.stock)
+            book_data = BookCreate(**isbn_info, stock=book_data.stock, total=book_data.total)
     
     # 创建图书记录
     book = Book(**book_data.model_dump())
     db.add(book)
     await db.flush()
     await db.refresh(book)
+    await stats_service.incr(db, {
+        stats_service.BOOKS_TOTAL: 1,
+        stats_service.day_key(stats_service.BOOKS_NEW): 1,
+    })
+    cache_service.mark_books_dirty(db, book.isbn)
+    cover_service.schedule_prefetch([book.cover_url])
     
     return book
 
 
+@router.get("/{isbn}/cover/{variant}.{fmt}")
+async def get_book_cover(
+    isbn: str,
+    variant: Literal["list", "detail"],
+    fmt: Literal["webp", "jpg"],
+    request: Request,
+    v: Optional[str] = None
+):
+    """
+    封面缩略图（本地代理第三方封面，首次访问时拉取）
+    地址带当前版本 v 时可永久缓存；拉取失败时重定向到原地址
+    """
+    # 只在查询封面地址时占用连接，拉取上游图片期间不持有会话
+    async with async_session_maker() as db:
+        cover_url = await db.scalar(select(Book.cover_url).where(Book.isbn == isbn))
+    if not cover_service.is_remote(cover_url):
+        raise HTTPException(status_code=404, detail="无封面")
+
+    key = cover_service.key_for(cover_url)
+    etag = f'"{key}-{variant}.{fmt}"'
+    cache_control = (
+        "public, max-age=31536000, immutable" if v == key else "public, max-age=3600"
+    )
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    if not await cover_service.ensure(cover_url):
+        return RedirectResponse(cover_url, headers={"Cache-Control": "no-cache"})
+
+    return FileResponse(
+        cover_service.file_for(key, variant, fmt),
+        media_type="image/webp" if fmt == "webp" else "image/jpeg",
+        headers=headers
+    )
+
+
 @router.get("", response_model=List[BookSearchResult])
 async def search_books(
+    request: Request,
     keyword: Optional[str] = Query(None, description="书名/ISBN/作者关键词"),
     db: AsyncSession = Depends(get_db)
 ):
-    """搜索图书"""
-    query = select(Book)
-    
-    if keyword:
-        # PostgreSQL ILIKE 不区分大小写
-        query = query.where(
-            (Book.title.ilike(f"%{keyword}%")) |
-            (Book.isbn.ilike(f"%{keyword}%")) |
-            (Book.author.ilike(f"%{keyword}%"))
-        )
-    
-    result = await db.execute(query.order_by(desc(Book.created_at)).limit(20))
-    books = result.scalars().all()
-    
-    return [
-        BookSearchResult(
-            isbn=b.isbn,
-            title=b.title,
-            author=b.author,
-            cover_url=b.cover_url,
-            stock=b.stock
-        ) for b in books
-    ]
+    """搜索图书（支持 If-None-Match 条件请求）"""
+    cache_key = await cache_service.book_list_key("search", keyword or "")
+    entry = http_cache.load_entry(await cache_service.get_json(cache_key))
+    if entry is None:
+        query = select(Book)
+        
+        if keyword and keyword.strip():
+            # 全文 + 三元组索引检索，按相关度排序
+            query = query.where(search_service.match_condition(keyword)).order_by(
+                desc(search_service.rank_expression(keyword)),
+                desc(Book.created_at)
+            )
+        else:
+            query = query.order_by(desc(Book.created_at))
+        
+        result = await db.execute(query.limit(20))
+        entry = _list_entry(result.scalars().all())
+        await cache_service.set_json(cache_key, entry)
+        entry = http_cache.load_entry(entry)
+
+    return http_cache.respond(request, entry["data"], entry["etag"], entry["last_modified"])
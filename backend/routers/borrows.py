@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, and_
-from datetime import datetime, timedelta
+from sqlalchemy import select, desc, and_, func
+from datetime import datetime
 from typing import List, Literal
 
+import http_cache
 from database import get_db
-from models import BorrowRecord, Book, User
-from schemas import BorrowCreate, BorrowResponse
+from models import BorrowRecord, BorrowHistory, Book
+from schemas import (
+    BorrowCreate, BorrowResponse, BorrowBatchCreate, BorrowBatchReturn, BorrowBatchResult
+)
 from dependencies import get_current_user, get_current_admin
+from loaders import Loaders, get_loaders
+from projections import borrow_columns, borrow_dicts
+from services.circulation_service import circulation_service
 
 router = APIRouter(prefix="/borrows", tags=["借阅"])
 
@@ -18,48 +24,29 @@ async def borrow_book(
     db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """借阅图书"""
-    # 检查图书是否存在且有库存
-    result = await db.execute(select(Book).where(Book.isbn == req.isbn))
-    book = result.scalar_one_or_none()
-    
-    if not book:
-        raise HTTPException(status_code=404, detail="图书不存在")
-    
-    if book.stock < 1:
-        raise HTTPException(status_code=400, detail="该图书暂无库存")
-    
-    # 检查是否已借过（不允许重复借同一本）
-    existing = await db.execute(
-        select(BorrowRecord).where(
-            BorrowRecord.book_isbn == req.isbn,
-            BorrowRecord.user_id == current_user.id,
-            BorrowRecord.status == "active"
-        )
-    )
-    if existing.scalar_one_or_none():
-        raise HTTPException(status_code=400, detail="您已借阅该图书，请勿重复借阅")
-    
-    # 创建借阅记录
-    due_date = datetime.utcnow() + timedelta(days=30)  # 默认30天归还
-    
-    borrow = BorrowRecord(
-        user_id=current_user.id,
-        book_isbn=req.isbn,
-        due_date=due_date
-    )
-    
-    # 减少库存
-    book.stock -= 1
-    
-    db.add(borrow)
-    await db.flush()
-    await db.refresh(borrow)
-    
-    # 构造响应（包含书名）
-    response = BorrowResponse.model_validate(borrow)
-    response.book_title = book.title
-    return response
+    """借阅图书（库存扣减与借阅记录写入为同一条语句）"""
+    return await circulation_service.checkout(db, current_user.id, req.isbn)
+
+
+@router.post("/batch", response_model=BorrowBatchResult)
+async def borrow_books_batch(
+    req: BorrowBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """批量借阅（前台连续扫码），一个事务内完成，逐本返回结果"""
+    return await circulation_service.checkout_many(db, current_user.id, req.isbns)
+
+
+@router.put("/batch/return", response_model=BorrowBatchResult)
+async def return_books_batch(
+    req: BorrowBatchReturn,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """批量归还，一个事务内完成，逐条返回结果"""
+    owner_id = None if current_user.is_admin else current_user.id
+    return await circulation_service.checkin_many(db, req.borrow_ids, user_id=owner_id)
 
 
 @router.put("/{borrow_id}/return", response_model=BorrowResponse)
@@ -69,69 +56,48 @@ async def return_book(
     current_user = Depends(get_current_user)
 ):
     """归还图书（扫码或手动）"""
-    result = await db.execute(
-        select(BorrowRecord).where(BorrowRecord.id == borrow_id)
-    )
-    borrow = result.scalar_one_or_none()
-    
-    if not borrow:
-        raise HTTPException(status_code=404, detail="借阅记录不存在")
-    
     # 权限检查：只能还自己的书，管理员可以还任何书
-    if borrow.user_id != current_user.id and not current_user.is_admin:
-        raise HTTPException(status_code=403, detail="无权归还他人图书")
-    
-    if borrow.status != "active":
-        raise HTTPException(status_code=400, detail="该图书已归还")
-    
-    # 更新借阅记录
-    borrow.returned_at = datetime.utcnow()
-    borrow.status = "returned"
-    
-    # 增加库存
-    result = await db.execute(select(Book).where(Book.isbn == borrow.book_isbn))
-    book = result.scalar_one()
-    book.stock += 1
-    
-    await db.flush()
-    
-    response = BorrowResponse.model_validate(borrow)
-    response.book_title = book.title
-    return response
+    owner_id = None if current_user.is_admin else current_user.id
+    return await circulation_service.checkin(db, borrow_id, user_id=owner_id)
 
 
 @router.get("/my", response_model=List[BorrowResponse])
 async def my_borrows(
+    request: Request,
     status: Literal["active", "returned", "all"] = "active",
     db: AsyncSession = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """获取我的借阅列表"""
-    query = select(BorrowRecord).where(BorrowRecord.user_id == current_user.id)
+    """获取我的借阅列表（支持 If-None-Match 条件请求；已归还的记录包含归档）"""
+    # 在借记录只查借阅表，涉及已归还时查含归档的历史视图
+    table = BorrowRecord.__table__ if status == "active" else BorrowHistory
+    t = table.c
+    conditions = [t.user_id == current_user.id]
     
     if status == "active":
-        query = query.where(BorrowRecord.status == "active")
+        conditions.append(t.status == "active")
     elif status == "returned":
-        query = query.where(BorrowRecord.status == "returned")
+        conditions.append(t.status == "returned")
     # all则不过滤
     
-    query = query.order_by(desc(BorrowRecord.borrowed_at))
-    result = await db.execute(query)
-    records = result.scalars().all()
+    # 先查行版本（条数 + 最新 updated_at），未变化时直接返回304，不加载记录
+    count, last_modified = (await db.execute(
+        select(func.count(t.id), func.max(t.updated_at))
+        .where(*conditions)
+    )).one()
+    etag = http_cache.make_etag(current_user.id, status, count, last_modified)
+    if http_cache.is_fresh(request, etag, last_modified):
+        return http_cache.not_modified(etag, last_modified, http_cache.PRIVATE)
     
-    # 关联查询书名
-    responses = []
-    for record in records:
-        book_result = await db.execute(
-            select(Book.title).where(Book.isbn == record.book_isbn)
-        )
-        title = book_result.scalar()
-        
-        resp = BorrowResponse.model_validate(record)
-        resp.book_title = title
-        responses.append(resp)
+    result = await db.execute(
+        select(*borrow_columns(table), Book.title.label("book_title"))
+        .join(Book, t.book_isbn == Book.isbn)
+        .where(*conditions)
+        .order_by(desc(t.borrowed_at))
+    )
+    responses = borrow_dicts(result.all())
     
-    return responses
+    return http_cache.respond(request, responses, etag, last_modified, http_cache.PRIVATE)
 
 
 # ========== 管理员接口 ==========
@@ -139,6 +105,7 @@ async def my_borrows(
 @router.get("/admin/overdue", response_model=List[BorrowResponse])
 async def get_overdue_books(
     db: AsyncSession = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders),
     current_admin = Depends(get_current_admin)
 ):
     """获取逾期未还列表（管理员）"""
@@ -152,19 +119,15 @@ async def get_overdue_books(
     )
     records = result.scalars().all()
     
-    # 补充书名和用户信息
+    # 补充书名和用户信息（各一次批量查询）
+    titles = await loaders.book_titles.load_many(r.book_isbn for r in records)
+    nicknames = await loaders.user_nicknames.load_many(r.user_id for r in records)
+    
     responses = []
-    for record in records:
-        book_r = await db.execute(
-            select(Book.title).where(Book.isbn == record.book_isbn)
-        )
-        user_r = await db.execute(
-            select(User.nickname).where(User.id == record.user_id)
-        )
-        
+    for record, title, nickname in zip(records, titles, nicknames):
         resp = BorrowResponse.model_validate(record)
-        resp.book_title = book_r.scalar()
-        # 这里可以扩展返回用户信息
+        resp.book_title = title
+        resp.user_nickname = nickname
         responses.append(resp)
     
     return responses
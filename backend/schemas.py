@@ -64,6 +64,12 @@ class BookCreate(BookBase):
     total: int = Field(default=1, ge=0)
 
 
+class BookImportRequest(BaseModel):
+    """按扫码得到的ISBN列表批量入库"""
+    isbns: List[str] = Field(..., min_length=1)
+    stock: int = Field(default=1, ge=0)
+
+
 class BookUpdate(BaseModel):
     title: Optional[str] = Field(None, max_length=200)
     author: Optional[str] = None
@@ -83,6 +89,8 @@ class BookResponse(BookBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     user_borrow_id: Optional[int] = None
+    # 本地代理的封面缩略图（相对 /api/v1，仅第三方封面）
+    cover_thumb: Optional[str] = None
 
 
 class BookDetail(BookResponse):
@@ -94,6 +102,7 @@ class BookSearchResult(BaseModel):
     title: str
     author: Optional[str]
     cover_url: Optional[str]
+    cover_thumb: Optional[str] = None
     stock: int
 
 
@@ -114,6 +123,7 @@ class BorrowResponse(BaseModel):
     user_id: int
     book_isbn: str
     book_title: Optional[str] = None  # 关联查询
+    user_nickname: Optional[str] = None  # 关联查询（管理端）
     borrowed_at: datetime
     due_date: datetime
     returned_at: Optional[datetime] = None
@@ -123,6 +133,27 @@ class BorrowResponse(BaseModel):
     is_overdue: bool = False
 
 
+class BorrowBatchCreate(BaseModel):
+    isbns: List[str] = Field(..., min_length=1, max_length=50, description="图书ISBN列表")
+
+
+class BorrowBatchReturn(BaseModel):
+    borrow_ids: List[int] = Field(..., min_length=1, max_length=50, description="借阅记录ID列表")
+
+
+class BorrowBatchItem(BaseModel):
+    key: str  # 请求中的ISBN或借阅ID
+    success: bool
+    detail: Optional[str] = None  # 失败原因
+    record: Optional[BorrowResponse] = None
+
+
+class BorrowBatchResult(BaseModel):
+    succeeded: int
+    failed: int
+    items: List[BorrowBatchItem]
+
+
 class BorrowSimple(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
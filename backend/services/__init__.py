@@ -1,4 +1,22 @@
+from .http_client import http_clients
 from .isbn_service import isbn_service
 from .wx_service import wx_service
+from .cache_service import cache_service
+from .search_service import search_service
+from .stats_service import stats_service
+from .circulation_service import circulation_service
+from .export_service import export_service
+from .import_service import import_service
+from .rollup_service import rollup_service
+from .upload_service import upload_service
+from .cover_service import cover_service
+from .archive_service import archive_service
+from .audit_service import audit_service
 
-__all__ = ["isbn_service", "wx_service"]
+__all__ = [
+    "isbn_service", "wx_service", "cache_service",
+    "search_service", "circulation_service", "stats_service",
+    "export_service", "import_service", "rollup_service", "http_clients",
+    "upload_service", "cover_service",
+    "archive_service", "audit_service"
+]
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models import BORROW_HISTORY_COLUMNS
+from .stats_service import stats_service
+
+settings = get_settings()
+
+# 每批搬移的记录数（每批一个事务，避免长时间持锁）
+ARCHIVE_BATCH_SIZE = 5000
+
+_COLUMNS = ", ".join(BORROW_HISTORY_COLUMNS)
+
+# 删除与插入在同一条语句内完成，记录不会丢失或重复
+MOVE_SQL = text(f"""
+WITH moved AS (
+    DELETE FROM borrow_records
+    WHERE id IN (
+        SELECT id FROM borrow_records
+        WHERE status = 'returned' AND returned_at < :before
+        ORDER BY id
+        LIMIT :batch
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING {_COLUMNS}
+)
+INSERT INTO borrow_records_archive ({_COLUMNS}, archived_at)
+SELECT {_COLUMNS}, now() FROM moved
+""")
+
+PENDING_YEARS_SQL = text("""
+SELECT DISTINCT date_part('year', borrowed_at AT TIME ZONE 'UTC')::int
+FROM borrow_records
+WHERE status = 'returned' AND returned_at < :before
+""")
+
+
+class ArchiveService:
+    """借阅归档：将早已归还的记录从 borrow_records 移入按年分区的 borrow_records_archive"""
+
+    @staticmethod
+    def partition_name(year: int) -> str:
+        return f"borrow_records_archive_y{year}"
+
+    @classmethod
+    async def ensure_partitions(cls, db: AsyncSession, years: Iterable[int]):
+        """按年创建分区（已存在则跳过）"""
+        for year in sorted(set(years)):
+            await db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {cls.partition_name(year)} "
+                f"PARTITION OF borrow_records_archive "
+                f"FOR VALUES FROM ('{year}-01-01 00:00:00+00') TO ('{year + 1}-01-01 00:00:00+00')"
+            ))
+
+    @classmethod
+    async def archive_returned(cls, db: AsyncSession, before: datetime) -> int:
+        """分批搬移 returned_at < before 的已归还记录，每批提交一次，返回搬移总数"""
+        years = (await db.execute(PENDING_YEARS_SQL, {"before": before})).scalars().all()
+        if not years:
+            return 0
+        await cls.ensure_partitions(db, years)
+        await db.commit()
+
+        total = 0
+        while True:
+            result = await db.execute(MOVE_SQL, {"before": before, "batch": ARCHIVE_BATCH_SIZE})
+            moved = result.rowcount or 0
+            if moved:
+                # 已归还总数 = 借阅表中的已归还数 + 已归档数
+                await stats_service.incr(db, {stats_service.BORROWS_ARCHIVED: moved})
+            await db.commit()
+            total += moved
+            if moved < ARCHIVE_BATCH_SIZE:
+                return total
+
+    @classmethod
+    async def run(cls, db: AsyncSession) -> int:
+        before = datetime.utcnow() - timedelta(days=settings.BORROW_ARCHIVE_DAYS)
+        return await cls.archive_returned(db, before)
+
+
+archive_service = ArchiveService()
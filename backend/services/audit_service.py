@@ -0,0 +1,376 @@
+import asyncio
+import ipaddress
+import re
+import time
+from contextvars import ContextVar
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import metrics
+from config import get_settings
+from database import engine
+from models import SystemLog
+
+settings = get_settings()
+
+# 队列占用超过该比例时，低优先级记录（中间件补记的通用请求）直接丢弃
+AUDIT_HIGH_WATER = 0.8
+# 预先创建的月分区数（当月之后）
+AUDIT_PARTITIONS_AHEAD = 2
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# 行不属于任何分区时 PostgreSQL 报 check_violation（asyncpg CheckViolationError）
+CHECK_VIOLATION = "23514"
+
+_PARTITION_RE = re.compile(r"^system_logs_p(\d{4})(\d{2})$")
+
+TRUSTED_PROXIES = tuple(
+    ipaddress.ip_network(p.strip(), strict=False)
+    for p in settings.TRUSTED_PROXIES.split(",") if p.strip()
+)
+
+PARTITIONS_SQL = text("""
+SELECT c.relname, i.inhdetachpending
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+JOIN pg_class p ON p.oid = i.inhparent
+WHERE p.relname = 'system_logs'
+""")
+
+# 当前请求的审计上下文：ip_address、user_agent、user_id（中间件创建，登录校验后补充用户）
+_request_ctx: ContextVar[Optional[Dict[str, Any]]] = ContextVar("audit_request", default=None)
+
+
+def _month_start(value: date, months: int = 0) -> date:
+    """value 所在月份偏移 months 个月后的1号"""
+    years, month = divmod(value.month - 1 + months, 12)
+    return date(value.year + years, month + 1, 1)
+
+
+def _parse_ip(value: str):
+    try:
+        return ipaddress.ip_address(value.strip())
+    except ValueError:
+        return None
+
+
+def _is_trusted(ip) -> bool:
+    return ip is not None and any(ip in network for network in TRUSTED_PROXIES)
+
+
+def _client_ip(scope, headers: Dict[bytes, bytes]) -> Optional[str]:
+    """
+    客户端IP：直连地址来自可信代理（TRUSTED_PROXIES）时，从 X-Forwarded-For 右侧起
+    跳过可信代理，取第一个不可信的地址；否则记录直连地址（X-Forwarded-For 可被客户端伪造）
+    不是合法IP时返回空（INET列）
+    """
+    client = scope.get("client")
+    ip = _parse_ip(client[0]) if client else None
+    if _is_trusted(ip):
+        forwarded = headers.get(b"x-forwarded-for", b"").decode("latin-1")
+        for hop in reversed([h for h in forwarded.split(",") if h.strip()]):
+            ip = _parse_ip(hop)
+            if not _is_trusted(ip):
+                break
+    return str(ip) if ip is not None else None
+
+
+class AuditService:
+    """
+    操作审计日志
+    请求内只登记到内存队列，由后台任务攒批后一条多行 INSERT 写入 system_logs，不增加请求耗时
+    队列满时按优先级丢弃（不阻塞请求），丢弃数见 /metrics 的 audit_events_total
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None
+        # 已出队、正在等待攒批的首条记录（关闭时补写）
+        self._head: Optional[Dict[str, Any]] = None
+        self._last_drop_warning = 0.0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    # ========== 登记 ==========
+
+    @staticmethod
+    def bind_user(user_id: int):
+        """登录校验后补充当前请求的操作人"""
+        ctx = _request_ctx.get()
+        if ctx is not None:
+            ctx["user_id"] = user_id
+
+    @staticmethod
+    def _entry(
+        action: str,
+        target_type: Optional[str],
+        target_id: Any,
+        detail: Optional[dict],
+        ctx: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        ctx = ctx or {}
+        return {
+            "user_id": ctx.get("user_id"),
+            "action": action,
+            "target_type": target_type,
+            "target_id": None if target_id is None else str(target_id)[:50],
+            "detail": detail,
+            "ip_address": ctx.get("ip_address"),
+            "user_agent": ctx.get("user_agent"),
+            "created_at": datetime.now(timezone.utc),
+        }
+
+    def add(
+        self,
+        db: AsyncSession,
+        action: str,
+        target_type: Optional[str] = None,
+        target_id: Any = None,
+        detail: Optional[dict] = None,
+    ):
+        """
+        登记本次会话的操作审计
+        事务提交后由 get_db 统一入队，回滚的操作不留记录
+        """
+        ctx = _request_ctx.get()
+        if ctx is not None:
+            ctx["logged"] = True
+        db.info.setdefault("audit", []).append(
+            self._entry(action, target_type, target_id, detail, ctx)
+        )
+
+    def flush_pending(self, db: AsyncSession):
+        """提交成功后将已登记的审计记录入队"""
+        for entry in db.info.pop("audit", ()):
+            self._offer(entry, important=True)
+
+    def log(
+        self,
+        action: str,
+        target_type: Optional[str] = None,
+        target_id: Any = None,
+        detail: Optional[dict] = None,
+        important: bool = True,
+    ):
+        """直接入队（不依附数据库事务的记录）"""
+        self._offer(
+            self._entry(action, target_type, target_id, detail, _request_ctx.get()),
+            important,
+        )
+
+    def _offer(self, entry: Dict[str, Any], important: bool):
+        queue = self._queue
+        if queue is None:
+            return
+        if not important and queue.qsize() >= queue.maxsize * AUDIT_HIGH_WATER:
+            self._drop()
+            return
+        try:
+            queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self._drop()
+            return
+        # 攒够一批立即唤醒写入任务，不等定时刷新
+        if queue.qsize() >= settings.AUDIT_BATCH_SIZE:
+            self._batch_ready.set()
+
+    def _drop(self):
+        metrics.audit_events.inc("dropped")
+        now = time.monotonic()
+        if now - self._last_drop_warning >= 60:
+            self._last_drop_warning = now
+            print(f"[{datetime.now()}] 审计队列积压（{self.pending} 条），已开始丢弃记录")
+
+    # ========== 批量写入 ==========
+
+    async def start(self):
+        """创建队列与写入任务，并确保近期的月分区存在"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+        self._batch_ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        await self.ensure_partitions()
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            self._head = await self._queue.get()
+            if self._queue.qsize() + 1 < settings.AUDIT_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), settings.AUDIT_FLUSH_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_ready.clear()
+            batch = [self._head] + self._drain(settings.AUDIT_BATCH_SIZE - 1)
+            self._head = None
+            # 关闭时取消的是等待，正在写入的批次仍写完
+            self._inflight = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._inflight)
+
+    @staticmethod
+    async def _insert(batch: List[Dict[str, Any]]):
+        async with engine.begin() as conn:
+            await conn.execute(insert(SystemLog.__table__).values(batch))
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        """
+        一条多行 INSERT 写入一批；所在月份缺分区（如维护任务停摆）时补建后重试一次
+        其他失败丢弃该批（审计不重试，避免数据库故障时内存堆积）
+        """
+        try:
+            try:
+                await self._insert(batch)
+            except DBAPIError as e:
+                if getattr(e.orig, "sqlstate", None) != CHECK_VIOLATION:
+                    raise
+                for month in sorted({_month_start(entry["created_at"].date()) for entry in batch}):
+                    await self._ensure_month(month)
+                await self._insert(batch)
+            metrics.audit_events.inc("written", amount=len(batch))
+        except Exception as e:
+            metrics.audit_events.inc("failed", amount=len(batch))
+            print(f"[{datetime.now()}] 审计日志写入失败（{len(batch)} 条）: {e}")
+
+    async def close(self):
+        """停止写入任务，并写完队列中剩余的记录"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self._inflight is not None:
+            await self._inflight
+        if self._head is not None:
+            await self._write([self._head])
+            self._head = None
+        while True:
+            batch = self._drain(settings.AUDIT_BATCH_SIZE)
+            if not batch:
+                break
+            await self._write(batch)
+
+    # ========== 分区维护 ==========
+
+    @staticmethod
+    def partition_name(month: date) -> str:
+        return f"system_logs_p{month:%Y%m}"
+
+    async def _ensure_month(self, month: date) -> bool:
+        """创建某月分区（已存在则跳过）；每个月单独一个事务，失败只影响该月"""
+        name = self.partition_name(month)
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF system_logs "
+                    f"FOR VALUES FROM ('{month} 00:00:00+00') "
+                    f"TO ('{_month_start(month, 1)} 00:00:00+00')"
+                ))
+            return True
+        except Exception as e:
+            # 多进程同时启动时可能并发建表，下次维护或写入时再补
+            print(f"[{datetime.now()}] 审计日志分区 {name} 创建失败: {e}")
+            return False
+
+    async def ensure_partitions(self, today: Optional[date] = None) -> int:
+        """创建当月及之后 AUDIT_PARTITIONS_AHEAD 个月的分区，返回成功（含已存在）的个数"""
+        today = today or datetime.utcnow().date()
+        created = 0
+        for offset in range(AUDIT_PARTITIONS_AHEAD + 1):
+            created += await self._ensure_month(_month_start(today, offset))
+        return created
+
+    async def drop_expired_partitions(self, today: Optional[date] = None) -> List[str]:
+        """
+        删除保留期（AUDIT_RETENTION_MONTHS）之前的月分区，整表删除无需逐行 DELETE
+        先 DETACH ... CONCURRENTLY（不对 system_logs 加排他锁，批量写入不受影响），再删除脱离后的表；
+        上次中断在“待脱离”状态的分区用 FINALIZE 完成。CONCURRENTLY 不能在事务中执行，使用自动提交连接
+        """
+        today = today or datetime.utcnow().date()
+        cutoff = _month_start(today, -settings.AUDIT_RETENTION_MONTHS)
+        dropped = []
+        async with engine.execution_options(isolation_level="AUTOCOMMIT").connect() as conn:
+            for name, detach_pending in (await conn.execute(PARTITIONS_SQL)).all():
+                match = _PARTITION_RE.match(name)
+                if not match or date(int(match.group(1)), int(match.group(2)), 1) >= cutoff:
+                    continue
+                mode = "FINALIZE" if detach_pending else "CONCURRENTLY"
+                try:
+                    await conn.execute(text(f"ALTER TABLE system_logs DETACH PARTITION {name} {mode}"))
+                    await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                    dropped.append(name)
+                except Exception as e:
+                    print(f"[{datetime.now()}] 审计日志分区 {name} 删除失败: {e}")
+        return sorted(dropped)
+
+    async def rotate_partitions(self) -> List[str]:
+        await self.ensure_partitions()
+        return await self.drop_expired_partitions()
+
+
+audit_service = AuditService()
+
+metrics.registry.register(metrics.Gauge(
+    "audit_queue_depth", "审计日志队列中待写入的条数", lambda: audit_service.pending
+))
+
+
+class AuditContextMiddleware:
+    """
+    纯ASGI中间件：为请求建立审计上下文（IP、User-Agent，登录校验后补充用户）
+    管理端写操作若处理函数未登记审计，则补记一条通用记录（低优先级，积压时先丢弃）
+    """
+
+    def __init__(self, app, prefix: str = "/api/v1/admin"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        ctx = {
+            "user_id": None,
+            "ip_address": _client_ip(scope, headers),
+            "user_agent": headers.get(b"user-agent", b"").decode("latin-1")[:500] or None,
+            "logged": False,
+        }
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = _request_ctx.set(ctx)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = scope["path"]
+            if (scope["method"] in WRITE_METHODS and path.startswith(self.prefix)
+                    and not ctx["logged"]):
+                audit_service.log(
+                    "admin_request",
+                    detail={"method": scope["method"], "path": path, "status": status["code"]},
+                    important=False,
+                )
+            _request_ctx.reset(token)
@@ -0,0 +1,201 @@
+import json
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from config import get_settings
+
+settings = get_settings()
+
+
+class CacheService:
+    """
+    读缓存封装：优先使用 Redis，连接不可用时退化为进程内缓存
+
+    图书缓存键:
+    - books:detail:{isbn}          单本详情
+    - books:list:v{版本}:{...}     列表/搜索结果，版本号递增即整体失效
+    """
+
+    KEY_PREFIX = "library:"
+    CATALOG_VERSION_KEY = "books:version"
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(self):
+        self._redis: Optional[aioredis.Redis] = None
+        self._redis_down_until: float = 0.0
+        self._local: Dict[str, Tuple[float, str]] = {}
+        self._local_version: int = 0
+        self._principals: Dict[str, Tuple[float, Any]] = {}
+
+    # ========== 底层存取 ==========
+
+    def _client(self) -> Optional[aioredis.Redis]:
+        """获取Redis客户端（故障期间返回None，走进程内缓存）"""
+        if time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.from_url(
+                settings.REDIS_URL,
+                decode_responses=True,
+                socket_timeout=0.5,
+                socket_connect_timeout=0.5,
+            )
+        return self._redis
+
+    def _mark_down(self, e: Exception):
+        print(f"Redis不可用，{self.REDIS_RETRY_SECONDS}秒内改用进程内缓存: {e}")
+        self._redis_down_until = time.monotonic() + self.REDIS_RETRY_SECONDS
+
+    def _local_get(self, key: str) -> Optional[str]:
+        item = self._local.get(key)
+        if item is None:
+            return None
+        expire_at, raw = item
+        if time.monotonic() >= expire_at:
+            self._local.pop(key, None)
+            return None
+        return raw
+
+    def _local_set(self, key: str, raw: str, ttl: int):
+        # 进程内缓存无法感知其他worker的失效，TTL取较短值
+        ttl = min(ttl, settings.CACHE_LOCAL_TTL)
+        if len(self._local) >= settings.CACHE_LOCAL_MAX_ITEMS:
+            now = time.monotonic()
+            self._local = {k: v for k, v in self._local.items() if v[0] > now}
+            if len(self._local) >= settings.CACHE_LOCAL_MAX_ITEMS:
+                self._local.clear()
+        self._local[key] = (time.monotonic() + ttl, raw)
+
+    async def get_json(self, key: str) -> Optional[Any]:
+        key = self.KEY_PREFIX + key
+        client = self._client()
+        raw = None
+        if client is not None:
+            try:
+                raw = await client.get(key)
+            except (RedisError, OSError) as e:
+                self._mark_down(e)
+                raw = self._local_get(key)
+        else:
+            raw = self._local_get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set_json(self, key: str, value: Any, ttl: Optional[int] = None):
+        key = self.KEY_PREFIX + key
+        ttl = ttl or settings.BOOK_CACHE_TTL
+        raw = json.dumps(value, ensure_ascii=False, default=str)
+        client = self._client()
+        if client is not None:
+            try:
+                await client.set(key, raw, ex=ttl)
+                return
+            except (RedisError, OSError) as e:
+                self._mark_down(e)
+        self._local_set(key, raw, ttl)
+
+    async def delete(self, *keys: str):
+        keys = [self.KEY_PREFIX + k for k in keys]
+        for k in keys:
+            self._local.pop(k, None)
+        client = self._client()
+        if client is not None and keys:
+            try:
+                await client.delete(*keys)
+            except (RedisError, OSError) as e:
+                self._mark_down(e)
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    # ========== 图书目录缓存 ==========
+
+    @staticmethod
+    def book_detail_key(isbn: str) -> str:
+        return f"books:detail:{isbn}"
+
+    async def catalog_version(self) -> int:
+        """当前目录版本号（列表类缓存键的一部分）"""
+        client = self._client()
+        if client is not None:
+            try:
+                value = await client.get(self.KEY_PREFIX + self.CATALOG_VERSION_KEY)
+                return int(value or 0)
+            except (RedisError, OSError) as e:
+                self._mark_down(e)
+        return self._local_version
+
+    async def book_list_key(self, kind: str, *params: Any) -> str:
+        version = await self.catalog_version()
+        suffix = ":".join(str(p) for p in params)
+        return f"books:list:v{version}:{kind}:{suffix}"
+
+    async def invalidate_books(self, isbns: Iterable[str]):
+        """删除指定图书的详情缓存，并使所有列表缓存失效"""
+        await self.delete(*[self.book_detail_key(isbn) for isbn in isbns])
+
+        self._local_version += 1
+        client = self._client()
+        if client is not None:
+            try:
+                await client.incr(self.KEY_PREFIX + self.CATALOG_VERSION_KEY)
+            except (RedisError, OSError) as e:
+                self._mark_down(e)
+
+    # ========== 登录用户缓存 ==========
+
+    @staticmethod
+    def user_principal_key(openid: str) -> str:
+        return f"users:principal:{openid}"
+
+    def principal_local_get(self, openid: str) -> Optional[Any]:
+        """进程内一级缓存（只存不可变快照，命中时无IO）"""
+        item = self._principals.get(openid)
+        if item is None:
+            return None
+        expires, principal = item
+        if expires < time.monotonic():
+            self._principals.pop(openid, None)
+            return None
+        return principal
+
+    def principal_local_set(self, openid: str, principal: Any):
+        if len(self._principals) >= settings.CACHE_LOCAL_MAX_ITEMS:
+            self._principals.clear()
+        self._principals[openid] = (time.monotonic() + settings.AUTH_CACHE_LOCAL_TTL, principal)
+
+    async def invalidate_users(self, openids: Iterable[str]):
+        """删除用户身份缓存（其他进程的一级缓存最多延迟 AUTH_CACHE_LOCAL_TTL 秒）"""
+        openids = list(openids)
+        for openid in openids:
+            self._principals.pop(openid, None)
+        await self.delete(*[self.user_principal_key(openid) for openid in openids])
+
+    @staticmethod
+    def mark_users_dirty(db, *openids: str):
+        """登记本次会话改动过的用户（权限、状态），提交后失效身份缓存"""
+        db.info.setdefault("dirty_users", set()).update(openids)
+
+    @staticmethod
+    def mark_books_dirty(db, *isbns: str):
+        """
+        登记本次会话改动过的图书
+        事务提交后由 get_db 统一失效，避免提交前被并发读回填旧数据
+        """
+        db.info.setdefault("dirty_books", set()).update(isbns)
+
+    async def flush_dirty(self, db):
+        """提交成功后失效已登记的图书、用户缓存"""
+        dirty = db.info.pop("dirty_books", None)
+        if dirty:
+            await self.invalidate_books(dirty)
+        dirty_users = db.info.pop("dirty_users", None)
+        if dirty_users:
+            await self.invalidate_users(dirty_users)
+
+
+cache_service = CacheService()
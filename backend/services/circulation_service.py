@@ -0,0 +1,277 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, update, insert, literal, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Book, BorrowRecord
+from schemas import BorrowResponse, BorrowBatchItem, BorrowBatchResult
+from services.cache_service import cache_service
+from services.stats_service import stats_service
+
+ACTIVE_BORROW_INDEX = "uq_borrows_user_book_active"
+
+
+class CirculationService:
+    """
+    借还书核心操作
+    库存变更与借阅记录写入合并为一条带条件的 UPDATE ... RETURNING 语句，
+    不做"先查再改"，并发下不会超借，也不需要显式行锁
+    """
+
+    LOAN_DAYS = 30
+
+    @staticmethod
+    def _checkout_statement(user_id: int, *conditions, now: datetime):
+        """扣减满足条件且有库存的图书，并为每本插入借阅记录，返回记录 + 书名"""
+        ts = BorrowRecord.borrowed_at.type
+
+        taken = (
+            update(Book)
+            .where(*conditions, Book.stock > 0)
+            .values(stock=Book.stock - 1)
+            .returning(Book.isbn, Book.title)
+            .cte("taken")
+        )
+        created = (
+            insert(BorrowRecord)
+            .from_select(
+                ["user_id", "book_isbn", "borrowed_at", "due_date",
+                 "status", "remind_count", "created_at", "updated_at"],
+                select(
+                    literal(user_id, BorrowRecord.user_id.type),
+                    taken.c.isbn,
+                    literal(now, ts),
+                    literal(now + timedelta(days=CirculationService.LOAN_DAYS), ts),
+                    literal("active", BorrowRecord.status.type),
+                    literal(0, BorrowRecord.remind_count.type),
+                    literal(now, ts),
+                    literal(now, ts),
+                )
+            )
+            .returning(*BorrowRecord.__table__.c)
+            .cte("created")
+        )
+        return select(created, taken.c.title.label("book_title")).join(
+            taken, taken.c.isbn == created.c.book_isbn
+        )
+
+    @staticmethod
+    def _checkin_statement(*conditions, now: datetime, return_method: Optional[str]):
+        """归还满足条件的在借记录，并按归还本数回补库存，返回记录 + 书名"""
+        returned = (
+            update(BorrowRecord)
+            .where(*conditions, BorrowRecord.status == "active")
+            .values(status="returned", returned_at=now, return_method=return_method)
+            .returning(*BorrowRecord.__table__.c)
+            .cte("returned")
+        )
+        counts = (
+            select(returned.c.book_isbn, func.count().label("n"))
+            .group_by(returned.c.book_isbn)
+            .subquery("counts")
+        )
+        restocked = (
+            update(Book)
+            .where(Book.isbn == counts.c.book_isbn)
+            .values(stock=func.least(Book.stock + counts.c.n, Book.total))
+            .returning(Book.isbn, Book.title)
+            .cte("restocked")
+        )
+        return select(returned, restocked.c.title.label("book_title")).join(
+            restocked, restocked.c.isbn == returned.c.book_isbn
+        )
+
+    @staticmethod
+    async def checkout(db: AsyncSession, user_id: int, isbn: str) -> BorrowResponse:
+        """借书：有库存才扣减，同一语句内插入借阅记录"""
+        stmt = CirculationService._checkout_statement(
+            user_id, Book.isbn == isbn, now=datetime.utcnow()
+        )
+
+        try:
+            row = (await db.execute(stmt)).mappings().one_or_none()
+        except IntegrityError as e:
+            # 重复借阅由部分唯一索引兜底（status = 'active'）
+            if ACTIVE_BORROW_INDEX in str(e.orig):
+                raise HTTPException(status_code=400, detail="您已借阅该图书，请勿重复借阅")
+            raise
+
+        if row is None:
+            # 未命中：区分图书不存在与库存不足
+            exists = await db.scalar(select(Book.isbn).where(Book.isbn == isbn))
+            if exists is None:
+                raise HTTPException(status_code=404, detail="图书不存在")
+            raise HTTPException(status_code=400, detail="该图书暂无库存")
+
+        await stats_service.incr(db, {
+            stats_service.BORROWS_ACTIVE: 1,
+            stats_service.day_key(stats_service.BORROWS_NEW): 1,
+        })
+        cache_service.mark_books_dirty(db, isbn)
+        return BorrowResponse.model_validate(dict(row))
+
+    @staticmethod
+    async def checkin(
+        db: AsyncSession,
+        borrow_id: int,
+        user_id: Optional[int] = None,
+        return_method: Optional[str] = None
+    ) -> BorrowResponse:
+        """
+        还书：仅在记录仍为 active 时更新，并在同一语句内回补库存
+        user_id 为 None 表示不校验归属（管理员）
+        """
+        conditions = [BorrowRecord.id == borrow_id]
+        if user_id is not None:
+            conditions.append(BorrowRecord.user_id == user_id)
+
+        stmt = CirculationService._checkin_statement(
+            *conditions, now=datetime.utcnow(), return_method=return_method
+        )
+        row = (await db.execute(stmt)).mappings().one_or_none()
+
+        if row is None:
+            existing = (await db.execute(
+                select(BorrowRecord.user_id, BorrowRecord.status)
+                .where(BorrowRecord.id == borrow_id)
+            )).one_or_none()
+            if existing is None:
+                raise HTTPException(status_code=404, detail="借阅记录不存在")
+            if user_id is not None and existing.user_id != user_id:
+                raise HTTPException(status_code=403, detail="无权归还他人图书")
+            raise HTTPException(status_code=400, detail="该图书已归还")
+
+        await stats_service.incr(db, {
+            stats_service.BORROWS_ACTIVE: -1,
+            stats_service.BORROWS_RETURNED: 1,
+            stats_service.day_key(stats_service.RETURNS): 1,
+        })
+        cache_service.mark_books_dirty(db, row["book_isbn"])
+        return BorrowResponse.model_validate(dict(row))
+
+    @staticmethod
+    async def checkout_many(
+        db: AsyncSession,
+        user_id: int,
+        isbns: List[str]
+    ) -> BorrowBatchResult:
+        """
+        批量借书：所有图书一条语句扣减库存并写入借阅记录，逐本返回结果
+        已在借的图书在语句内排除，不会触发唯一索引冲突
+        """
+        unique = list(dict.fromkeys(isbns))
+        already_borrowed = select(BorrowRecord.book_isbn).where(
+            BorrowRecord.user_id == user_id,
+            BorrowRecord.status == "active",
+            BorrowRecord.book_isbn.in_(unique)
+        )
+        stmt = CirculationService._checkout_statement(
+            user_id,
+            Book.isbn.in_(unique),
+            Book.isbn.not_in(already_borrowed),
+            now=datetime.utcnow()
+        )
+        try:
+            rows = (await db.execute(stmt)).mappings().all()
+        except IntegrityError as e:
+            # 同一用户并发提交的两个批次，后到者整体拒绝
+            if ACTIVE_BORROW_INDEX in str(e.orig):
+                raise HTTPException(status_code=400, detail="借阅处理中，请勿重复提交")
+            raise
+
+        done = {row["book_isbn"]: BorrowResponse.model_validate(dict(row)) for row in rows}
+
+        errors: Dict[str, str] = {}
+        missing = [isbn for isbn in unique if isbn not in done]
+        if missing:
+            stocks = dict((await db.execute(
+                select(Book.isbn, Book.stock).where(Book.isbn.in_(missing))
+            )).all())
+            borrowed = set((await db.execute(
+                already_borrowed.where(BorrowRecord.book_isbn.in_(missing))
+            )).scalars().all())
+            for isbn in missing:
+                if isbn not in stocks:
+                    errors[isbn] = "图书不存在"
+                elif isbn in borrowed:
+                    errors[isbn] = "您已借阅该图书，请勿重复借阅"
+                else:
+                    errors[isbn] = "该图书暂无库存"
+
+        if done:
+            await stats_service.incr(db, {
+                stats_service.BORROWS_ACTIVE: len(done),
+                stats_service.day_key(stats_service.BORROWS_NEW): len(done),
+            })
+            cache_service.mark_books_dirty(db, *done)
+
+        return CirculationService._batch_result(isbns, done, errors)
+
+    @staticmethod
+    async def checkin_many(
+        db: AsyncSession,
+        borrow_ids: List[int],
+        user_id: Optional[int] = None,
+        return_method: Optional[str] = None
+    ) -> BorrowBatchResult:
+        """批量还书：一条语句归还全部记录并按图书汇总回补库存，逐条返回结果"""
+        unique = list(dict.fromkeys(borrow_ids))
+        conditions = [BorrowRecord.id.in_(unique)]
+        if user_id is not None:
+            conditions.append(BorrowRecord.user_id == user_id)
+
+        stmt = CirculationService._checkin_statement(
+            *conditions, now=datetime.utcnow(), return_method=return_method
+        )
+        rows = (await db.execute(stmt)).mappings().all()
+        done = {row["id"]: BorrowResponse.model_validate(dict(row)) for row in rows}
+
+        errors: Dict[int, str] = {}
+        missing = [borrow_id for borrow_id in unique if borrow_id not in done]
+        if missing:
+            existing = {
+                row.id: row for row in (await db.execute(
+                    select(BorrowRecord.id, BorrowRecord.user_id, BorrowRecord.status)
+                    .where(BorrowRecord.id.in_(missing))
+                )).all()
+            }
+            for borrow_id in missing:
+                row = existing.get(borrow_id)
+                if row is None:
+                    errors[borrow_id] = "借阅记录不存在"
+                elif user_id is not None and row.user_id != user_id:
+                    errors[borrow_id] = "无权归还他人图书"
+                else:
+                    errors[borrow_id] = "该图书已归还"
+
+        if done:
+            await stats_service.incr(db, {
+                stats_service.BORROWS_ACTIVE: -len(done),
+                stats_service.BORROWS_RETURNED: len(done),
+                stats_service.day_key(stats_service.RETURNS): len(done),
+            })
+            cache_service.mark_books_dirty(db, *{row["book_isbn"] for row in rows})
+
+        return CirculationService._batch_result(borrow_ids, done, errors)
+
+    @staticmethod
+    def _batch_result(keys: List[Any], done: Dict[Any, BorrowResponse], errors: Dict[Any, str]) -> BorrowBatchResult:
+        """按请求顺序组装逐项结果（请求中重复的项只处理第一次）"""
+        items, seen = [], set()
+        for key in keys:
+            if key in seen:
+                items.append(BorrowBatchItem(key=str(key), success=False, detail="重复提交"))
+                continue
+            seen.add(key)
+            if key in done:
+                items.append(BorrowBatchItem(key=str(key), success=True, record=done[key]))
+            else:
+                items.append(BorrowBatchItem(key=str(key), success=False, detail=errors.get(key)))
+        succeeded = sum(1 for item in items if item.success)
+        return BorrowBatchResult(succeeded=succeeded, failed=len(items) - succeeded, items=items)
+
+
+circulation_service = CirculationService()
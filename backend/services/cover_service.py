@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models import Book
+from .http_client import http_clients
+from .upload_service import upload_service, render_variants, VARIANTS, OUTPUT_FORMATS
+
+settings = get_settings()
+
+# 远程封面大小上限（边下载边计数，超过即放弃）
+COVER_MAX_BYTES = 5 * 1024 * 1024
+# 最多跟随的重定向次数（每一跳都校验域名）
+COVER_MAX_REDIRECTS = 3
+# 拉取失败后多久再重试（秒），期间直接回源地址
+COVER_RETRY_SECONDS = 600
+# 预取并发数
+COVER_PREFETCH_CONCURRENCY = 4
+# 清理时保留最近生成的文件（秒），避免删掉刚改过封面、缓存尚未刷新的文件
+COVER_ORPHAN_MIN_AGE = 86400
+
+
+class CoverService:
+    """
+    第三方封面本地代理：每个封面地址只拉取一次，生成各规格 WebP/JPEG 缩略图存到本地
+    文件名取封面地址的哈希，封面地址变化即生成新文件，旧文件由定时任务清理
+    """
+
+    def __init__(self):
+        self.directory = Path(settings.UPLOAD_DIR) / "covers"
+        self.allowed_hosts = tuple(
+            h.strip().lower() for h in settings.COVER_HOSTS.split(",") if h.strip()
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._failed: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def is_remote(cover_url: Optional[str]) -> bool:
+        return bool(cover_url) and cover_url.startswith(("http://", "https://"))
+
+    def is_allowed(self, url: str) -> bool:
+        """
+        只拉取白名单域名（及其子域名）的封面
+        封面地址来自管理员录入与第三方接口，不限制会被用来访问内网地址
+        """
+        try:
+            parsed = httpx.URL(url)
+        except httpx.InvalidURL:
+            return False
+        host = (parsed.host or "").lower()
+        return parsed.scheme in ("http", "https") and any(
+            host == allowed or host.endswith("." + allowed) for allowed in self.allowed_hosts
+        )
+
+    @staticmethod
+    def key_for(cover_url: str) -> str:
+        return hashlib.sha1(cover_url.encode()).hexdigest()[:16]
+
+    def file_for(self, key: str, variant: str, fmt: str) -> Path:
+        return self.directory / f"{key}_{variant}.{fmt}"
+
+    def proxy_path(self, isbn: str, cover_url: Optional[str], variant: str = "list",
+                   fmt: str = "webp") -> Optional[str]:
+        """接口返回给前端的封面地址（相对 /api/v1），v 参数使地址随封面变化；不在白名单的封面不代理"""
+        if not self.is_remote(cover_url) or not self.is_allowed(cover_url):
+            return None
+        return f"/books/{isbn}/cover/{variant}.{fmt}?v={self.key_for(cover_url)}"
+
+    async def ensure(self, cover_url: str) -> bool:
+        """确保封面缩略图已生成（同一地址并发请求只拉取一次），返回是否可用"""
+        key = self.key_for(cover_url)
+        if all(self.file_for(key, v, f).exists() for v in VARIANTS for f in OUTPUT_FORMATS):
+            return True
+        if self._failed.get(key, 0) > time.monotonic():
+            return False
+
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            ok = await self._fetch(cover_url, key)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            print(f"封面处理失败 {cover_url}: {e}")
+            ok = False
+        finally:
+            self._inflight.pop(key, None)
+
+        if not ok:
+            self._failed[key] = time.monotonic() + COVER_RETRY_SECONDS
+        future.set_result(ok)
+        return ok
+
+    async def _download(self, cover_url: str) -> Optional[bytes]:
+        """下载封面：手动跟随重定向并逐跳校验域名，流式读取，超过 COVER_MAX_BYTES 即放弃"""
+        url = cover_url
+        for _ in range(COVER_MAX_REDIRECTS + 1):
+            if not self.is_allowed(url):
+                print(f"封面地址不在允许的域名内，不拉取: {url}")
+                return None
+            async with http_clients.stream("covers", "GET", url) as resp:
+                if resp.is_redirect:
+                    url = str(resp.url.join(resp.headers.get("location", "")))
+                    continue
+                content_type = resp.headers.get("content-type", "")
+                if resp.status_code != 200 or not content_type.startswith("image/"):
+                    return None
+                declared = resp.headers.get("content-length", "")
+                if declared.isdigit() and int(declared) > COVER_MAX_BYTES:
+                    return None
+                chunks = []
+                size = 0
+                async for chunk in resp.aiter_bytes():
+                    size += len(chunk)
+                    if size > COVER_MAX_BYTES:
+                        return None
+                    chunks.append(chunk)
+                return b"".join(chunks)
+        return None
+
+    async def _fetch(self, cover_url: str, key: str) -> bool:
+        try:
+            content = await self._download(cover_url)
+        except httpx.HTTPError as e:
+            print(f"封面下载失败 {cover_url}: {e}")
+            return False
+        if content is None:
+            return False
+
+        await asyncio.to_thread(self.directory.mkdir, parents=True, exist_ok=True)
+        await upload_service.run_in_pool(
+            render_variants, content, key, str(self.directory), tuple(OUTPUT_FORMATS)
+        )
+        return True
+
+    async def prefetch(self, cover_urls: Iterable[Optional[str]]):
+        semaphore = asyncio.Semaphore(COVER_PREFETCH_CONCURRENCY)
+
+        async def one(url: str):
+            async with semaphore:
+                await self.ensure(url)
+
+        urls = {url for url in cover_urls if self.is_remote(url) and self.is_allowed(url)}
+        await asyncio.gather(*(one(url) for url in urls), return_exceptions=True)
+
+    def schedule_prefetch(self, cover_urls: Iterable[Optional[str]]):
+        """录入/导入后在后台预取封面，不阻塞当前请求"""
+        urls = [url for url in cover_urls if self.is_remote(url) and self.is_allowed(url)]
+        if not urls:
+            return
+        task = asyncio.create_task(self.prefetch(urls))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def cleanup_orphans(self, db: AsyncSession) -> int:
+        """删除已无图书引用的封面文件，返回删除数"""
+        keys: Set[str] = set()
+        result = await db.stream(
+            select(Book.cover_url).where(Book.cover_url.like("http%")).distinct()
+        )
+        async for (cover_url,) in result:
+            keys.add(self.key_for(cover_url))
+
+        def sweep() -> int:
+            if not self.directory.exists():
+                return 0
+            removed = 0
+            cutoff = time.time() - COVER_ORPHAN_MIN_AGE
+            for entry in os.scandir(self.directory):
+                key = entry.name.split("_", 1)[0]
+                if key in keys or entry.stat().st_mtime > cutoff:
+                    continue
+                os.unlink(entry.path)
+                removed += 1
+            return removed
+
+        return await asyncio.to_thread(sweep)
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+cover_service = CoverService()
@@ -0,0 +1,123 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from sqlalchemy import select, func, Integer
+
+from database import async_session_maker
+from models import Book, BorrowRecord, BorrowHistory, User
+
+# 每批从服务端游标拉取的行数
+EXPORT_BATCH_ROWS = 2000
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, (list, tuple)):
+        return "|".join(str(v) for v in value)
+    return str(value)
+
+
+class ExportService:
+    """
+    CSV流式导出
+    通过服务端游标分批读取，边读边写出（可选gzip），内存占用与数据量无关
+    """
+
+    @staticmethod
+    def build_query(
+        type: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[List[str], object]:
+        """返回 (表头, 查询)，start/end 用于按借阅时间筛选借阅记录"""
+        if type == "books":
+            headers = ["ISBN", "书名", "作者", "出版社", "出版日期", "标签",
+                       "库存", "总量", "位置", "上架时间"]
+            query = select(
+                Book.isbn, Book.title, Book.author, Book.publisher, Book.publish_date,
+                Book.tags, Book.stock, Book.total, Book.location, Book.created_at
+            ).order_by(Book.created_at, Book.isbn)
+            return headers, query
+
+        headers = ["借阅ID", "用户ID", "用户昵称", "ISBN", "书名",
+                   "借阅时间", "应还日期", "归还时间", "状态", "归还方式"]
+        # 全部借阅包含归档记录；逾期只涉及在借记录，直接查借阅表
+        t = BorrowRecord.__table__.c if type == "overdue" else BorrowHistory.c
+        columns = [
+            t.id, t.user_id, User.nickname,
+            t.book_isbn, Book.title, t.borrowed_at,
+            t.due_date, t.returned_at, t.status,
+            t.return_method
+        ]
+        if type == "overdue":
+            headers.append("逾期天数")
+            columns.append(
+                func.date_part("day", func.now() - t.due_date).cast(Integer)
+            )
+
+        query = (
+            select(*columns)
+            .join(User, t.user_id == User.id)
+            .join(Book, t.book_isbn == Book.isbn)
+        )
+        if type == "overdue":
+            query = query.where(
+                t.status == "active",
+                t.due_date < datetime.utcnow()
+            )
+        if start is not None:
+            query = query.where(t.borrowed_at >= start)
+        if end is not None:
+            query = query.where(t.borrowed_at < end)
+
+        return headers, query.order_by(t.borrowed_at, t.id)
+
+    @staticmethod
+    async def iter_csv(
+        type: str,
+        gzip: bool = False,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> AsyncIterator[bytes]:
+        """逐批生成CSV字节流（UTF-8 BOM，Excel可直接打开中文）"""
+        headers, query = ExportService.build_query(type, start, end)
+
+        compressor = zlib.compressobj(wbits=31) if gzip else None
+        encode: Callable[[str], bytes] = (
+            (lambda text: compressor.compress(text.encode("utf-8")))
+            if compressor else (lambda text: text.encode("utf-8"))
+        )
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write("\ufeff")
+        writer.writerow(headers)
+
+        # 导出独立使用一个会话：响应体在处理函数返回后才开始发送
+        async with async_session_maker() as db:
+            result = await db.stream(
+                query.execution_options(yield_per=EXPORT_BATCH_ROWS)
+            )
+            async for rows in result.partitions():
+                for row in rows:
+                    writer.writerow([_fmt(v) for v in row])
+                chunk = encode(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate(0)
+                if chunk:
+                    yield chunk
+
+        tail = encode(buffer.getvalue())
+        if compressor:
+            tail += compressor.flush()
+        if tail:
+            yield tail
+
+
+export_service = ExportService()
@@ -0,0 +1,128 @@
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+
+@dataclass(frozen=True)
+class Upstream:
+    """外部接口配置（每个上游一个长连接池）"""
+    base_url: str
+    timeout: float            # 单次请求总超时（秒）
+    connect_timeout: float
+    max_connections: int
+    max_keepalive: int
+
+
+class HttpClientRegistry:
+    """
+    全局共享的 httpx.AsyncClient（按上游区分）
+    连接保持复用，避免每次调用都重新做 TCP+TLS 握手；生命周期由 main.lifespan 管理
+    """
+
+    UPSTREAMS: Dict[str, Upstream] = {
+        # 登录、access_token、订阅消息，请求量最大
+        "wx": Upstream("https://api.weixin.qq.com", 5.0, 2.0, 50, 20),
+        "douban": Upstream("https://book.feelyou.top", 4.0, 2.0, 10, 5),
+        "openlibrary": Upstream("https://openlibrary.org", 4.0, 2.0, 10, 5),
+        # 第三方封面图（豆瓣、Open Library 等，使用完整URL）
+        "covers": Upstream("", 8.0, 3.0, 20, 10),
+    }
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        """获取上游对应的共享客户端（首次使用时创建）"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            upstream = self.UPSTREAMS[name]
+            client = httpx.AsyncClient(
+                base_url=upstream.base_url,
+                timeout=httpx.Timeout(upstream.timeout, connect=upstream.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=upstream.max_connections,
+                    max_keepalive_connections=upstream.max_keepalive,
+                    keepalive_expiry=60.0,
+                ),
+            )
+            self._clients[name] = client
+        return client
+
+    @asynccontextmanager
+    async def _track(self, name: str) -> AsyncIterator[None]:
+        """记录调用次数、失败数、耗时"""
+        stats = self._stats.setdefault(
+            name, {"requests": 0, "errors": 0, "in_flight": 0, "total_ms": 0.0}
+        )
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        except httpx.HTTPError:
+            stats["errors"] += 1
+            raise
+        finally:
+            stats["in_flight"] -= 1
+            stats["total_ms"] += (time.perf_counter() - started) * 1000
+
+    async def request(self, name: str, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """经共享连接池发起请求"""
+        async with self._track(name):
+            return await self.client(name).request(method, url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, name: str, method: str, url: str,
+                     **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """流式请求：响应体按需读取，可中途放弃（如超过大小上限）"""
+        async with self._track(name):
+            async with self.client(name).stream(method, url, **kwargs) as resp:
+                yield resp
+
+    async def get(self, name: str, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request(name, "GET", url, **kwargs)
+
+    async def post(self, name: str, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request(name, "POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各上游的连接池占用与调用统计（/health 使用）"""
+        result = {}
+        for name, upstream in self.UPSTREAMS.items():
+            stats = self._stats.get(name, {})
+            requests = int(stats.get("requests", 0))
+            item: Dict[str, Any] = {
+                "requests": requests,
+                "errors": int(stats.get("errors", 0)),
+                "in_flight": int(stats.get("in_flight", 0)),
+                "avg_ms": round(stats["total_ms"] / requests, 1) if requests else None,
+                "max_connections": upstream.max_connections,
+            }
+            item.update(self._pool_usage(self._clients.get(name)))
+            result[name] = item
+        return result
+
+    @staticmethod
+    def _pool_usage(client: Optional[httpx.AsyncClient]) -> Dict[str, int]:
+        # httpx 未公开连接池状态，读取底层 httpcore 连接池（取不到时忽略）
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {"connections": 0, "idle": 0}
+        return {
+            "connections": len(connections),
+            "idle": sum(1 for c in connections if c.is_idle()),
+        }
+
+    async def close(self):
+        """关闭全部连接（应用关闭时调用）"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+http_clients = HttpClientRegistry()
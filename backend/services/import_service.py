@@ -0,0 +1,255 @@
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Literal
+
+from fastapi import HTTPException
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Book
+from services.cache_service import cache_service
+from services.cover_service import cover_service
+from services.isbn_service import isbn_service
+from services.stats_service import stats_service
+
+# 单次导入的行数上限
+IMPORT_MAX_ROWS = 50000
+# 每条 INSERT 的行数（asyncpg 单语句参数上限 32767）
+IMPORT_CHUNK_ROWS = 1000
+# 单次请求最多向上游查询的ISBN数（其余缺书名的行标记为 deferred 返回，由客户端稍后重新提交）
+IMPORT_LOOKUP_MAX = 200
+
+# ISBN只允许ASCII数字与校验位X（str.isalnum 会放过全角数字、中文等）
+ISBN_PATTERN = re.compile(r"[0-9X]{10,20}")
+
+# CSV 表头 -> 字段（兼容导出文件的中文表头）
+CSV_COLUMNS = {
+    "isbn": "isbn", "ISBN": "isbn",
+    "title": "title", "书名": "title",
+    "author": "author", "作者": "author",
+    "publisher": "publisher", "出版社": "publisher",
+    "publish_date": "publish_date", "出版日期": "publish_date",
+    "cover_url": "cover_url", "封面": "cover_url",
+    "summary": "summary", "简介": "summary",
+    "tags": "tags", "标签": "tags",
+    "stock": "stock", "库存": "stock",
+    "total": "total", "总量": "total",
+    "location": "location", "位置": "location",
+}
+
+# 元数据字段及长度上限（与 Book 模型一致）
+TEXT_FIELDS = {
+    "title": 200, "author": 200, "publisher": 100, "publish_date": 20,
+    "cover_url": 500, "summary": None, "location": 50,
+}
+
+
+class ImportService:
+    """
+    图书批量导入
+    解析 CSV/JSON/ISBN列表 -> 缺书名的行并发查询ISBN元数据 -> 分块多行 INSERT ... ON CONFLICT
+    """
+
+    @staticmethod
+    def parse_csv(content: bytes) -> List[Dict[str, Any]]:
+        text = content.decode("utf-8-sig")
+        reader = csv.DictReader(io.StringIO(text))
+        rows = []
+        for raw in reader:
+            row = {}
+            for header, value in raw.items():
+                field = CSV_COLUMNS.get((header or "").strip())
+                if field and value is not None and value.strip() != "":
+                    row[field] = value.strip()
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def parse_json(content: bytes) -> List[Dict[str, Any]]:
+        try:
+            data = json.loads(content)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="JSON格式错误")
+        if isinstance(data, dict):
+            data = data.get("books", [])
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="JSON应为图书数组")
+        return [item if isinstance(item, dict) else {"isbn": item} for item in data]
+
+    @staticmethod
+    def _normalize(raw: Dict[str, Any], default_stock: int) -> Dict[str, Any]:
+        """校验并规范化一行，出错抛 ValueError"""
+        isbn = str(raw.get("isbn") or "").replace("-", "").replace(" ", "").upper()
+        if not ISBN_PATTERN.fullmatch(isbn):
+            raise ValueError("ISBN格式错误")
+
+        row: Dict[str, Any] = {"isbn": isbn}
+        for field, max_len in TEXT_FIELDS.items():
+            value = raw.get(field)
+            if value:
+                row[field] = str(value)[:max_len] if max_len else str(value)
+
+        tags = raw.get("tags") or []
+        if isinstance(tags, str):
+            tags = [t.strip() for t in tags.replace("，", "|").replace(",", "|").split("|")]
+        row["tags"] = [str(t)[:50] for t in tags if t][:10]
+
+        try:
+            stock = int(raw.get("stock", default_stock))
+            total = int(raw.get("total", stock))
+        except (TypeError, ValueError):
+            raise ValueError("库存/总量应为整数")
+        if stock < 0 or total < stock:
+            raise ValueError("库存不能为负且不能大于总量")
+        row["stock"], row["total"] = stock, total
+        return row
+
+    @classmethod
+    async def import_rows(
+        cls,
+        db: AsyncSession,
+        raw_rows: List[Dict[str, Any]],
+        mode: Literal["add", "skip"] = "add",
+        default_stock: int = 1
+    ) -> Dict[str, Any]:
+        """
+        导入图书并返回逐行结果
+        mode=add：ISBN已存在时累加库存与总量，空缺的元数据字段补齐
+        mode=skip：ISBN已存在时跳过
+        缺书名且未命中缓存的ISBN每次最多查询 IMPORT_LOOKUP_MAX 个，超出的行状态为 deferred，不入库
+        """
+        if len(raw_rows) > IMPORT_MAX_ROWS:
+            raise HTTPException(status_code=400, detail=f"单次最多导入 {IMPORT_MAX_ROWS} 行")
+
+        results: List[Dict[str, Any]] = []
+        merged: Dict[str, Dict[str, Any]] = {}
+        row_of: Dict[str, List[int]] = {}
+
+        for index, raw in enumerate(raw_rows):
+            isbn = str(raw.get("isbn") or "")
+            result = {"row": index + 1, "isbn": isbn, "status": "pending"}
+            results.append(result)
+            try:
+                row = cls._normalize(raw, default_stock)
+            except ValueError as e:
+                result.update(status="error", message=str(e))
+                continue
+
+            result["isbn"] = row["isbn"]
+            row_of.setdefault(row["isbn"], []).append(index)
+            existing = merged.get(row["isbn"])
+            if existing is None:
+                merged[row["isbn"]] = row
+            else:
+                # 文件内重复的ISBN合并为一行（副本数相加）
+                existing["stock"] += row["stock"]
+                existing["total"] += row["total"]
+                for field, value in row.items():
+                    existing.setdefault(field, value)
+
+        # 缺书名的行补齐元数据（缓存 + 并发查询上游，上游查询数有上限）
+        incomplete = [isbn for isbn, row in merged.items() if not row.get("title")]
+        if incomplete:
+            found = await isbn_service.get_cached_many(db, incomplete)
+            uncached = [isbn for isbn in incomplete if isbn not in found]
+            lookup, deferred = uncached[:IMPORT_LOOKUP_MAX], uncached[IMPORT_LOOKUP_MAX:]
+            if lookup:
+                found.update(await isbn_service.lookup_many(db, lookup))
+            for isbn in deferred:
+                del merged[isbn]
+                for index in row_of[isbn]:
+                    results[index].update(status="deferred", message="本次查询数已达上限，请稍后重新导入该行")
+            for isbn in incomplete:
+                if isbn not in merged:
+                    continue
+                info = found.get(isbn)
+                if info:
+                    enriched = cls._normalize({**info, "isbn": isbn}, 0)
+                    for field in list(TEXT_FIELDS) + ["tags"]:
+                        if enriched.get(field) and not merged[isbn].get(field):
+                            merged[isbn][field] = enriched[field]
+                if not merged[isbn].get("title"):
+                    del merged[isbn]
+                    for index in row_of[isbn]:
+                        results[index].update(status="error", message="未查到图书信息，请补充书名")
+
+        outcome: Dict[str, str] = {}
+        now = datetime.utcnow()
+        rows = list(merged.values())
+        for start in range(0, len(rows), IMPORT_CHUNK_ROWS):
+            chunk = [
+                {
+                    "isbn": row["isbn"],
+                    **{field: row.get(field) for field in TEXT_FIELDS},
+                    "tags": row["tags"],
+                    "stock": row["stock"],
+                    "total": row["total"],
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for row in rows[start:start + IMPORT_CHUNK_ROWS]
+            ]
+            outcome.update(await cls._upsert(db, chunk, mode))
+
+        created = 0
+        for isbn, status in outcome.items():
+            created += status == "created"
+            for index in row_of[isbn]:
+                results[index]["status"] = status
+
+        counts = {"created": 0, "updated": 0, "skipped": 0, "deferred": 0, "error": 0}
+        for result in results:
+            counts[result["status"]] += 1
+
+        if created:
+            await stats_service.incr(db, {
+                stats_service.BOOKS_TOTAL: created,
+                stats_service.day_key(stats_service.BOOKS_NEW): created,
+            })
+        changed = [isbn for isbn, status in outcome.items() if status != "skipped"]
+        if changed:
+            cache_service.mark_books_dirty(db, *changed)
+            cover_service.schedule_prefetch(merged[isbn].get("cover_url") for isbn in changed)
+
+        return {"total": len(results), **counts, "results": results}
+
+    @staticmethod
+    async def _upsert(
+        db: AsyncSession,
+        chunk: List[Dict[str, Any]],
+        mode: str
+    ) -> Dict[str, str]:
+        """一条多行 INSERT，返回 {isbn: created/updated/skipped}"""
+        stmt = pg_insert(Book).values(chunk)
+        if mode == "skip":
+            stmt = stmt.on_conflict_do_nothing(index_elements=[Book.isbn]).returning(Book.isbn)
+            inserted = set((await db.execute(stmt)).scalars().all())
+            return {
+                row["isbn"]: "created" if row["isbn"] in inserted else "skipped"
+                for row in chunk
+            }
+
+        excluded = stmt.excluded
+        fill = {
+            field: func.coalesce(getattr(Book, field), getattr(excluded, field))
+            for field in TEXT_FIELDS
+        }
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Book.isbn],
+            set_={
+                **fill,
+                "stock": Book.stock + excluded.stock,
+                "total": Book.total + excluded.total,
+                "updated_at": excluded.updated_at,
+            }
+        ).returning(Book.isbn, literal_column("xmax = 0").label("inserted"))
+        # xmax = 0 表示该行由本条语句新插入，否则为冲突后更新
+        result = await db.execute(stmt)
+        return {isbn: "created" if inserted else "updated" for isbn, inserted in result.all()}
+
+
+import_service = ImportService()
@@ -1,63 +1,251 @@
-import httpx
-from typing import Optional, Dict, Any
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Iterable, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models import IsbnMetadata
+from services.http_client import http_clients
+
+settings = get_settings()
+
+# (元数据, 来源)，元数据为 None 表示未查到
+Lookup = Tuple[Optional[Dict[str, Any]], Optional[str]]
+# (是否得到确定答复, 元数据)：超时、限流、5xx 等为 (False, None)，不能当作"查无此书"
+Answer = Tuple[bool, Optional[Dict[str, Any]]]
 
 
 class ISBNService:
-    """豆瓣API查询图书信息（免费，有频率限制）"""
+    """
+    豆瓣API查询图书信息（免费，有频率限制）
+    查询结果写入 isbn_metadata 表并在进程内做LRU缓存，未查到的ISBN也缓存一段时间
+    """
     
     DOUBAN_API = "https://api.douban.com/v2/book/isbn/{}"
     
+    def __init__(self):
+        # isbn -> (过期时间, 元数据或None)
+        self._local: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        # 同一ISBN同时只向上游查询一次
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
     @staticmethod
-    async def query_douban(isbn: str) -> Optional[Dict[str, Any]]:
+    async def query_douban(isbn: str) -> Answer:
         """查询豆瓣API"""
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                # 豆瓣API需要API Key，这里用公开接口（可能有频率限制）
-                # 实际生产建议：1. 申请豆瓣API Key 2. 或使用国家图书馆API 3. 或自建爬虫
-                url = f"https://book.feelyou.top/isbn/{isbn}"
-                resp = await client.get(url)
-                
-                if resp.status_code == 200:
-                    data = resp.json()
-                    return {
-                        "isbn": isbn,
-                        "title": data.get("title", ""),
-                        "author": ", ".join(data.get("author", [])) if isinstance(data.get("author"), list) else data.get("author", ""),
-                        "publisher": data.get("publisher", ""),
-                        "publish_date": data.get("pubdate", ""),
-                        "cover_url": data.get("images", {}).get("large") or data.get("cover"),
-                        "summary": data.get("summary", ""),
-                        "tags": [t.get("name") for t in data.get("tags", [])][:5]  # 取前5个标签
-                    }
+            # 豆瓣API需要API Key，这里用公开接口（可能有频率限制）
+            # 实际生产建议：1. 申请豆瓣API Key 2. 或使用国家图书馆API 3. 或自建爬虫
+            resp = await http_clients.get("douban", f"/isbn/{isbn}")
+            
+            if resp.status_code == 404:
+                return True, None
+            if resp.status_code == 200:
+                data = resp.json()
+                return True, {
+                    "isbn": isbn,
+                    "title": data.get("title", ""),
+                    "author": ", ".join(data.get("author", [])) if isinstance(data.get("author"), list) else data.get("author", ""),
+                    "publisher": data.get("publisher", ""),
+                    "publish_date": data.get("pubdate", ""),
+                    "cover_url": data.get("images", {}).get("large") or data.get("cover"),
+                    "summary": data.get("summary", ""),
+                    "tags": [t.get("name") for t in data.get("tags", [])][:5]  # 取前5个标签
+                }
+            print(f"ISBN query failed: douban HTTP {resp.status_code}")
         except Exception as e:
             print(f"ISBN query failed: {e}")
         
-        return None
+        return False, None
     
     @staticmethod
-    async def query_openlibrary(isbn: str) -> Optional[Dict[str, Any]]:
+    async def query_openlibrary(isbn: str) -> Answer:
         """备用：OpenLibrary API（英文书较多）"""
         try:
-            async with httpx.AsyncClient(timeout=10) as client:
-                url = f"https://openlibrary.org/isbn/{isbn}.json"
-                resp = await client.get(url)
-                
-                if resp.status_code == 200:
-                    data = resp.json()
-                    return {
-                        "isbn": isbn,
-                        "title": data.get("title", ""),
-                        "author": "",
-                        "publisher": "",
-                        "publish_date": "",
-                        "cover_url": f"https://covers.openlibrary.org/b/isbn/{isbn}-L.jpg",
-                        "summary": "",
-                        "tags": []
-                    }
+            resp = await http_clients.get("openlibrary", f"/isbn/{isbn}.json")
+            
+            if resp.status_code == 404:
+                return True, None
+            if resp.status_code == 200:
+                data = resp.json()
+                return True, {
+                    "isbn": isbn,
+                    "title": data.get("title", ""),
+                    "author": "",
+                    "publisher": "",
+                    "publish_date": "",
+                    "cover_url": f"https://covers.openlibrary.org/b/isbn/{isbn}-L.jpg",
+                    "summary": "",
+                    "tags": []
+                }
         except Exception:
             pass
         
-        return None
+        return False, None
+
+    
+    # ========== 缓存读写 ==========
+    
+    def _local_get(self, isbn: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        item = self._local.get(isbn)
+        if item is None:
+            return False, None
+        expires, data = item
+        if expires < time.monotonic():
+            del self._local[isbn]
+            return False, None
+        self._local.move_to_end(isbn)
+        return True, data
+    
+    def _local_set(self, isbn: str, data: Optional[Dict[str, Any]], ttl: float):
+        self._local[isbn] = (time.monotonic() + ttl, data)
+        self._local.move_to_end(isbn)
+        while len(self._local) > settings.ISBN_LOCAL_MAX_ITEMS:
+            self._local.popitem(last=False)
+    
+    @staticmethod
+    def _ttl(data: Optional[Dict[str, Any]]) -> timedelta:
+        if data is None:
+            return timedelta(hours=settings.ISBN_NEGATIVE_TTL_HOURS)
+        return timedelta(days=settings.ISBN_CACHE_TTL_DAYS)
+    
+    async def get_cached_many(
+        self, db: AsyncSession, isbns: Iterable[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        读取缓存（进程内 -> 数据库），返回命中的 {isbn: 元数据}
+        值为 None 表示负缓存命中；未命中的ISBN不在结果中
+        """
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        missing = []
+        for isbn in dict.fromkeys(isbns):
+            hit, data = self._local_get(isbn)
+            if hit:
+                found[isbn] = data
+            else:
+                missing.append(isbn)
+        
+        if missing:
+            now = datetime.utcnow()
+            result = await db.execute(
+                select(IsbnMetadata.isbn, IsbnMetadata.data, IsbnMetadata.expires_at)
+                .where(IsbnMetadata.isbn.in_(missing), IsbnMetadata.expires_at > now)
+            )
+            for isbn, data, expires_at in result.all():
+                found[isbn] = data
+                remaining = (expires_at.replace(tzinfo=None) - now).total_seconds()
+                self._local_set(isbn, data, remaining)
+        
+        return found
+    
+    async def store_many(self, db: AsyncSession, results: Dict[str, Lookup]):
+        """写入查询结果（一条 INSERT ... ON CONFLICT，随当前事务提交）"""
+        if not results:
+            return
+        
+        now = datetime.utcnow()
+        rows = []
+        for isbn, (data, source) in results.items():
+            ttl = self._ttl(data)
+            rows.append({
+                "isbn": isbn, "data": data, "source": source,
+                "fetched_at": now, "expires_at": now + ttl,
+            })
+            self._local_set(isbn, data, ttl.total_seconds())
+        
+        stmt = pg_insert(IsbnMetadata).values(rows)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[IsbnMetadata.isbn],
+            set_={
+                "data": stmt.excluded.data,
+                "source": stmt.excluded.source,
+                "fetched_at": stmt.excluded.fetched_at,
+                "expires_at": stmt.excluded.expires_at,
+            }
+        ))
+    
+    # ========== 上游查询 ==========
+    
+    async def fetch(self, isbn: str) -> Optional[Lookup]:
+        """
+        同时查询豆瓣与OpenLibrary，取最先返回的有效结果（同一ISBN并发调用合并为一次）
+        所有来源都明确答复未找到时返回 (None, None)；有来源出错且无结果时返回 None
+        """
+        future = self._inflight.get(isbn)
+        if future is not None:
+            return await asyncio.shield(future)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[isbn] = future
+        try:
+            result = await self._fan_out(isbn)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._inflight[isbn]
+    
+    async def _fan_out(self, isbn: str) -> Optional[Lookup]:
+        sources = {
+            asyncio.ensure_future(self.query_douban(isbn)): "douban",
+            asyncio.ensure_future(self.query_openlibrary(isbn)): "openlibrary",
+        }
+        pending = set(sources)
+        failed = False
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    answered, data = task.result()
+                    if data and data.get("title"):
+                        return data, sources[task]
+                    failed = failed or not answered
+        finally:
+            for task in pending:
+                task.cancel()
+        return None if failed else (None, None)
+    
+    async def lookup_many(
+        self, db: AsyncSession, isbns: Iterable[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """批量查询：先查缓存，未命中的并发查询上游并回写缓存"""
+        isbns = list(dict.fromkeys(isbns))
+        found = await self.get_cached_many(db, isbns)
+        missing = [isbn for isbn in isbns if isbn not in found]
+        
+        if missing:
+            semaphore = asyncio.Semaphore(settings.ISBN_LOOKUP_CONCURRENCY)
+            
+            async def fetch_one(isbn: str) -> Optional[Lookup]:
+                async with semaphore:
+                    return await self.fetch(isbn)
+            
+            fetched = dict(zip(missing, await asyncio.gather(*(fetch_one(i) for i in missing))))
+            # 上游出错的不写缓存（下次请求重试），只有明确未找到的才做负缓存
+            await self.store_many(db, {
+                isbn: result for isbn, result in fetched.items() if result is not None
+            })
+            found.update({
+                isbn: result[0] if result is not None else None
+                for isbn, result in fetched.items()
+            })
+        
+        return found
+    
+    async def lookup(self, db: AsyncSession, isbn: str) -> Optional[Dict[str, Any]]:
+        """查询单个ISBN的元数据（未查到返回None）"""
+        return (await self.lookup_many(db, [isbn])).get(isbn)
 
 
 isbn_service = ISBNService()
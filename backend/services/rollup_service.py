@@ -0,0 +1,168 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from sqlalchemy import select, func, text, cast, DateTime
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import DailyBorrowStat
+
+# 单条汇总语句覆盖的最大天数（回填时分段执行，避免长事务）
+ROLLUP_CHUNK_DAYS = 90
+
+# 按天聚合借出/归还（含归档记录，回填历史时同样准确），逾期数用区间事件累加：
+# 一条记录在 [到期日, 归还日) 内每天计为逾期，到期日 +1、归还日 -1，
+# 两个事件只对“归还日晚于到期日（或未还）”的记录成对出现，按期归还的记录不计入；
+# 区间开始前已逾期且未归还的记录作为基数
+ROLLUP_SQL = text("""
+WITH days AS (
+    SELECT d::date AS day
+    FROM generate_series(CAST(:start_day AS date), CAST(:end_day AS date), interval '1 day') AS d
+),
+borrowed AS (
+    SELECT (borrowed_at AT TIME ZONE 'UTC')::date AS day,
+           count(*) AS borrows,
+           count(DISTINCT user_id) AS borrowers
+    FROM borrow_records_all
+    WHERE borrowed_at >= :start_ts AND borrowed_at < :end_ts
+    GROUP BY 1
+),
+returned AS (
+    SELECT (returned_at AT TIME ZONE 'UTC')::date AS day,
+           count(*) AS returns,
+           count(*) FILTER (WHERE returned_at > due_date) AS late_returns
+    FROM borrow_records_all
+    WHERE returned_at >= :start_ts AND returned_at < :end_ts
+    GROUP BY 1
+),
+overdue_events AS (
+    SELECT day, sum(delta) AS delta
+    FROM (
+        SELECT (due_date AT TIME ZONE 'UTC')::date AS day, 1 AS delta
+        FROM borrow_records_all
+        WHERE due_date >= :start_ts AND due_date < :end_ts
+          AND (returned_at IS NULL
+               OR (returned_at AT TIME ZONE 'UTC')::date > (due_date AT TIME ZONE 'UTC')::date)
+        UNION ALL
+        SELECT (returned_at AT TIME ZONE 'UTC')::date, -1
+        FROM borrow_records_all
+        WHERE returned_at >= :start_ts AND returned_at < :end_ts
+          AND (returned_at AT TIME ZONE 'UTC')::date > (due_date AT TIME ZONE 'UTC')::date
+    ) AS e
+    GROUP BY day
+),
+overdue_base AS (
+    SELECT count(*) AS n
+    FROM borrow_records_all
+    WHERE due_date < :start_ts AND (returned_at IS NULL OR returned_at >= :start_ts)
+)
+INSERT INTO daily_borrow_stats (day, borrows, borrowers, returns, late_returns, overdue, updated_at)
+SELECT days.day,
+       coalesce(b.borrows, 0),
+       coalesce(b.borrowers, 0),
+       coalesce(r.returns, 0),
+       coalesce(r.late_returns, 0),
+       (SELECT n FROM overdue_base) + coalesce(sum(e.delta) OVER (ORDER BY days.day), 0),
+       now()
+FROM days
+LEFT JOIN borrowed b ON b.day = days.day
+LEFT JOIN returned r ON r.day = days.day
+LEFT JOIN overdue_events e ON e.day = days.day
+ON CONFLICT (day) DO UPDATE SET
+    borrows = EXCLUDED.borrows,
+    borrowers = EXCLUDED.borrowers,
+    returns = EXCLUDED.returns,
+    late_returns = EXCLUDED.late_returns,
+    overdue = EXCLUDED.overdue,
+    updated_at = EXCLUDED.updated_at
+""")
+
+# 直接统计某天结束时的逾期数（与 ROLLUP_SQL 的事件累加结果应一致，用于校验）
+OVERDUE_ON_DAY_SQL = text("""
+SELECT count(*)
+FROM borrow_records_all
+WHERE (due_date AT TIME ZONE 'UTC')::date <= :day
+  AND (returned_at IS NULL OR (returned_at AT TIME ZONE 'UTC')::date > :day)
+""")
+
+
+class RollupService:
+    """借阅日汇总：生成/回填 daily_borrow_stats，并提供按日/周/月的趋势查询"""
+
+    @staticmethod
+    async def rollup_days(db: AsyncSession, start: date, end: date) -> int:
+        """重新计算 [start, end] 每天的汇总（可重复执行），返回处理的天数"""
+        days = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(end, chunk_start + timedelta(days=ROLLUP_CHUNK_DAYS - 1))
+            await db.execute(ROLLUP_SQL, {
+                "start_day": chunk_start,
+                "end_day": chunk_end,
+                "start_ts": datetime.combine(chunk_start, time.min, tzinfo=timezone.utc),
+                "end_ts": datetime.combine(
+                    chunk_end + timedelta(days=1), time.min, tzinfo=timezone.utc
+                ),
+            })
+            days += (chunk_end - chunk_start).days + 1
+            chunk_start = chunk_end + timedelta(days=1)
+        return days
+
+    @staticmethod
+    async def verify_overdue(db: AsyncSession, day: date) -> Optional[Tuple[int, int]]:
+        """
+        校验某天汇总的逾期数：返回 (汇总值, 直接统计值)，当天未汇总时返回 None
+        按期归还的记录不应计入，两者不一致说明事件累加有误
+        """
+        stat = await db.get(DailyBorrowStat, day)
+        if stat is None:
+            return None
+        actual = await db.scalar(OVERDUE_ON_DAY_SQL, {"day": day})
+        return stat.overdue, actual
+
+    @staticmethod
+    async def get_day(db: AsyncSession, day: date) -> Optional[DailyBorrowStat]:
+        return await db.get(DailyBorrowStat, day)
+
+    @staticmethod
+    async def trends(
+        db: AsyncSession,
+        start: date,
+        end: date,
+        granularity: Literal["day", "week", "month"] = "day"
+    ) -> List[Dict[str, Any]]:
+        """
+        按粒度汇总 [start, end] 的数据
+        borrower_days 为每日借书人数之和（跨天不去重）；overdue 取周期最后一天的值
+        """
+        # 先转为不带时区的 timestamp，截断结果不受会话时区影响
+        period = func.date_trunc(granularity, cast(DailyBorrowStat.day, DateTime)).label("period")
+        result = await db.execute(
+            select(
+                period,
+                func.sum(DailyBorrowStat.borrows),
+                func.sum(DailyBorrowStat.returns),
+                func.sum(DailyBorrowStat.late_returns),
+                func.sum(DailyBorrowStat.borrowers),
+                array_agg(
+                    aggregate_order_by(DailyBorrowStat.overdue, DailyBorrowStat.day.desc())
+                )[1],
+            )
+            .where(DailyBorrowStat.day >= start, DailyBorrowStat.day <= end)
+            .group_by(period)
+            .order_by(period)
+        )
+        return [
+            {
+                "period": period_start.date().isoformat(),
+                "borrows": int(borrows),
+                "returns": int(returns),
+                "late_returns": int(late_returns),
+                "borrower_days": int(borrower_days),
+                "overdue": overdue,
+            }
+            for period_start, borrows, returns, late_returns, borrower_days, overdue in result.all()
+        ]
+
+
+rollup_service = RollupService()
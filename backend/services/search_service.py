@@ -0,0 +1,92 @@
+import re
+from typing import List, Optional
+
+from sqlalchemy import case, false, func, or_
+
+from models import Book
+
+# 与数据库函数 search_tokens 的切分规则保持一致
+CJK_RUN = re.compile("[\u3400-\u9fff]+")
+WORD = re.compile(r"\w+")
+ISBN_LIKE = re.compile(r"^[0-9Xx-]{4,20}$")
+# 三元组索引只对不少于3个字符的关键词有效，更短的 ILIKE 会退化为全索引/全表扫描
+TRGM_MIN_LENGTH = 3
+
+
+class SearchService:
+    """图书检索：tsvector 全文匹配 + pg_trgm 模糊匹配，按相关度排序"""
+
+    @staticmethod
+    def tokenize(keyword: str) -> List[str]:
+        """关键词分词：中文切成二字组，其他按单词切分（小写）"""
+        terms: List[str] = []
+        for run in CJK_RUN.findall(keyword):
+            if len(run) == 1:
+                terms.append(run)
+            else:
+                terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        terms.extend(w.lower() for w in WORD.findall(CJK_RUN.sub(" ", keyword)))
+        return list(dict.fromkeys(terms))
+
+    @classmethod
+    def tsquery_text(cls, keyword: str) -> Optional[str]:
+        """构造 to_tsquery 文本，最后一个词按前缀匹配（边输入边搜）"""
+        terms = cls.tokenize(keyword)
+        if not terms:
+            return None
+        terms[-1] = f"{terms[-1]}:*"
+        return " & ".join(terms)
+
+    @staticmethod
+    def _like_pattern(keyword: str) -> str:
+        escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
+    @staticmethod
+    def use_trigram(keyword: str) -> bool:
+        """是否加上三元组模糊匹配：中文与过短的关键词只走二字组全文检索"""
+        return len(keyword) >= TRGM_MIN_LENGTH and not CJK_RUN.search(keyword)
+
+    @classmethod
+    def match_condition(cls, keyword: str, include_author: bool = True):
+        """
+        检索条件（均可走索引）
+        - search_vector @@ tsquery    -> idx_books_search（中文按二字组，短词按前缀）
+        - title/author ILIKE '%kw%'   -> idx_books_*_trgm（仅不含中文且不少于3个字符时）
+        - isbn LIKE 'kw%'             -> idx_books_isbn_pattern
+        """
+        keyword = keyword.strip()
+        conditions = []
+        if cls.use_trigram(keyword):
+            pattern = cls._like_pattern(keyword)
+            conditions.append(Book.title.ilike(pattern, escape="\\"))
+            if include_author:
+                conditions.append(Book.author.ilike(pattern, escape="\\"))
+
+        tsquery = cls.tsquery_text(keyword)
+        if tsquery:
+            conditions.append(Book.search_vector.op("@@")(func.to_tsquery("simple", tsquery)))
+
+        if ISBN_LIKE.match(keyword):
+            conditions.append(Book.isbn.like(keyword.replace("-", "") + "%"))
+
+        # 只有标点等无法分词的短关键词
+        return or_(*conditions) if conditions else false()
+
+    @classmethod
+    def rank_expression(cls, keyword: str):
+        """相关度：全文排名（标题权重最高）+ 标题三元组相似度"""
+        keyword = keyword.strip()
+        rank = func.similarity(Book.title, keyword)
+        tsquery = cls.tsquery_text(keyword)
+        if tsquery:
+            rank = rank + func.ts_rank_cd(
+                Book.search_vector, func.to_tsquery("simple", tsquery)
+            )
+        if ISBN_LIKE.match(keyword):
+            # ISBN 精确命中排在最前
+            rank = rank + case((Book.isbn == keyword.replace("-", ""), 10), else_=0)
+        return rank
+
+
+search_service = SearchService()
@@ -0,0 +1,142 @@
+import random
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select, delete, func, distinct
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models import Book, BorrowRecord, BorrowRecordArchive, StatCounter, User
+
+settings = get_settings()
+
+
+class StatsService:
+    """看板计数器：写路径事务内增量维护，定时任务全量校准"""
+
+    # 全局计数
+    BOOKS_TOTAL = "books_total"
+    USERS_TOTAL = "users_total"
+    USERS_ADMIN = "users_admin"
+    BORROWS_ACTIVE = "borrows_active"
+    BORROWS_RETURNED = "borrows_returned"
+    BORROWS_OVERDUE = "borrows_overdue"  # 随时间变化，仅由校准任务刷新（还书时不递减，避免校准间隔内减成负数）
+    BORROWS_ARCHIVED = "borrows_archived"  # 已移入归档表的记录数，归档任务累加，校准时按归档表重算
+
+    # 日维度计数（UTC日期）
+    BOOKS_NEW = "books_new"
+    USERS_NEW = "users_new"
+    BORROWS_NEW = "borrows_new"
+    RETURNS = "returns"
+    BORROWERS = "borrowers"  # 当日借书人数，仅由校准任务刷新
+
+    DAILY_RETENTION_DAYS = 30
+
+    @staticmethod
+    def day_key(name: str, day: Optional[date] = None) -> str:
+        day = day or datetime.utcnow().date()
+        return f"{name}:{day.isoformat()}"
+
+    @staticmethod
+    async def incr(db: AsyncSession, deltas: Dict[str, int]):
+        """在当前事务内增减计数（随机分片，一条语句）"""
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return
+
+        shard = random.randrange(settings.STATS_COUNTER_SHARDS)
+        now = datetime.utcnow()
+        stmt = pg_insert(StatCounter).values([
+            {"name": name, "shard": shard, "value": delta, "updated_at": now}
+            for name, delta in sorted(deltas.items())
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StatCounter.name, StatCounter.shard],
+            set_={
+                "value": StatCounter.value + stmt.excluded.value,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+        await db.execute(stmt)
+
+    @staticmethod
+    async def read(db: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+        """一次查询读取多个计数（未出现的计数为0）"""
+        names = list(names)
+        result = await db.execute(
+            select(StatCounter.name, func.sum(StatCounter.value))
+            .where(StatCounter.name.in_(names))
+            .group_by(StatCounter.name)
+        )
+        values = {name: int(total) for name, total in result.all()}
+        return {name: values.get(name, 0) for name in names}
+
+    @classmethod
+    async def reconcile(cls, db: AsyncSession) -> Dict[str, int]:
+        """按源表重新计算全部计数并覆盖（校准增量维护的漂移）"""
+        now = datetime.utcnow()
+        today = now.date()
+        day_start = datetime.combine(today, time.min)
+
+        def count(model_col, *conditions):
+            return select(func.count(model_col)).where(*conditions).scalar_subquery()
+
+        row = (await db.execute(select(
+            count(Book.isbn).label(cls.BOOKS_TOTAL),
+            count(Book.isbn, Book.created_at >= day_start).label(cls.BOOKS_NEW),
+            count(User.id).label(cls.USERS_TOTAL),
+            count(User.id, User.created_at >= day_start).label(cls.USERS_NEW),
+            count(User.id, User.is_admin == 1).label(cls.USERS_ADMIN),
+            count(BorrowRecord.id, BorrowRecord.status == "active").label(cls.BORROWS_ACTIVE),
+            count(BorrowRecord.id, BorrowRecord.status == "returned").label(cls.BORROWS_RETURNED),
+            # 与借阅表的已归还数在同一条语句（同一快照）内统计，归档任务并发搬移时不会重复或漏计
+            count(BorrowRecordArchive.id).label(cls.BORROWS_ARCHIVED),
+            count(
+                BorrowRecord.id,
+                BorrowRecord.status == "active",
+                BorrowRecord.due_date < now
+            ).label(cls.BORROWS_OVERDUE),
+            count(BorrowRecord.id, BorrowRecord.borrowed_at >= day_start).label(cls.BORROWS_NEW),
+            count(BorrowRecord.id, BorrowRecord.returned_at >= day_start).label(cls.RETURNS),
+            count(
+                distinct(BorrowRecord.user_id), BorrowRecord.borrowed_at >= day_start
+            ).label(cls.BORROWERS),
+        ))).mappings().one()
+
+        daily = {cls.BOOKS_NEW, cls.USERS_NEW, cls.BORROWS_NEW, cls.RETURNS, cls.BORROWERS}
+        values = {
+            (cls.day_key(name, today) if name in daily else name): int(value)
+            for name, value in row.items()
+        }
+        # 借阅表只含近期的已归还记录，加上归档数
+        values[cls.BORROWS_RETURNED] += values[cls.BORROWS_ARCHIVED]
+
+        # 其余分片清掉，0号分片写入校准值（并发的增量写可能已建出0号分片，用upsert覆盖）
+        await db.execute(
+            delete(StatCounter).where(
+                StatCounter.name.in_(list(values)),
+                StatCounter.shard != 0
+            )
+        )
+        stmt = pg_insert(StatCounter).values([
+            {"name": name, "shard": 0, "value": value, "updated_at": now}
+            for name, value in values.items()
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[StatCounter.name, StatCounter.shard],
+            set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at}
+        ))
+
+        # 清理过期的日维度计数
+        cutoff = (today - timedelta(days=cls.DAILY_RETENTION_DAYS)).isoformat()
+        await db.execute(
+            delete(StatCounter).where(
+                StatCounter.name.like("%:%"),
+                func.split_part(StatCounter.name, ":", 2) < cutoff
+            )
+        )
+        return values
+
+
+stats_service = StatsService()
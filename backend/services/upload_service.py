@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import io
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from fastapi import HTTPException, UploadFile
+from fastapi.staticfiles import StaticFiles
+
+from config import get_settings
+
+settings = get_settings()
+
+# 每次读取/写入的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 文件头魔数 -> 扩展名（不信任文件名与 Content-Type）
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+
+# 封面缩略图规格：名称 -> 最大宽高
+VARIANTS = {
+    "list": (240, 320),
+    "detail": (600, 800),
+}
+
+# 解码时允许的最大像素数（防止解压炸弹）
+MAX_IMAGE_PIXELS = 50_000_000
+
+# multipart 表单除文件外的开销（边界、字段头）
+MULTIPART_OVERHEAD = 64 * 1024
+
+# EXIF 方向标签
+EXIF_ORIENTATION = 0x0112
+
+
+def _sniff(head: bytes) -> Optional[str]:
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+# 输出格式 -> (Pillow 格式名, 保存参数)
+OUTPUT_FORMATS = {
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", {"quality": 78, "method": 4}),
+}
+
+
+def strip_metadata(path: str):
+    """
+    在子进程中执行：去掉原图的 EXIF（含手机拍摄地点）、XMP 等元数据后按原格式写回
+    有方向标签的图片先转正；无需转正的 JPEG 沿用原量化表，几乎无损
+    """
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    tmp_path = path + ".clean"
+    with Image.open(path) as img:
+        fmt = img.format
+        # 只保留色彩配置，其余元数据不写入
+        options = {"icc_profile": img.info["icc_profile"]} if img.info.get("icc_profile") else {}
+        if getattr(img, "is_animated", False):
+            for key in ("exif", "xmp", "comment"):
+                img.info.pop(key, None)
+            img.save(tmp_path, fmt, save_all=True, **options)
+        elif fmt == "JPEG" and img.getexif().get(EXIF_ORIENTATION, 1) == 1:
+            img.save(tmp_path, "JPEG", quality="keep", subsampling="keep", **options)
+        else:
+            img = ImageOps.exif_transpose(img)
+            if fmt in ("JPEG", "WEBP"):
+                options["quality"] = 92
+            img.save(tmp_path, fmt, **options)
+    os.replace(tmp_path, path)
+
+
+def render_variants(
+    source: Union[str, bytes],
+    stem: str,
+    directory: str,
+    formats: Sequence[str] = ("jpg",)
+) -> Dict[str, str]:
+    """
+    在子进程中执行：校验图片并生成各规格缩略图（先写临时文件再改名）
+    返回 "规格.格式" -> 文件名
+    """
+    from PIL import Image, ImageOps
+
+    def open_source():
+        return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    with open_source() as img:
+        img.verify()
+
+    results = {}
+    with open_source() as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        for name, size in VARIANTS.items():
+            variant = img.copy()
+            variant.thumbnail(size, Image.LANCZOS)
+            for fmt in formats:
+                pil_format, options = OUTPUT_FORMATS[fmt]
+                filename = f"{stem}_{name}.{fmt}"
+                path = os.path.join(directory, filename)
+                variant.save(path + ".part", pil_format, **options)
+                os.replace(path + ".part", path)
+                results[f"{name}.{fmt}"] = filename
+    return results
+
+
+class UploadService:
+    """
+    图片上传：分块写入磁盘（线程池，不阻塞事件循环），校验文件头，
+    在进程池中去除元数据并生成缩略图；文件名取内容哈希，同一图片只存一份，可长期缓存
+    请求体大小由 UploadLimitMiddleware 在解析表单前限制
+    """
+
+    def __init__(self):
+        self.directory = Path(settings.UPLOAD_DIR)
+        self.max_bytes = settings.UPLOAD_MAX_MB * 1024 * 1024
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def run_in_pool(self, func, *args):
+        """在图片处理进程池中执行（CPU密集，避免占用事件循环与线程池）"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+        return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+
+    async def _save_stream(self, file: UploadFile) -> Tuple[Path, str, str]:
+        """
+        分块写入临时文件，返回 (临时路径, 扩展名, sha256)
+        执行到这里时表单已解析完毕，此处的大小检查只是兜底
+        """
+        if file.size is not None and file.size > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"文件不能超过 {settings.UPLOAD_MAX_MB}MB")
+
+        head = await file.read(CHUNK_SIZE)
+        ext = _sniff(head)
+        if ext is None:
+            raise HTTPException(status_code=415, detail="仅支持 JPEG / PNG / GIF / WebP 图片")
+
+        await asyncio.to_thread(self.directory.mkdir, parents=True, exist_ok=True)
+        tmp_path = self.directory / f".{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
+        out = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise HTTPException(
+                        status_code=413, detail=f"文件不能超过 {settings.UPLOAD_MAX_MB}MB"
+                    )
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+                chunk = await file.read(CHUNK_SIZE)
+        except BaseException:
+            await asyncio.to_thread(out.close)
+            await asyncio.to_thread(tmp_path.unlink, True)
+            raise
+        await asyncio.to_thread(out.close)
+        return tmp_path, ext, digest.hexdigest()
+
+    async def save_image(self, file: UploadFile) -> Dict[str, object]:
+        """保存上传的图片并生成缩略图，返回原图与各规格的访问地址"""
+        tmp_path, ext, digest = await self._save_stream(file)
+        stem = digest[:32]
+        final_path = self.directory / f"{stem}{ext}"
+
+        try:
+            # 原图对外公开，先去掉 EXIF 等元数据
+            await self.run_in_pool(strip_metadata, str(tmp_path))
+            variants = await self.run_in_pool(
+                render_variants, str(tmp_path), stem, str(self.directory)
+            )
+        except Exception as e:
+            await asyncio.to_thread(tmp_path.unlink, True)
+            print(f"图片处理失败: {e}")
+            raise HTTPException(status_code=415, detail="无法识别的图片文件")
+
+        # 内容相同的文件直接覆盖（结果一致）
+        await asyncio.to_thread(os.replace, tmp_path, final_path)
+        return {
+            "url": f"/static/{final_path.name}",
+            "variants": {
+                key.split(".")[0]: f"/static/{filename}" for key, filename in variants.items()
+            },
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class UploadLimitMiddleware:
+    """
+    纯ASGI中间件：上传接口在解析 multipart 表单之前限制请求体大小
+    Content-Length 超限直接返回413；未声明长度（分块传输）时边读边计数，超限即中止
+    否则表单会先被完整接收并写入临时文件，接口内的检查已经太晚
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: Optional[int] = None):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = (max_bytes or settings.UPLOAD_MAX_MB * 1024 * 1024) + MULTIPART_OVERHEAD
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(status_code=413, detail=f"文件不能超过 {settings.UPLOAD_MAX_MB}MB")
+
+    async def _reject(self, send):
+        body = f'{{"detail":"文件不能超过 {settings.UPLOAD_MAX_MB}MB"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # 表单解析中抛出 HTTPException，由异常处理返回413
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """上传文件按内容哈希命名，内容不会变化，允许客户端与CDN长期缓存"""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+upload_service = UploadService()
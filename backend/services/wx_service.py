@@ -1,6 +1,7 @@
-import httpx
+import asyncio
 from typing import Optional, Dict, Any
 from config import get_settings
+from services.http_client import http_clients
 
 settings = get_settings()
 
@@ -8,12 +9,19 @@ settings = get_settings()
 class WxService:
     """微信小程序服务端API封装"""
     
+    # access_token 失效，刷新后可立即重试
+    TOKEN_ERRCODES = {40001, 42001}
+    # 系统繁忙 / 分钟级频率限制 / 网络异常，退避后可重试
+    TRANSIENT_ERRCODES = {-1, 45011}
+    NETWORK_ERROR = -2
+    
     _access_token: Optional[str] = None
     _token_expire_time: Optional[float] = None
+    _token_lock: Optional[asyncio.Lock] = None
     
     @classmethod
     async def get_access_token(cls) -> str:
-        """获取小程序全局access_token（带缓存）"""
+        """获取小程序全局access_token（带缓存，并发调用只刷新一次）"""
         import time
         
         # 检查缓存是否有效（提前5分钟过期）
@@ -21,45 +29,49 @@ class WxService:
             if time.time() < cls._token_expire_time - 300:
                 return cls._access_token
         
-        # 重新获取
-        url = "https://api.weixin.qq.com/cgi-bin/token"
-        params = {
-            "grant_type": "client_credential",
-            "appid": settings.WX_APPID,
-            "secret": settings.WX_SECRET
-        }
+        if cls._token_lock is None:
+            cls._token_lock = asyncio.Lock()
         
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url, params=params)
+        async with cls._token_lock:
+            if cls._access_token and cls._token_expire_time:
+                if time.time() < cls._token_expire_time - 300:
+                    return cls._access_token
+            
+            # 重新获取
+            params = {
+                "grant_type": "client_credential",
+                "appid": settings.WX_APPID,
+                "secret": settings.WX_SECRET
+            }
+            
+            resp = await http_clients.get("wx", "/cgi-bin/token", params=params)
             data = resp.json()
-        
-        if "access_token" not in data:
-            raise Exception(f"获取access_token失败: {data}")
-        
-        cls._access_token = data["access_token"]
-        cls._token_expire_time = time.time() + data.get("expires_in", 7200)
+            
+            if "access_token" not in data:
+                raise Exception(f"获取access_token失败: {data}")
+            
+            cls._access_token = data["access_token"]
+            cls._token_expire_time = time.time() + data.get("expires_in", 7200)
         
         return cls._access_token
     
     @classmethod
-    async def send_subscribe_message(
+    def invalidate_access_token(cls):
+        """access_token 被微信判定失效时调用，下次请求重新获取"""
+        cls._access_token = None
+        cls._token_expire_time = None
+    
+    @classmethod
+    async def deliver_subscribe_message(
         cls,
         openid: str,
         template_id: str,
         page: str,
         data: Dict[str, Any]
-    ) -> bool:
-        """
-        发送订阅消息（用户需提前订阅）
-        
-        模板示例（到期提醒）:
-        - thing1: 图书名称
-        - time2: 到期时间  
-        - thing3: 提醒事项
-        """
+    ) -> int:
+        """发送订阅消息，返回微信errcode（0为成功，网络异常返回 NETWORK_ERROR）"""
         try:
             access_token = await cls.get_access_token()
-            url = f"https://api.weixin.qq.com/cgi-bin/message/subscribe/send?access_token={access_token}"
             
             payload = {
                 "touser": openid,
@@ -71,24 +83,76 @@ class WxService:
                 }
             }
             
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(url, json=payload)
-                result = resp.json()
-            
-            if result.get("errcode") == 0:
-                return True
-            
-            # 特定错误处理
-            if result.get("errcode") == 43101:
-                print(f"用户 {openid} 未订阅消息模板")
-            else:
-                print(f"发送消息失败: {result}")
+            resp = await http_clients.post(
+                "wx",
+                "/cgi-bin/message/subscribe/send",
+                params={"access_token": access_token},
+                json=payload
+            )
+            result = resp.json()
             
-            return False
+            return int(result.get("errcode", -1))
             
         except Exception as e:
             print(f"发送订阅消息异常: {e}")
-            return False
+            return cls.NETWORK_ERROR
+    
+    @classmethod
+    async def send_subscribe_message(
+        cls,
+        openid: str,
+        template_id: str,
+        page: str,
+        data: Dict[str, Any]
+    ) -> bool:
+        """
+        发送订阅消息（用户需提前订阅）
+        
+        模板示例（到期提醒）:
+        - thing1: 图书名称
+        - time2: 到期时间  
+        - thing3: 提醒事项
+        """
+        errcode = await cls.deliver_subscribe_message(openid, template_id, page, data)
+        
+        if errcode == 0:
+            return True
+        
+        # 特定错误处理
+        if errcode in cls.TOKEN_ERRCODES:
+            cls.invalidate_access_token()
+        if errcode == 43101:
+            print(f"用户 {openid} 未订阅消息模板")
+        else:
+            print(f"发送消息失败: errcode={errcode}")
+        
+        return False
+    
+    @staticmethod
+    def due_reminder_message(book_title: str, due_date: str, days_left: int) -> Dict[str, Any]:
+        """到期提醒消息内容（template_id / page / data）"""
+        return {
+            "template_id": "your_template_id_here",  # 到期提醒模板ID
+            "page": "pages/borrow-list/borrow-list",
+            "data": {
+                "thing1": book_title,      # 图书名称
+                "time2": due_date,         # 到期时间
+                "thing3": f"还有{days_left}天到期，请及时归还或续借"  # 提醒事项
+            }
+        }
+    
+    @staticmethod
+    def overdue_notice_message(book_title: str, due_date: str, overdue_days: int) -> Dict[str, Any]:
+        """逾期提醒消息内容（template_id / page / data）"""
+        return {
+            "template_id": "your_template_id_here",  # 逾期提醒模板ID
+            "page": "pages/borrow-list/borrow-list",
+            "data": {
+                "thing1": book_title,      # 图书名称
+                "time2": due_date,         # 应还日期
+                "thing3": f"已逾期{overdue_days}天，请立即归还"  # 逾期说明
+            }
+        }
     
     @classmethod
     async def send_borrow_success_notice(
@@ -123,17 +187,9 @@ class WxService:
         days_left: int
     ) -> bool:
         """到期前提醒"""
-        template_id = "your_template_id_here"  # 到期提醒模板ID
-        
         return await cls.send_subscribe_message(
             openid=openid,
-            template_id=template_id,
-            page="pages/borrow-list/borrow-list",
-            data={
-                "thing1": book_title,      # 图书名称
-                "time2": due_date,         # 到期时间
-                "thing3": f"还有{days_left}天到期，请及时归还或续借"  # 提醒事项
-            }
+            **cls.due_reminder_message(book_title, due_date, days_left)
         )
     
     @classmethod
@@ -145,17 +201,9 @@ class WxService:
         overdue_days: int
     ) -> bool:
         """逾期提醒"""
-        template_id = "your_template_id_here"  # 逾期提醒模板ID
-        
         return await cls.send_subscribe_message(
             openid=openid,
-            template_id=template_id,
-            page="pages/borrow-list/borrow-list",
-            data={
-                "thing1": book_title,      # 图书名称
-                "time2": due_date,         # 应还日期
-                "thing3": f"已逾期{overdue_days}天，请立即归还"  # 逾期说明
-            }
+            **cls.overdue_notice_message(book_title, due_date, overdue_days)
         )
 
 
@@ -1,4 +1,4 @@
 from .scheduler import scheduler
-from .jobs import ReminderJob, MaintenanceJob
+from .jobs import ReminderJob, MaintenanceJob, RollupJob
 
-__all__ = ["scheduler", "ReminderJob", "MaintenanceJob"]
+__all__ = ["scheduler", "ReminderJob", "MaintenanceJob", "RollupJob"]
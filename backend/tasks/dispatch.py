@@ -0,0 +1,118 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import get_settings
+from services import wx_service
+
+settings = get_settings()
+
+
+class TokenBucket:
+    """令牌桶限速：平均速率 rate 次/秒，允许 capacity 的瞬时突发"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # 持锁等待，等待者按到达顺序依次取得令牌
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class Notice:
+    """一条待发送的订阅消息"""
+    borrow_id: int
+    openid: str
+    message: Dict[str, Any]  # template_id / page / data
+
+
+@dataclass
+class DispatchResult:
+    sent: List[int] = field(default_factory=list)      # 发送成功的借阅ID
+    failed: Dict[int, int] = field(default_factory=dict)  # 借阅ID -> 最后一次errcode
+
+
+class NoticeDispatcher:
+    """
+    订阅消息批量发送
+    固定数量的worker并发发送，共用令牌桶（连接复用见 http_clients）；
+    access_token 失效时刷新后立即重试，系统繁忙/频率限制/网络异常按指数退避重试
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        rate: Optional[float] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.concurrency = concurrency or settings.WX_SEND_CONCURRENCY
+        self.bucket = TokenBucket(rate or settings.WX_SEND_RATE)
+        self.max_retries = settings.WX_SEND_MAX_RETRIES if max_retries is None else max_retries
+
+    async def dispatch(self, notices: Iterable[Notice]) -> DispatchResult:
+        queue: asyncio.Queue = asyncio.Queue()
+        for notice in notices:
+            queue.put_nowait(notice)
+
+        result = DispatchResult()
+        if queue.empty():
+            return result
+
+        workers = [
+            asyncio.create_task(self._worker(queue, result))
+            for _ in range(min(self.concurrency, queue.qsize()))
+        ]
+        await asyncio.gather(*workers)
+
+        return result
+
+    async def _worker(self, queue: asyncio.Queue, result: DispatchResult):
+        while True:
+            try:
+                notice = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            errcode = await self._send(notice)
+            if errcode == 0:
+                result.sent.append(notice.borrow_id)
+            else:
+                result.failed[notice.borrow_id] = errcode
+
+    async def _send(self, notice: Notice) -> int:
+        errcode = wx_service.NETWORK_ERROR
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            errcode = await wx_service.deliver_subscribe_message(
+                openid=notice.openid, **notice.message
+            )
+            if errcode == 0:
+                return 0
+
+            if errcode in wx_service.TOKEN_ERRCODES:
+                wx_service.invalidate_access_token()
+                continue
+            if errcode not in wx_service.TRANSIENT_ERRCODES and errcode != wx_service.NETWORK_ERROR:
+                # 未订阅(43101)、参数错误等，重试无意义
+                return errcode
+
+            await asyncio.sleep(0.5 * 2 ** attempt + random.random() * 0.5)
+
+        return errcode
@@ -1,15 +1,21 @@
-from datetime import datetime, timedelta
-from sqlalchemy import select, and_, or_
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Tuple
 
 from database import async_session_maker
 from models import BorrowRecord, User, Book
-from services import wx_service
+from services import wx_service, stats_service, rollup_service, cover_service, archive_service, audit_service
 from config import get_settings
+from tasks.dispatch import Notice, NoticeDispatcher
+from tasks.telemetry import record
 
 settings = get_settings()
 
+# 回写提醒记录时每条 UPDATE 覆盖的借阅ID数
+REMIND_UPDATE_CHUNK = 1000
+
 
 class ReminderJob:
     """提醒任务集合"""
@@ -31,67 +37,74 @@ class ReminderJob:
     @staticmethod
     async def _send_due_soon_reminders(db: AsyncSession):
         """发送即将到期提醒（到期前N天）"""
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         remind_before = settings.REMIND_BEFORE_DAYS
         
-        # 计算提醒时间窗口（到期前3天 ± 12小时，避免重复发送）
+        # 计算提醒时间窗口（到期前N天 ± 1天）
         target_date_start = now + timedelta(days=remind_before - 1)
         target_date_end = now + timedelta(days=remind_before + 1)
         
-        # 查询即将到期且未提醒过的记录
-        # 实际生产应添加 last_remind_at 字段记录上次提醒时间
+        # 窗口跨两天，用 last_remind_at 保证同一记录在窗口内只提醒一次
         result = await db.execute(
-            select(BorrowRecord, User, Book)
+            select(BorrowRecord.id, BorrowRecord.due_date, User.openid, Book.title)
             .join(User, BorrowRecord.user_id == User.id)
             .join(Book, BorrowRecord.book_isbn == Book.isbn)
             .where(
                 BorrowRecord.status == "active",
                 BorrowRecord.due_date >= target_date_start,
                 BorrowRecord.due_date <= target_date_end,
-                # 简化：每天定时执行，同一记录不会重复提醒（除非跨天）
+                or_(
+                    BorrowRecord.last_remind_at.is_(None),
+                    BorrowRecord.last_remind_at < now - timedelta(days=2)
+                )
             )
         )
         
         records = result.all()
         print(f"找到 {len(records)} 条即将到期记录")
+        record(scanned=len(records))
         
-        for borrow, user, book in records:
-            days_left = (borrow.due_date - now).days
-            
-            success = await wx_service.send_due_reminder(
-                openid=user.openid,
-                book_title=book.title,
-                due_date=borrow.due_date.strftime("%Y-%m-%d"),
-                days_left=max(0, days_left)
+        notices = [
+            Notice(
+                borrow_id=borrow_id,
+                openid=openid,
+                message=wx_service.due_reminder_message(
+                    book_title=title,
+                    due_date=due_date.strftime("%Y-%m-%d"),
+                    days_left=max(0, (due_date - now).days)
+                )
             )
-            
-            if success:
-                print(f"已发送到期提醒: 用户{user.id} - {book.title}")
-            else:
-                print(f"发送失败: 用户{user.id}")
+            for borrow_id, due_date, openid, title in records
+        ]
+        await ReminderJob._dispatch_and_record(db, notices, now, "到期提醒")
     
     @staticmethod
     async def _send_overdue_reminders(db: AsyncSession):
         """发送逾期提醒（逾期后每N天提醒一次）"""
-        now = datetime.utcnow()
-        interval = settings.OVERDUE_REMIND_INTERVAL_DAYS
+        now = datetime.now(timezone.utc)
         
-        # 查询所有逾期记录
+        # 查询所有逾期记录（当天已提醒过的跳过，重复执行不会重复发送）
         result = await db.execute(
-            select(BorrowRecord, User, Book)
+            select(BorrowRecord.id, BorrowRecord.due_date, User.openid, Book.title)
             .join(User, BorrowRecord.user_id == User.id)
             .join(Book, BorrowRecord.book_isbn == Book.isbn)
             .where(
                 BorrowRecord.status == "active",
-                BorrowRecord.due_date < now
+                BorrowRecord.due_date < now,
+                or_(
+                    BorrowRecord.last_remind_at.is_(None),
+                    BorrowRecord.last_remind_at < now - timedelta(hours=20)
+                )
             )
         )
         
         records = result.all()
         print(f"找到 {len(records)} 条逾期记录")
+        record(scanned=len(records))
         
-        for borrow, user, book in records:
-            overdue_days = (now - borrow.due_date).days
+        notices = []
+        for borrow_id, due_date, openid, title in records:
+            overdue_days = (now - due_date).days
             
             # 策略：逾期当天、第3天、第7天、之后每周提醒
             should_remind = (
@@ -102,15 +115,49 @@ class ReminderJob:
             )
             
             if should_remind:
-                success = await wx_service.send_overdue_notice(
-                    openid=user.openid,
-                    book_title=book.title,
-                    due_date=borrow.due_date.strftime("%Y-%m-%d"),
-                    overdue_days=overdue_days
+                notices.append(Notice(
+                    borrow_id=borrow_id,
+                    openid=openid,
+                    message=wx_service.overdue_notice_message(
+                        book_title=title,
+                        due_date=due_date.strftime("%Y-%m-%d"),
+                        overdue_days=overdue_days
+                    )
+                ))
+        
+        await ReminderJob._dispatch_and_record(db, notices, now, "逾期提醒")
+    
+    @staticmethod
+    async def _dispatch_and_record(
+        db: AsyncSession,
+        notices: List[Notice],
+        now: datetime,
+        label: str
+    ):
+        """并发发送，并批量回写发送成功记录的 remind_count / last_remind_at"""
+        if not notices:
+            return
+        
+        started = time.monotonic()
+        result = await NoticeDispatcher().dispatch(notices)
+        
+        for i in range(0, len(result.sent), REMIND_UPDATE_CHUNK):
+            await db.execute(
+                update(BorrowRecord)
+                .where(BorrowRecord.id.in_(result.sent[i:i + REMIND_UPDATE_CHUNK]))
+                .values(
+                    remind_count=func.coalesce(BorrowRecord.remind_count, 0) + 1,
+                    last_remind_at=now
                 )
-                
-                if success:
-                    print(f"已发送逾期提醒: 用户{user.id} - 逾期{overdue_days}天")
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+        record(sent=len(result.sent), failed=len(result.failed))
+        
+        print(
+            f"{label}: 成功 {len(result.sent)} 条，失败 {len(result.failed)} 条，"
+            f"耗时 {time.monotonic() - started:.1f}s"
+        )
     
     @staticmethod
     async def generate_daily_report():
@@ -122,32 +169,18 @@ class ReminderJob:
             today = datetime.utcnow().date()
             yesterday = today - timedelta(days=1)
             
-            # 昨日新增借阅
-            borrow_result = await db.execute(
-                select(BorrowRecord).where(
-                    BorrowRecord.borrowed_at >= yesterday,
-                    BorrowRecord.borrowed_at < today
-                )
-            )
-            new_borrows = len(borrow_result.scalars().all())
+            # 昨日数据读汇总表（夜间汇总任务未跑时当场补算）
+            stat = await rollup_service.get_day(db, yesterday)
+            if stat is None:
+                await rollup_service.rollup_days(db, yesterday, yesterday)
+                await db.commit()
+                stat = await rollup_service.get_day(db, yesterday)
+            new_borrows, returns = stat.borrows, stat.returns
             
-            # 昨日归还
-            return_result = await db.execute(
-                select(BorrowRecord).where(
-                    BorrowRecord.returned_at >= yesterday,
-                    BorrowRecord.returned_at < today
-                )
-            )
-            returns = len(return_result.scalars().all())
-            
-            # 当前逾期总数
-            overdue_result = await db.execute(
-                select(BorrowRecord).where(
-                    BorrowRecord.status == "active",
-                    BorrowRecord.due_date < datetime.utcnow()
-                )
-            )
-            total_overdue = len(overdue_result.scalars().all())
+            # 当前逾期总数（看板计数器，由校准任务刷新）
+            total_overdue = (await stats_service.read(
+                db, [stats_service.BORROWS_OVERDUE]
+            ))[stats_service.BORROWS_OVERDUE]
             
             report = f"""
 【图书系统日报】{yesterday.strftime('%Y-%m-%d')}
@@ -160,6 +193,26 @@ class ReminderJob:
             # TODO: 发送给企业微信机器人或邮件
 
 
+class RollupJob:
+    """汇总任务集合"""
+    
+    # 每晚重算最近几天（覆盖跨天归还、补录等迟到的数据）
+    ROLLUP_LOOKBACK_DAYS = 3
+    
+    @staticmethod
+    async def rollup_daily_stats():
+        """生成借阅日汇总（截至昨天）"""
+        yesterday = datetime.utcnow().date() - timedelta(days=1)
+        start = yesterday - timedelta(days=RollupJob.ROLLUP_LOOKBACK_DAYS - 1)
+        
+        async with async_session_maker() as db:
+            days = await rollup_service.rollup_days(db, start, yesterday)
+            await db.commit()
+        
+        record(days=days)
+        print(f"[{datetime.now()}] 借阅日汇总完成: {start} ~ {yesterday}")
+
+
 class MaintenanceJob:
     """维护任务集合"""
     
@@ -172,22 +225,52 @@ class MaintenanceJob:
         async with async_session_maker() as db:
             now = datetime.utcnow()
             
-            # 查找已逾期但状态仍为active的记录
-            result = await db.execute(
-                select(BorrowRecord).where(
+            # 统计已逾期但状态仍为active的记录
+            overdue_count = await db.scalar(
+                select(func.count(BorrowRecord.id)).where(
                     BorrowRecord.status == "active",
                     BorrowRecord.due_date < now
                 )
             )
             
-            overdue_records = result.scalars().all()
-            
             # 这里可以更新状态为"overdue"（如果业务需要区分）
             # 当前设计：status保持active，通过due_date判断是否逾期
             
-            print(f"检查完成，当前逾期记录: {len(overdue_records)} 条")
+            record(scanned=overdue_count)
+            print(f"检查完成，当前逾期记录: {overdue_count} 条")
+    
+    @staticmethod
+    async def reconcile_stats():
+        """看板计数器全量校准（同时刷新逾期数、当日借书人数）"""
+        async with async_session_maker() as db:
+            values = await stats_service.reconcile(db)
+            await db.commit()
+
+        record(counters=len(values))
+        print(f"[{datetime.now()}] 计数器校准完成: {len(values)} 项")
+    
+    @staticmethod
+    async def cleanup_cover_files():
+        """删除已无图书引用的封面缩略图（封面地址变更或图书删除后遗留）"""
+        async with async_session_maker() as db:
+            removed = await cover_service.cleanup_orphans(db)
+
+        record(removed=removed)
+        print(f"[{datetime.now()}] 封面清理完成: 删除 {removed} 个文件")
     
     @staticmethod
     async def cleanup_old_records():
-        """清理历史数据（可选，保留最近2年）"""
-        pass
+        """归档历史借阅：归还超过 BORROW_ARCHIVE_DAYS 天的记录移入按年分区的归档表"""
+        async with async_session_maker() as db:
+            moved = await archive_service.run(db)
+
+        record(archived=moved)
+        print(f"[{datetime.now()}] 借阅归档完成: 移入归档 {moved} 条")
+    
+    @staticmethod
+    async def rotate_audit_partitions():
+        """审计日志分区维护：预建后续月分区，删除保留期外的月分区"""
+        dropped = await audit_service.rotate_partitions()
+
+        record(dropped=len(dropped))
+        print(f"[{datetime.now()}] 审计日志分区维护完成: 删除 {len(dropped)} 个分区 {dropped}")
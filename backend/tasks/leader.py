@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from database import engine
+from config import get_settings
+
+settings = get_settings()
+
+
+class LeaderElector:
+    """
+    基于 PostgreSQL 会话级 advisory lock 的选主
+    持锁进程即为 leader；进程退出或连接断开时锁自动释放，其他进程下一轮检查时接替
+    """
+
+    def __init__(self, lock_key: int, interval: float):
+        self.lock_key = lock_key
+        self.interval = interval
+        self.is_leader = False
+        self._conn: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """先同步尝试一次（启动即执行的任务能立即判断身份），再后台定期检查"""
+        await self._check()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._conn is not None:
+            try:
+                if self.is_leader:
+                    await self._conn.execute(
+                        text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key}
+                    )
+                await self._conn.close()
+            except Exception:
+                await self._discard()
+        self._conn = None
+        self.is_leader = False
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._check()
+
+    async def _check(self):
+        try:
+            if self._conn is None:
+                # 独立连接、自动提交：锁跟随连接存在，不占用长事务
+                conn = await engine.connect()
+                self._conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+            if self.is_leader:
+                # 已持锁：确认连接仍然可用
+                await self._conn.execute(text("SELECT 1"))
+                return
+
+            acquired = await self._conn.scalar(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key}
+            )
+            if acquired:
+                self.is_leader = True
+                print(f"[{datetime.now()}] 当前进程成为定时任务leader")
+        except Exception as e:
+            if self.is_leader:
+                print(f"[{datetime.now()}] 选主连接异常，放弃leader身份: {e}")
+            self.is_leader = False
+            await self._discard()
+
+    async def _discard(self):
+        """丢弃连接（不放回连接池，避免把锁带给其他使用者）"""
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            await conn.invalidate()
+            await conn.close()
+        except Exception:
+            pass
+
+
+leader = LeaderElector(
+    lock_key=settings.SCHEDULER_LOCK_KEY,
+    interval=settings.SCHEDULER_LEADER_CHECK_SECONDS
+)
@@ -1,21 +1,39 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import wraps
 
-from tasks.jobs import ReminderJob, MaintenanceJob
+from tasks.jobs import ReminderJob, MaintenanceJob, RollupJob
+from tasks.leader import leader
+from tasks.telemetry import instrument
 from config import get_settings
 
 settings = get_settings()
 
 
 class TaskScheduler:
-    """定时任务调度器封装"""
+    """
+    定时任务调度器封装
+    每个进程都注册任务，但只有选主成功的进程真正执行（多worker/多实例部署时每个任务只跑一次）
+    """
     
     def __init__(self):
         self.scheduler = AsyncIOScheduler(timezone="Asia/Shanghai")
+        self.leader = leader
         self._initialized = False
     
+    def _wrap(self, func, job_id: str, job_name: str):
+        """包装任务：非leader进程直接跳过；leader执行时记录到 scheduler_logs"""
+        func = instrument(job_id, job_name)(func)
+        
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not self.leader.is_leader:
+                return None
+            return await func(*args, **kwargs)
+        return wrapper
+    
     def init_jobs(self):
         """初始化所有定时任务"""
         if self._initialized:
@@ -23,7 +41,7 @@ class TaskScheduler:
         
         # ===== 提醒任务：每天上午9点执行 =====
         self.scheduler.add_job(
-            func=ReminderJob.check_and_send_reminders,
+            func=self._wrap(ReminderJob.check_and_send_reminders, "daily_reminder", "每日到期提醒"),
             trigger=CronTrigger(
                 hour=settings.REMINDER_CRON_HOUR,
                 minute=settings.REMINDER_CRON_MINUTE
@@ -33,9 +51,18 @@ class TaskScheduler:
             replace_existing=True
         )
         
+        # ===== 借阅日汇总：每天08:15执行（汇总按UTC日期，北京时间8点后前一天才结束） =====
+        self.scheduler.add_job(
+            func=self._wrap(RollupJob.rollup_daily_stats, "daily_rollup", "借阅日汇总"),
+            trigger=CronTrigger(hour=8, minute=15),
+            id="daily_rollup",
+            name="借阅日汇总",
+            replace_existing=True
+        )
+        
         # ===== 日报任务：每天上午9:30执行 =====
         self.scheduler.add_job(
-            func=ReminderJob.generate_daily_report,
+            func=self._wrap(ReminderJob.generate_daily_report, "daily_report", "每日统计报告"),
             trigger=CronTrigger(hour=9, minute=30),
             id="daily_report",
             name="每日统计报告",
@@ -44,29 +71,74 @@ class TaskScheduler:
         
         # ===== 维护任务：每小时执行一次 =====
         self.scheduler.add_job(
-            func=MaintenanceJob.auto_mark_overdue,
+            func=self._wrap(MaintenanceJob.auto_mark_overdue, "maintenance", "系统维护检查"),
             trigger=IntervalTrigger(hours=1),
             id="maintenance",
             name="系统维护检查",
             replace_existing=True
         )
         
+        # ===== 计数器校准：启动时执行一次，之后每N分钟 =====
+        self.scheduler.add_job(
+            func=self._wrap(MaintenanceJob.reconcile_stats, "stats_reconcile", "看板计数器校准"),
+            trigger=IntervalTrigger(minutes=settings.STATS_RECONCILE_MINUTES),
+            id="stats_reconcile",
+            name="看板计数器校准",
+            next_run_time=datetime.now(timezone.utc),
+            replace_existing=True
+        )
+        
+        # ===== 借阅归档：每天凌晨3:30将早已归还的记录移入归档表 =====
+        self.scheduler.add_job(
+            func=self._wrap(MaintenanceJob.cleanup_old_records, "borrow_archive", "借阅归档"),
+            trigger=CronTrigger(hour=3, minute=30),
+            id="borrow_archive",
+            name="借阅归档",
+            replace_existing=True
+        )
+        
+        # ===== 审计日志分区：每天凌晨3:45预建月分区、删除过期分区 =====
+        self.scheduler.add_job(
+            func=self._wrap(MaintenanceJob.rotate_audit_partitions, "audit_partitions", "审计日志分区维护"),
+            trigger=CronTrigger(hour=3, minute=45),
+            id="audit_partitions",
+            name="审计日志分区维护",
+            replace_existing=True
+        )
+        
+        # ===== 封面清理：每周日凌晨4点删除无引用的封面缩略图 =====
+        self.scheduler.add_job(
+            func=self._wrap(MaintenanceJob.cleanup_cover_files, "cover_cleanup", "封面文件清理"),
+            trigger=CronTrigger(day_of_week="sun", hour=4, minute=0),
+            id="cover_cleanup",
+            name="封面文件清理",
+            replace_existing=True
+        )
+        
         self._initialized = True
         print(f"[{datetime.now()}] 定时任务初始化完成")
         print(f"  - 每日提醒: {settings.REMINDER_CRON_HOUR}:{settings.REMINDER_CRON_MINUTE:02d}")
+        print("  - 借阅日汇总: 08:15")
         print(f"  - 日报统计: 09:30")
         print(f"  - 维护检查: 每小时")
+        print(f"  - 计数器校准: 每{settings.STATS_RECONCILE_MINUTES}分钟")
+        print(f"  - 借阅归档: 03:30（归还超过{settings.BORROW_ARCHIVE_DAYS}天）")
+        print(f"  - 审计日志分区: 03:45（保留{settings.AUDIT_RETENTION_MONTHS}个月）")
+        print("  - 封面清理: 每周日 04:00")
     
-    def start(self):
-        """启动调度器"""
+    async def start(self):
+        """参与选主并启动调度器"""
         if not self._initialized:
             self.init_jobs()
+        await self.leader.start()
         self.scheduler.start()
-        print("定时任务调度器已启动")
+        role = "leader" if self.leader.is_leader else "standby"
+        print(f"定时任务调度器已启动（{role}）")
     
-    def shutdown(self):
-        """关闭调度器"""
+    async def shutdown(self):
+        """关闭调度器并释放leader锁（其他进程随即接替）"""
         self.scheduler.shutdown()
+        await self.leader.stop()
         print("定时任务调度器已关闭")
     
     def get_jobs(self):
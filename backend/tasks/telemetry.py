@@ -0,0 +1,94 @@
+import json
+import time
+import traceback
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import Dict, Optional
+
+from sqlalchemy import update
+
+from database import async_session_maker
+from models import SchedulerLog
+
+# 当前正在执行的任务的计数（扫描行数、发送成功/失败数等）
+_current_counts: ContextVar[Optional[Dict[str, int]]] = ContextVar("job_counts", default=None)
+
+
+def record(**counts: int):
+    """在任务内累加计数，结束时写入 scheduler_logs.result（不在任务上下文中时忽略）"""
+    current = _current_counts.get()
+    if current is None:
+        return
+    for name, value in counts.items():
+        current[name] = current.get(name, 0) + int(value)
+
+
+def instrument(job_id: str, job_name: str):
+    """
+    任务执行记录：开始时写入一条 running 记录，结束时更新状态、耗时、计数与异常
+    记录写入失败不影响任务本身
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            log_id = await _start(job_id, job_name)
+            counts: Dict[str, int] = {}
+            token = _current_counts.set(counts)
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                await _finish(log_id, "failed", started, counts, "".join(
+                    traceback.format_exception(type(e), e, e.__traceback__)
+                ))
+                raise
+            finally:
+                _current_counts.reset(token)
+            await _finish(log_id, "success", started, counts)
+            return result
+        return wrapper
+    return decorator
+
+
+async def _start(job_id: str, job_name: str) -> Optional[int]:
+    try:
+        async with async_session_maker() as db:
+            log = SchedulerLog(
+                job_id=job_id, job_name=job_name, status="running",
+                started_at=datetime.utcnow()
+            )
+            db.add(log)
+            await db.commit()
+            return log.id
+    except Exception as e:
+        print(f"写入任务记录失败: {e}")
+        return None
+
+
+async def _finish(
+    log_id: Optional[int],
+    status: str,
+    started: float,
+    counts: Dict[str, int],
+    error: Optional[str] = None
+):
+    duration_ms = int((time.perf_counter() - started) * 1000)
+    print(f"[{datetime.now()}] 任务结束: {status}，耗时 {duration_ms}ms {counts or ''}")
+    if log_id is None:
+        return
+    try:
+        async with async_session_maker() as db:
+            await db.execute(
+                update(SchedulerLog)
+                .where(SchedulerLog.id == log_id)
+                .values(
+                    status=status,
+                    finished_at=datetime.utcnow(),
+                    result=json.dumps({"duration_ms": duration_ms, **counts}),
+                    error=error[-4000:] if error else None
+                )
+            )
+            await db.commit()
+    except Exception as e:
+        print(f"更新任务记录失败: {e}")
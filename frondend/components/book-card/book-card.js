@@ -1,11 +1,25 @@
+const config = require('../../config');
+
 Component({
     properties: {
         book: {
             type: Object,
-            value: {}
+            value: {},
+            observer(book) {
+                // 优先使用服务端代理的缩略图（体积小、可长期缓存）
+                this.setData({
+                    coverSrc: book && book.cover_thumb
+                        ? config.baseUrl + book.cover_thumb
+                        : (book && book.cover_url) || '/images/default-book.png'
+                });
+            }
         }
     },
 
+    data: {
+        coverSrc: '/images/default-book.png'
+    },
+
     methods: {
         onTap() {
             this.triggerEvent('tapcard', { isbn: this.properties.book.isbn });
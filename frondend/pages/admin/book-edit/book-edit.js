@@ -11,7 +11,10 @@ Page({
             total_borrows: 0,
             active_borrows: 0
         },
-        borrowHistory: []
+        borrowHistory: [],
+        historyCursor: null,
+        historyHasMore: false,
+        historyLoading: false
     },
 
     onLoad(options) {
@@ -40,22 +43,40 @@ Page({
     },
 
     loadHistory() {
-        api.get(`/admin/books/${this.data.isbn}/history`).then(data => {
-            const history = data.map(item => ({
+        if (this.data.historyLoading) return;
+        this.setData({ historyLoading: true });
+
+        const params = {
+            cursor: this.data.historyCursor || undefined,
+            limit: 20
+        };
+
+        return api.get(`/admin/books/${this.data.isbn}/history`, params).then(data => {
+            const history = data.items.map(item => ({
                 ...item,
                 status_text: item.status === 'active' ? '借阅中' :
                     item.status === 'returned' ? '已归还' : '已逾期'
             }));
             this.setData({
-                borrowHistory: history,
+                borrowHistory: this.data.historyCursor ? [...this.data.borrowHistory, ...history] : history,
+                historyHasMore: !!data.next_cursor,
+                historyCursor: data.next_cursor,
                 stats: {
-                    total_borrows: history.length,
-                    active_borrows: history.filter(h => h.status === 'active').length
+                    total_borrows: data.stats.total,
+                    active_borrows: data.stats.active
                 }
             });
+        }).finally(() => {
+            this.setData({ historyLoading: false });
         });
     },
 
+    loadMoreHistory() {
+        if (this.data.historyHasMore) {
+            this.loadHistory();
+        }
+    },
+
     onInput(e) {
         const field = e.currentTarget.dataset.field;
         this.setData({
@@ -5,7 +5,7 @@ Page({
         keyword: '',
         currentFilter: 'all',
         books: [],
-        page: 1,
+        cursor: null,
         hasMore: true,
         loading: false
     },
@@ -15,7 +15,7 @@ Page({
     },
 
     onPullDownRefresh() {
-        this.setData({ page: 1, books: [] });
+        this.setData({ cursor: null, books: [] });
         this.loadBooks().then(() => {
             wx.stopPullDownRefresh();
         });
@@ -26,18 +26,18 @@ Page({
         this.setData({ loading: true });
 
         const params = {
-            page: this.data.page,
+            cursor: this.data.cursor || undefined,
             limit: 20,
             keyword: this.data.keyword || undefined,
             filter: this.data.currentFilter !== 'all' ? this.data.currentFilter : undefined
         };
 
         return api.get('/admin/books', params).then(data => {
-            const newBooks = this.data.page === 1 ? data.items : [...this.data.books, ...data.items];
+            const newBooks = this.data.cursor ? [...this.data.books, ...data.items] : data.items;
             this.setData({
                 books: newBooks,
-                hasMore: data.items.length === 20,
-                page: this.data.page + 1
+                hasMore: !!data.next_cursor,
+                cursor: data.next_cursor
             });
         }).finally(() => {
             this.setData({ loading: false });
@@ -55,14 +55,14 @@ Page({
     },
 
     doSearch() {
-        this.setData({ page: 1, books: [] });
+        this.setData({ cursor: null, books: [] });
         this.loadBooks();
     },
 
     setFilter(e) {
         this.setData({
             currentFilter: e.currentTarget.dataset.filter,
-            page: 1,
+            cursor: null,
             books: []
         });
         this.loadBooks();
@@ -4,36 +4,67 @@ Page({
     data: {
         activeTab: 'active',
         records: [],
-        counts: { active: 0, returned: 0, overdue: 0 }
+        counts: { active: 0, returned: 0, overdue: 0 },
+        cursor: null,
+        hasMore: true,
+        loading: false
     },
 
     onLoad() {
-        this.loadData();
         this.loadCounts();
     },
 
     onShow() {
-        this.loadData();
+        this.reload();
+    },
+
+    onReachBottom() {
+        this.loadMore();
     },
 
     switchTab(e) {
         this.setData({ activeTab: e.currentTarget.dataset.tab }, () => {
-            this.loadData();
+            this.reload();
         });
     },
 
+    reload() {
+        this.setData({ cursor: null, records: [] });
+        this.loadData();
+    },
+
     loadData() {
-        const status = this.data.activeTab;
-        api.get('/admin/borrows', { status }).then(data => {
+        if (this.data.loading) return;
+        this.setData({ loading: true });
+
+        const params = {
+            status: this.data.activeTab,
+            cursor: this.data.cursor || undefined,
+            limit: 20
+        };
+
+        return api.get('/admin/borrows', params).then(data => {
             const now = new Date();
-            const records = data.map(r => ({
+            const items = data.items.map(r => ({
                 ...r,
                 is_overdue: new Date(r.due_date) < now && r.status === 'active'
             }));
-            this.setData({ records });
+            this.setData({
+                records: this.data.cursor ? [...this.data.records, ...items] : items,
+                hasMore: !!data.next_cursor,
+                cursor: data.next_cursor
+            });
+        }).finally(() => {
+            this.setData({ loading: false });
         });
     },
 
+    loadMore() {
+        if (this.data.hasMore) {
+            this.loadData();
+        }
+    },
+
     loadCounts() {
         api.get('/admin/borrows/counts').then(data => {
             this.setData({ counts: data });
@@ -56,7 +87,7 @@ Page({
                 if (res.confirm) {
                     api.put(`/admin/borrows/${id}/force-return`).then(() => {
                         wx.showToast({ title: '已强制归还' });
-                        this.loadData();
+                        this.reload();
                         this.loadCounts();
                     });
                 }
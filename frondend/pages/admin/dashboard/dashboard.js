@@ -1,5 +1,6 @@
 const api = require('../../../utils/request');
 const auth = require('../../../utils/auth');
+const config = require('../../../config');
 
 Page({
     data: {
@@ -93,11 +94,24 @@ Page({
     },
 
     doExport(type) {
-        api.get(`/admin/export?type=${type}`).then(data => {
-            wx.setClipboardData({
-                data: data.download_url,
-                success: () => wx.showToast({ title: '链接已复制' })
-            });
+        wx.showLoading({ title: '导出中' });
+        wx.downloadFile({
+            url: `${config.baseUrl}/admin/export?type=${type}`,
+            header: {
+                Authorization: `Bearer ${wx.getStorageSync('token')}`
+            },
+            success: (res) => {
+                if (res.statusCode !== 200) {
+                    wx.showToast({ title: '导出失败', icon: 'none' });
+                    return;
+                }
+                wx.shareFileMessage({
+                    filePath: res.tempFilePath,
+                    fileName: `${type}.csv`
+                });
+            },
+            fail: () => wx.showToast({ title: '网络错误', icon: 'none' }),
+            complete: () => wx.hideLoading()
         });
     }
 });
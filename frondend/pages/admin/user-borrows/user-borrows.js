@@ -4,7 +4,10 @@ Page({
     data: {
         userId: null,
         records: [],
-        stats: {}
+        stats: {},
+        cursor: null,
+        hasMore: true,
+        loading: false
     },
 
     onLoad(options) {
@@ -12,12 +15,34 @@ Page({
         this.loadData();
     },
 
+    onReachBottom() {
+        this.loadMore();
+    },
+
     loadData() {
-        api.get(`/admin/users/${this.data.userId}/borrows`).then(data => {
+        if (this.data.loading) return;
+        this.setData({ loading: true });
+
+        const params = {
+            cursor: this.data.cursor || undefined,
+            limit: 20
+        };
+
+        return api.get(`/admin/users/${this.data.userId}/borrows`, params).then(data => {
             this.setData({
-                records: data.records,
+                records: this.data.cursor ? [...this.data.records, ...data.records] : data.records,
+                hasMore: !!data.next_cursor,
+                cursor: data.next_cursor,
                 stats: data.stats
             });
+        }).finally(() => {
+            this.setData({ loading: false });
         });
+    },
+
+    loadMore() {
+        if (this.data.hasMore) {
+            this.loadData();
+        }
     }
 });
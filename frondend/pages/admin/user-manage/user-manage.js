@@ -5,7 +5,7 @@ Page({
     keyword: '',
     filter: 'all',
     users: [],
-    page: 1,
+    cursor: null,
     hasMore: true,
     loading: false,
     stats: {
@@ -23,7 +23,7 @@ Page({
   },
 
   onPullDownRefresh() {
-    this.setData({ page: 1, users: [] });
+    this.setData({ cursor: null, users: [] });
     Promise.all([
       this.loadStats(),
       this.loadUsers()
@@ -43,18 +43,18 @@ Page({
     this.setData({ loading: true });
 
     const params = {
-      page: this.data.page,
+      cursor: this.data.cursor || undefined,
       limit: 20,
       keyword: this.data.keyword || undefined,
       filter: this.data.filter !== 'all' ? this.data.filter : undefined
     };
 
     return api.get('/admin/users', params).then(data => {
-      const newUsers = this.data.page === 1 ? data.items : [...this.data.users, ...data.items];
+      const newUsers = this.data.cursor ? [...this.data.users, ...data.items] : data.items;
       this.setData({
         users: newUsers,
-        hasMore: data.items.length === 20,
-        page: this.data.page + 1
+        hasMore: !!data.next_cursor,
+        cursor: data.next_cursor
       });
     }).finally(() => {
       this.setData({ loading: false });
@@ -72,14 +72,14 @@ Page({
   },
 
   doSearch() {
-    this.setData({ page: 1, users: [] });
+    this.setData({ cursor: null, users: [] });
     this.loadUsers();
   },
 
   setFilter(e) {
     this.setData({
       filter: e.currentTarget.dataset.filter,
-      page: 1,
+      cursor: null,
       users: []
     });
     this.loadUsers();
@@ -1,4 +1,5 @@
 const api = require('../../utils/request');
+const config = require('../../config');
 
 Page({
     data: {
@@ -23,6 +24,9 @@ Page({
     loadBook(isbn) {
         api.get(`/books/${isbn}`)
             .then((data) => {
+                if (data.cover_thumb) {
+                    data.cover_url = config.baseUrl + data.cover_thumb;
+                }
                 this.setData({
                     book: data,
                     isBorrowed: data.user_borrow_id !== null,
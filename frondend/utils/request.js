@@ -1,20 +1,48 @@
 const config = require('../config');
 
+// GET 响应的 ETag 缓存：再次请求时带 If-None-Match，服务端返回304则复用上次数据
+const ETAG_CACHE_MAX = 50;
+const etagCache = new Map();
+
+const rememberEtag = (key, etag, data) => {
+    etagCache.delete(key);
+    etagCache.set(key, { etag, data });
+    if (etagCache.size > ETAG_CACHE_MAX) {
+        etagCache.delete(etagCache.keys().next().value);
+    }
+};
+
 const request = (options) => {
     return new Promise((resolve, reject) => {
         const token = wx.getStorageSync('token');
+        const method = options.method || 'GET';
+        const cacheKey = method === 'GET'
+            ? `${token}|${options.url}|${JSON.stringify(options.data || {})}`
+            : null;
+        const cached = cacheKey ? etagCache.get(cacheKey) : null;
+
+        const header = {
+            'Content-Type': 'application/json',
+            Authorization: token ? `Bearer ${token}` : ''
+        };
+        if (cached) {
+            header['If-None-Match'] = cached.etag;
+        }
 
         wx.request({
             url: config.baseUrl + options.url,
-            method: options.method || 'GET',
+            method,
             data: options.data,
-            header: {
-                'Content-Type': 'application/json',
-                Authorization: token ? `Bearer ${token}` : ''
-            },
+            header,
             timeout: config.timeout,
             success: (res) => {
-                if (res.statusCode === 200) {
+                if (res.statusCode === 304 && cached) {
+                    resolve(cached.data);
+                } else if (res.statusCode === 200) {
+                    const etag = res.header && (res.header.ETag || res.header.Etag || res.header.etag);
+                    if (cacheKey && etag) {
+                        rememberEtag(cacheKey, etag, res.data);
+                    }
                     resolve(res.data);
                 } else if (res.statusCode === 401) {
                     wx.removeStorageSync('token');
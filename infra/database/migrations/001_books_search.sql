@@ -0,0 +1,73 @@
+-- 迁移 001：图书全文检索（pg_trgm + tsvector）
+-- 替换 search_books / list_books_admin 中无法走索引的 ILIKE '%kw%' 扫描
+-- 用法: psql -d library -f 001_books_search.sql
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+-- 图书全文检索：中文按相邻二字切分（bigram），其余文本交给 simple 分词器
+CREATE OR REPLACE FUNCTION search_tokens(src TEXT) RETURNS TEXT AS $$
+DECLARE
+    run TEXT;
+    parts TEXT[] := ARRAY[regexp_replace(coalesce(src, ''), '[\u3400-\u9fff]+', ' ', 'g')];
+    i INT;
+BEGIN
+    FOR run IN SELECT m[1] FROM regexp_matches(coalesce(src, ''), '([\u3400-\u9fff]+)', 'g') AS m LOOP
+        IF char_length(run) = 1 THEN
+            parts := parts || run;
+        ELSE
+            FOR i IN 1 .. char_length(run) - 1 LOOP
+                parts := parts || substr(run, i, 2);
+            END LOOP;
+        END IF;
+    END LOOP;
+    RETURN array_to_string(parts, ' ');
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION books_search_document(title TEXT, author TEXT, tags TEXT[])
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple', search_tokens(title)), 'A')
+        || setweight(to_tsvector('simple', search_tokens(author)), 'B')
+        || setweight(to_tsvector('simple', search_tokens(array_to_string(tags, ' '))), 'C')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION books_search_vector_update() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector := books_search_document(NEW.title, NEW.author, NEW.tags);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS books_search_vector_trigger ON books;
+CREATE TRIGGER books_search_vector_trigger BEFORE INSERT OR UPDATE OF title, author, tags ON books
+    FOR EACH ROW EXECUTE FUNCTION books_search_vector_update();
+
+-- 回填已有图书（临时停用 updated_at 触发器，避免所有图书的 ETag 失效）
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_trigger
+               WHERE tgname = 'update_books_updated_at' AND tgrelid = 'books'::regclass) THEN
+        ALTER TABLE books DISABLE TRIGGER update_books_updated_at;
+    END IF;
+END $$;
+
+UPDATE books SET search_vector = books_search_document(title, author, tags);
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_trigger
+               WHERE tgname = 'update_books_updated_at' AND tgrelid = 'books'::regclass) THEN
+        ALTER TABLE books ENABLE TRIGGER update_books_updated_at;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_books_search ON books USING gin(search_vector);
+CREATE INDEX IF NOT EXISTS idx_books_title_trgm ON books USING gin(title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_books_author_trgm ON books USING gin(author gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_books_isbn_pattern ON books(isbn varchar_pattern_ops);
+
+COMMIT;
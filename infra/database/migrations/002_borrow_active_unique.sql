@@ -0,0 +1,9 @@
+-- 迁移 002：在借记录部分唯一索引
+-- 借书改为条件 UPDATE ... RETURNING 后，重复借阅由该索引拒绝
+-- 若已有重复的在借记录，先用以下查询找出并人工处理：
+--   SELECT user_id, book_isbn, array_agg(id) FROM borrow_records
+--   WHERE status = 'active' GROUP BY user_id, book_isbn HAVING count(*) > 1;
+-- 用法: psql -d library -f 002_borrow_active_unique.sql
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_borrows_user_book_active
+    ON borrow_records(user_id, book_isbn) WHERE status = 'active';
@@ -0,0 +1,11 @@
+-- 迁移 003：看板计数器表
+-- 应用启动时 stats_reconcile 任务会按源表全量计算一次初始值
+-- 用法: psql -d library -f 003_stat_counters.sql
+
+CREATE TABLE IF NOT EXISTS stat_counters (
+    name            VARCHAR(100) NOT NULL,
+    shard           SMALLINT NOT NULL DEFAULT 0,
+    value           BIGINT NOT NULL DEFAULT 0,
+    updated_at      TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (name, shard)
+);
@@ -0,0 +1,15 @@
+-- 迁移 004：游标分页复合索引
+-- 管理端列表改为 (created_at, id) / (borrowed_at, id) 游标翻页，替换 OFFSET 分页
+-- CONCURRENTLY 不能在事务中执行，逐条运行即可
+-- 用法: psql -d library -f 004_keyset_pagination.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_created_key ON users(created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_books_created_key ON books(created_at, isbn);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_borrows_borrowed_key ON borrow_records(borrowed_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_borrows_status_borrowed_key ON borrow_records(status, borrowed_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_borrows_user_borrowed_key ON borrow_records(user_id, borrowed_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_borrows_book_borrowed_key ON borrow_records(book_isbn, borrowed_at, id);
+
+-- 被复合索引覆盖的单列索引
+DROP INDEX CONCURRENTLY IF EXISTS idx_users_created;
+DROP INDEX CONCURRENTLY IF EXISTS idx_books_created;
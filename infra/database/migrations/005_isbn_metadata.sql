@@ -0,0 +1,10 @@
+-- 迁移 005：ISBN元数据缓存表
+-- 用法: psql -d library -f 005_isbn_metadata.sql
+
+CREATE TABLE IF NOT EXISTS isbn_metadata (
+    isbn            VARCHAR(20) PRIMARY KEY,
+    data            JSONB,
+    source          VARCHAR(20),
+    fetched_at      TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    expires_at      TIMESTAMP WITH TIME ZONE NOT NULL
+);
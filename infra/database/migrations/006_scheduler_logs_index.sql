@@ -0,0 +1,5 @@
+-- 迁移 006：任务执行记录索引
+-- 管理端按任务查询最近执行记录与耗时分位数
+-- 用法: psql -d library -f 006_scheduler_logs_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_scheduler_logs_job_started ON scheduler_logs(job_id, started_at);
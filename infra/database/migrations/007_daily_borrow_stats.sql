@@ -0,0 +1,17 @@
+-- 迁移 007：借阅日汇总表
+-- 建表后执行 python backfill_rollup.py 回填历史数据
+-- CONCURRENTLY 不能在事务中执行，逐条运行即可
+-- 用法: psql -d library -f 007_daily_borrow_stats.sql
+
+CREATE TABLE IF NOT EXISTS daily_borrow_stats (
+    day             DATE PRIMARY KEY,
+    borrows         INTEGER NOT NULL DEFAULT 0,
+    borrowers       INTEGER NOT NULL DEFAULT 0,
+    returns         INTEGER NOT NULL DEFAULT 0,
+    late_returns    INTEGER NOT NULL DEFAULT 0,
+    overdue         INTEGER NOT NULL DEFAULT 0,
+    updated_at      TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_borrows_returned_at ON borrow_records(returned_at) WHERE returned_at IS NOT NULL;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_borrows_due_all ON borrow_records(due_date);
@@ -0,0 +1,42 @@
+-- 迁移 008：借阅归档表（按年分区）与历史视图
+-- 借阅表保持不分区：分区键必须包含在主键与唯一索引中，
+-- 会破坏 uq_borrows_user_book_active（同一用户同一本书只能有一条在借）
+-- 用法: psql -d library -f 008_borrow_archive.sql
+
+-- 已归还的历史借阅，按 borrowed_at 年份分区（年度分区由归档任务按需创建）
+CREATE TABLE IF NOT EXISTS borrow_records_archive (
+    id              INTEGER NOT NULL,
+    user_id         INTEGER NOT NULL,
+    book_isbn       VARCHAR(20) NOT NULL,
+    borrowed_at     TIMESTAMP WITH TIME ZONE NOT NULL,
+    due_date        TIMESTAMP WITH TIME ZONE NOT NULL,
+    returned_at     TIMESTAMP WITH TIME ZONE,
+    status          VARCHAR(20),
+    return_method   VARCHAR(20),
+    notes           VARCHAR(500),
+    remind_count    INTEGER DEFAULT 0,
+    last_remind_at  TIMESTAMP WITH TIME ZONE,
+    created_at      TIMESTAMP WITH TIME ZONE,
+    updated_at      TIMESTAMP WITH TIME ZONE,
+    archived_at     TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, borrowed_at)
+) PARTITION BY RANGE (borrowed_at);
+
+CREATE TABLE IF NOT EXISTS borrow_records_archive_default PARTITION OF borrow_records_archive DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_borrows_archive_borrowed_key ON borrow_records_archive(borrowed_at, id);
+CREATE INDEX IF NOT EXISTS idx_borrows_archive_user_key ON borrow_records_archive(user_id, borrowed_at, id);
+CREATE INDEX IF NOT EXISTS idx_borrows_archive_book_key ON borrow_records_archive(book_isbn, borrowed_at, id);
+
+-- 借阅历史（借阅表 + 归档表），历史查询、导出与日汇总读取此视图
+CREATE OR REPLACE VIEW borrow_records_all AS
+SELECT id, user_id, book_isbn, borrowed_at, due_date, returned_at, status,
+       return_method, notes, remind_count, last_remind_at, created_at, updated_at,
+       false AS archived
+FROM borrow_records
+UNION ALL
+SELECT id, user_id, book_isbn, borrowed_at, due_date, returned_at, status,
+       return_method, notes, remind_count, last_remind_at, created_at, updated_at,
+       true AS archived
+FROM borrow_records_archive;
+
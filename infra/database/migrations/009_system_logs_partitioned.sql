@@ -0,0 +1,60 @@
+-- 迁移 009：操作审计日志改为按月分区（过期数据按分区整体删除）
+-- 旧表改名后重建为分区表，按已有数据的月份建分区再迁入，最后删除旧表
+-- 之后的月分区由应用启动与定时任务（audit_partitions）预建
+-- 不设默认分区：有默认分区时无法 DETACH PARTITION CONCURRENTLY（过期分区删除时需要）
+-- 用法: psql -d library -f 009_system_logs_partitioned.sql
+
+BEGIN;
+
+ALTER TABLE system_logs RENAME TO system_logs_legacy;
+ALTER INDEX IF EXISTS idx_logs_user RENAME TO idx_logs_user_legacy;
+ALTER INDEX IF EXISTS idx_logs_action RENAME TO idx_logs_action_legacy;
+ALTER INDEX IF EXISTS idx_logs_created RENAME TO idx_logs_created_legacy;
+
+-- 沿用原序列，id 不回退
+CREATE TABLE system_logs (
+    id              INTEGER NOT NULL DEFAULT nextval('system_logs_id_seq'),
+    user_id         INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    action          VARCHAR(50) NOT NULL,
+    target_type     VARCHAR(50),
+    target_id       VARCHAR(50),
+    detail          JSONB,
+    ip_address      INET,
+    user_agent      VARCHAR(500),
+    created_at      TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- 从已有数据最早的月份到两个月之后，逐月建分区（UTC）
+DO $$
+DECLARE
+    month_start DATE;
+BEGIN
+    SELECT date_trunc('month', COALESCE(min(created_at), now()) AT TIME ZONE 'UTC')::date
+    INTO month_start
+    FROM system_logs_legacy;
+
+    WHILE month_start <= (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '2 months')::date LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF system_logs FOR VALUES FROM (%L) TO (%L)',
+            'system_logs_p' || to_char(month_start, 'YYYYMM'),
+            month_start::text || ' 00:00:00+00',
+            (month_start + interval '1 month')::date::text || ' 00:00:00+00'
+        );
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+END $$;
+
+INSERT INTO system_logs (id, user_id, action, target_type, target_id, detail, ip_address, user_agent, created_at)
+SELECT id, user_id, action, target_type, target_id, detail, ip_address, user_agent,
+       COALESCE(created_at, now())
+FROM system_logs_legacy;
+
+ALTER SEQUENCE system_logs_id_seq OWNED BY system_logs.id;
+DROP TABLE system_logs_legacy;
+
+CREATE INDEX idx_logs_user ON system_logs(user_id, created_at DESC);
+CREATE INDEX idx_logs_action ON system_logs(action, created_at DESC);
+CREATE INDEX idx_logs_created ON system_logs(created_at DESC);
+
+COMMIT;
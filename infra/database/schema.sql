@@ -3,6 +3,7 @@
 -- 时区: Asia/Shanghai
 
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 CREATE TABLE users (
     id              SERIAL PRIMARY KEY,
@@ -16,7 +17,7 @@ CREATE TABLE users (
     CONSTRAINT idx_openid UNIQUE (openid)
 );
 
-CREATE INDEX idx_users_created ON users(created_at DESC);
+CREATE INDEX idx_users_created_key ON users(created_at, id);
 CREATE INDEX idx_users_admin ON users(is_admin) WHERE is_admin = 1;
 
 CREATE TABLE books (
@@ -31,6 +32,7 @@ CREATE TABLE books (
     stock           INTEGER NOT NULL DEFAULT 1 CHECK (stock >= 0),
     total           INTEGER NOT NULL DEFAULT 1 CHECK (total >= 0),
     location        VARCHAR(50),
+    search_vector   TSVECTOR,
     created_at      TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at      TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT check_stock_valid CHECK (stock <= total)
@@ -38,8 +40,12 @@ CREATE TABLE books (
 
 CREATE INDEX idx_books_author ON books(author);
 CREATE INDEX idx_books_tags ON books USING gin(tags);
-CREATE INDEX idx_books_created ON books(created_at DESC);
+CREATE INDEX idx_books_created_key ON books(created_at, isbn);
 CREATE INDEX idx_books_stock ON books(stock) WHERE stock < 3;
+CREATE INDEX idx_books_search ON books USING gin(search_vector);
+CREATE INDEX idx_books_title_trgm ON books USING gin(title gin_trgm_ops);
+CREATE INDEX idx_books_author_trgm ON books USING gin(author gin_trgm_ops);
+CREATE INDEX idx_books_isbn_pattern ON books(isbn varchar_pattern_ops);
 
 CREATE TABLE borrow_records (
     id              SERIAL PRIMARY KEY,
@@ -61,9 +67,55 @@ CREATE INDEX idx_borrows_user ON borrow_records(user_id, status);
 CREATE INDEX idx_borrows_book ON borrow_records(book_isbn, status);
 CREATE INDEX idx_borrows_status ON borrow_records(status) WHERE status = 'active';
 CREATE INDEX idx_borrows_due ON borrow_records(due_date) WHERE status = 'active';
+CREATE INDEX idx_borrows_returned_at ON borrow_records(returned_at) WHERE returned_at IS NOT NULL;
+CREATE INDEX idx_borrows_due_all ON borrow_records(due_date);
+CREATE UNIQUE INDEX uq_borrows_user_book_active ON borrow_records(user_id, book_isbn) WHERE status = 'active';
+CREATE INDEX idx_borrows_borrowed_key ON borrow_records(borrowed_at, id);
+CREATE INDEX idx_borrows_status_borrowed_key ON borrow_records(status, borrowed_at, id);
+CREATE INDEX idx_borrows_user_borrowed_key ON borrow_records(user_id, borrowed_at, id);
+CREATE INDEX idx_borrows_book_borrowed_key ON borrow_records(book_isbn, borrowed_at, id);
 
+-- 已归还的历史借阅，按 borrowed_at 年份分区（年度分区由归档任务按需创建）
+CREATE TABLE borrow_records_archive (
+    id              INTEGER NOT NULL,
+    user_id         INTEGER NOT NULL,
+    book_isbn       VARCHAR(20) NOT NULL,
+    borrowed_at     TIMESTAMP WITH TIME ZONE NOT NULL,
+    due_date        TIMESTAMP WITH TIME ZONE NOT NULL,
+    returned_at     TIMESTAMP WITH TIME ZONE,
+    status          VARCHAR(20),
+    return_method   VARCHAR(20),
+    notes           VARCHAR(500),
+    remind_count    INTEGER DEFAULT 0,
+    last_remind_at  TIMESTAMP WITH TIME ZONE,
+    created_at      TIMESTAMP WITH TIME ZONE,
+    updated_at      TIMESTAMP WITH TIME ZONE,
+    archived_at     TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, borrowed_at)
+) PARTITION BY RANGE (borrowed_at);
+
+CREATE TABLE borrow_records_archive_default PARTITION OF borrow_records_archive DEFAULT;
+
+CREATE INDEX idx_borrows_archive_borrowed_key ON borrow_records_archive(borrowed_at, id);
+CREATE INDEX idx_borrows_archive_user_key ON borrow_records_archive(user_id, borrowed_at, id);
+CREATE INDEX idx_borrows_archive_book_key ON borrow_records_archive(book_isbn, borrowed_at, id);
+
+-- 借阅历史（借阅表 + 归档表），历史查询、导出与日汇总读取此视图
+CREATE VIEW borrow_records_all AS
+SELECT id, user_id, book_isbn, borrowed_at, due_date, returned_at, status,
+       return_method, notes, remind_count, last_remind_at, created_at, updated_at,
+       false AS archived
+FROM borrow_records
+UNION ALL
+SELECT id, user_id, book_isbn, borrowed_at, due_date, returned_at, status,
+       return_method, notes, remind_count, last_remind_at, created_at, updated_at,
+       true AS archived
+FROM borrow_records_archive;
+
+-- 操作审计日志，按 created_at 月分区（system_logs_pYYYYMM，由应用启动、定时任务与写入时按需创建，过期分区整体删除）
+-- 不设默认分区：有默认分区时无法 DETACH PARTITION CONCURRENTLY
 CREATE TABLE system_logs (
-    id              SERIAL PRIMARY KEY,
+    id              SERIAL,
     user_id         INTEGER REFERENCES users(id) ON DELETE SET NULL,
     action          VARCHAR(50) NOT NULL,
     target_type     VARCHAR(50),
@@ -71,8 +123,9 @@ CREATE TABLE system_logs (
     detail          JSONB,
     ip_address      INET,
     user_agent      VARCHAR(500),
-    created_at      TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-);
+    created_at      TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
 CREATE INDEX idx_logs_user ON system_logs(user_id, created_at DESC);
 CREATE INDEX idx_logs_action ON system_logs(action, created_at DESC);
@@ -100,6 +153,36 @@ CREATE TABLE scheduler_logs (
     result          TEXT,
     error           TEXT
 );
+CREATE INDEX idx_scheduler_logs_job_started ON scheduler_logs(job_id, started_at);
+
+-- 看板计数器：按分片累加，读取时求和；日维度计数 name 形如 borrows_new:2024-01-01
+CREATE TABLE stat_counters (
+    name            VARCHAR(100) NOT NULL,
+    shard           SMALLINT NOT NULL DEFAULT 0,
+    value           BIGINT NOT NULL DEFAULT 0,
+    updated_at      TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (name, shard)
+);
+
+-- 借阅日汇总（UTC日期）：每晚增量生成，可回填历史
+CREATE TABLE daily_borrow_stats (
+    day             DATE PRIMARY KEY,
+    borrows         INTEGER NOT NULL DEFAULT 0,
+    borrowers       INTEGER NOT NULL DEFAULT 0,
+    returns         INTEGER NOT NULL DEFAULT 0,
+    late_returns    INTEGER NOT NULL DEFAULT 0,
+    overdue         INTEGER NOT NULL DEFAULT 0,
+    updated_at      TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ISBN元数据缓存：data 为 NULL 表示上游未查到（负缓存）
+CREATE TABLE isbn_metadata (
+    isbn            VARCHAR(20) PRIMARY KEY,
+    data            JSONB,
+    source          VARCHAR(20),
+    fetched_at      TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    expires_at      TIMESTAMP WITH TIME ZONE NOT NULL
+);
 
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -116,6 +199,43 @@ CREATE TRIGGER update_books_updated_at BEFORE UPDATE ON books
 CREATE TRIGGER update_borrows_updated_at BEFORE UPDATE ON borrow_records
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- 图书全文检索：中文按相邻二字切分（bigram），其余文本交给 simple 分词器
+CREATE OR REPLACE FUNCTION search_tokens(src TEXT) RETURNS TEXT AS $$
+DECLARE
+    run TEXT;
+    parts TEXT[] := ARRAY[regexp_replace(coalesce(src, ''), '[\u3400-\u9fff]+', ' ', 'g')];
+    i INT;
+BEGIN
+    FOR run IN SELECT m[1] FROM regexp_matches(coalesce(src, ''), '([\u3400-\u9fff]+)', 'g') AS m LOOP
+        IF char_length(run) = 1 THEN
+            parts := parts || run;
+        ELSE
+            FOR i IN 1 .. char_length(run) - 1 LOOP
+                parts := parts || substr(run, i, 2);
+            END LOOP;
+        END IF;
+    END LOOP;
+    RETURN array_to_string(parts, ' ');
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION books_search_document(title TEXT, author TEXT, tags TEXT[])
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple', search_tokens(title)), 'A')
+        || setweight(to_tsvector('simple', search_tokens(author)), 'B')
+        || setweight(to_tsvector('simple', search_tokens(array_to_string(tags, ' '))), 'C')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION books_search_vector_update() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector := books_search_document(NEW.title, NEW.author, NEW.tags);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER books_search_vector_trigger BEFORE INSERT OR UPDATE OF title, author, tags ON books
+    FOR EACH ROW EXECUTE FUNCTION books_search_vector_update();
+
 CREATE VIEW overdue_borrows AS
 SELECT
     br.id,